@@ -1,14 +1,24 @@
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Callable, Dict, Tuple
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import hashlib
+import hmac
+import math
 import os
+import time
 from models.User import UserResponse
+import metrics
 
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+admin_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # JWT Configuration
@@ -16,6 +26,79 @@ SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-here-change-in-pr
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Event stream tickets: EventSource cannot send headers, so the stream URL
+# carries a short-lived token that opens event streams and nothing else,
+# rather than the access token (URLs end up in access logs)
+STREAM_TICKET_SCOPE = "events"
+STREAM_TICKET_SECONDS = int(os.environ.get("STREAM_TICKET_SECONDS", "60"))
+
+# Shared secret for the /api/admin routes; unset disables them
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY")
+
+# Password hashing executor: "thread", "process", or "inline" to hash on the
+# event loop (only useful as a benchmark baseline)
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "4"))
+
+_password_executor: Optional[Executor] = None
+
+# JWT library used to sign and verify tokens: "jose" or "pyjwt"
+JWT_BACKEND = os.environ.get("JWT_BACKEND", "jose")
+
+# Verified-token cache
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", "300"))
+
+class TokenCache:
+    """Bounded LRU of verified tokens, keyed by the token's SHA-256 digest.
+
+    Entries hold the decoded ``sub`` and expire after the TTL or at the
+    token's own ``exp``, whichever comes first.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[str]:
+        """Return the cached user id for a token, if still valid."""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.time():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, token: str, user_id: str, exp: float = math.inf):
+        """Cache a verified token until its exp or the TTL runs out."""
+        if self.max_size <= 0:
+            return
+        expires_at = min(exp, time.time() + self.ttl_seconds)
+        self._entries[self._key(token)] = (user_id, expires_at)
+        self._entries.move_to_end(self._key(token))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -24,6 +107,69 @@ def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
+def get_password_executor() -> Optional[Executor]:
+    """Get the executor bcrypt work runs on, creating it on first use."""
+    global _password_executor
+    if _password_executor is None and PASSWORD_HASH_EXECUTOR != "inline":
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+            )
+    return _password_executor
+
+def shutdown_password_executor():
+    """Stop the password executor's workers."""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
+async def _run_password_work(operation: str, func, *args):
+    with metrics.AUTH_SECONDS.time(operation):
+        executor = get_password_executor()
+        if executor is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, func, *args)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    return await _run_password_work(
+        "bcrypt_verify", verify_password, plain_password, hashed_password
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await _run_password_work("bcrypt_hash", get_password_hash, password)
+
+def _jose_encode(claims: dict) -> str:
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+def _jose_decode(token: str) -> Optional[dict]:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+def _pyjwt_encode(claims: dict) -> str:
+    import jwt as pyjwt
+    return pyjwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+def _pyjwt_decode(token: str) -> Optional[dict]:
+    import jwt as pyjwt
+    try:
+        return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except pyjwt.PyJWTError:
+        return None
+
+JWT_BACKENDS: Dict[str, Tuple[Callable[[dict], str], Callable[[str], Optional[dict]]]] = {
+    "jose": (_jose_encode, _jose_decode),
+    "pyjwt": (_pyjwt_encode, _pyjwt_decode),
+}
+encode_jwt, decode_jwt = JWT_BACKENDS[JWT_BACKEND]
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -33,19 +179,42 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    with metrics.AUTH_SECONDS.time("jwt_encode"):
+        encoded_jwt = encode_jwt(to_encode)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[str]:
     """Verify a JWT token and return user_id if valid."""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            return None
+    user_id = token_cache.get(token)
+    if user_id is not None:
         return user_id
-    except JWTError:
+    
+    with metrics.AUTH_SECONDS.time("jwt_decode"):
+        payload = decode_jwt(token)
+    if payload is None:
+        return None
+    user_id = payload.get("sub")
+    # Scoped tokens (stream tickets) are not access tokens
+    if user_id is None or payload.get("scope") is not None:
+        return None
+    
+    token_cache.put(token, user_id, float(payload.get("exp", math.inf)))
+    return user_id
+
+def create_stream_ticket(user_id: str) -> str:
+    """Create a short-lived token that only opens the user's event streams."""
+    return create_access_token(
+        data={"sub": user_id, "scope": STREAM_TICKET_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TICKET_SECONDS)
+    )
+
+def verify_stream_ticket(ticket: str) -> Optional[str]:
+    """Verify a stream ticket and return user_id if valid."""
+    with metrics.AUTH_SECONDS.time("jwt_decode"):
+        payload = decode_jwt(ticket)
+    if payload is None or payload.get("scope") != STREAM_TICKET_SCOPE:
         return None
+    return payload.get("sub")
 
 async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """Dependency to get current authenticated user ID from JWT token."""
@@ -59,4 +228,36 @@ async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depend
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user_id
\ No newline at end of file
+    return user_id
+
+async def get_stream_user_id(
+    ticket: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> str:
+    """Like get_current_user_id, but also accepts a stream ``ticket`` query parameter.
+
+    EventSource cannot send an Authorization header, so browsers open event
+    streams with a ticket from ``create_stream_ticket`` in the URL.
+    """
+    user_id = None
+    if credentials is not None:
+        user_id = verify_token(credentials.credentials)
+    elif ticket:
+        user_id = verify_stream_ticket(ticket)
+    
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return user_id
+
+async def require_admin(api_key: Optional[str] = Depends(admin_key_header)) -> None:
+    """Dependency guarding admin routes with the ``X-Admin-Key`` header."""
+    if not ADMIN_API_KEY or not api_key or not hmac.compare_digest(api_key, ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin key required"
+        )
@@ -0,0 +1,108 @@
+"""Batch delete and update of a user's calculations.
+
+Rows are selected by id list and/or ``type`` and ``created_at`` range,
+always scoped to the user. Matching rows are processed in ``_id`` order,
+``BATCH_CHUNK_SIZE`` at a time: each chunk is one read of the fields the
+stats and rollups depend on, one unordered ``bulk_write``, and one
+stats/rollups update for the whole chunk.
+
+Each row's delete or update is filtered on the values that were read, so
+a row edited or deleted concurrently is left alone. If a chunk's write
+then touches fewer rows than were read, the deltas can no longer be
+trusted and the caller is told to rebuild the user's aggregates.
+"""
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DeleteOne, UpdateOne
+
+BATCH_CHUNK_SIZE = 1000
+MAX_BATCH_IDS = 10000
+
+# Fields needed to compute stats and rollup deltas
+DELTA_PROJECTION = {
+    "user_id": 1, "type": 1, "created_at": 1,
+    "money_saved": 1, "co2_reduced": 1, "points": 1,
+}
+
+RecordChanges = Callable[[list], Awaitable[None]]
+
+
+def build_query(
+    user_id: str,
+    ids: Optional[List[str]] = None,
+    calc_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Filter for ``created_from <= created_at < created_to`` plus ids and type."""
+    query: Dict[str, Any] = {"user_id": user_id}
+    if ids is not None:
+        query["_id"] = {"$in": ids}
+    if calc_type is not None:
+        query["type"] = calc_type
+    created_range = {}
+    if created_from is not None:
+        created_range["$gte"] = created_from
+    if created_to is not None:
+        created_range["$lt"] = created_to
+    if created_range:
+        query["created_at"] = created_range
+    return query
+
+
+def _guard(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Match the row only while it still has the values its delta came from."""
+    return {field: doc.get(field) for field in ("_id", *DELTA_PROJECTION)}
+
+
+async def _chunks(collection, query: Dict[str, Any]):
+    last_id = None
+    while True:
+        chunk_query = query
+        if last_id is not None:
+            chunk_query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        chunk = await collection.find(chunk_query, DELTA_PROJECTION)\
+            .sort("_id", ASCENDING)\
+            .limit(BATCH_CHUNK_SIZE)\
+            .to_list(BATCH_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]["_id"]
+
+
+async def delete_matching(
+    collection, query: Dict[str, Any], record_changes: RecordChanges
+) -> Tuple[int, bool]:
+    """Delete the matching rows; returns ``(deleted, drifted)``."""
+    deleted = 0
+    drifted = False
+    async for chunk in _chunks(collection, query):
+        result = await collection.bulk_write(
+            [DeleteOne(_guard(doc)) for doc in chunk], ordered=False
+        )
+        deleted += result.deleted_count
+        if result.deleted_count != len(chunk):
+            drifted = True
+        else:
+            await record_changes([(doc, None) for doc in chunk])
+    return deleted, drifted
+
+
+async def update_matching(
+    collection, query: Dict[str, Any], update_data: Dict[str, Any], record_changes: RecordChanges
+) -> Tuple[int, bool]:
+    """``$set`` the fields on the matching rows; returns ``(matched, drifted)``."""
+    matched = 0
+    drifted = False
+    async for chunk in _chunks(collection, query):
+        result = await collection.bulk_write(
+            [UpdateOne(_guard(doc), {"$set": update_data}) for doc in chunk], ordered=False
+        )
+        matched += result.matched_count
+        if result.matched_count != len(chunk):
+            drifted = True
+        else:
+            await record_changes([(doc, {**doc, **update_data}) for doc in chunk])
+    return matched, drifted
@@ -0,0 +1,130 @@
+"""Read-through cache for rarely changing per-user data.
+
+The default backend is a bounded in-process LRU. Setting
+``CACHE_BACKEND=redis`` stores entries in Redis (``REDIS_URL``) so every
+API process shares them; any client exposing async ``get``, ``set(ex=)``
+and ``delete`` (e.g. ``redis.asyncio.Redis`` or a local stand-in) can be
+passed to ``RedisCache`` directly. Values are bytes, typically an already
+encoded response body.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory").lower()
+CACHE_SIZE = int(os.environ.get("CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", "300"))
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+
+class CacheBackend:
+    """Common hit/miss accounting for cache backends."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        return None
+
+    def stats(self) -> Dict[str, Union[int, float, None]]:
+        lookups = self.hits + self.misses
+        return {
+            "size": self.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MemoryCache(CacheBackend):
+    """Bounded LRU held in this process; entries expire after the TTL."""
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl_seconds: float = CACHE_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    async def set(self, key: str, value: bytes) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """Entries stored in a Redis-compatible server, shared across processes."""
+
+    def __init__(self, client, ttl_seconds: float = CACHE_TTL_SECONDS, prefix: str = "greenwallet:"):
+        super().__init__(ttl_seconds)
+        self.client = client
+        self.prefix = prefix
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.client.set(self.prefix + key, value, ex=max(int(self.ttl_seconds), 1))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+
+def create_cache(backend: str = CACHE_BACKEND) -> CacheBackend:
+    """Build the configured cache backend."""
+    if backend == "memory":
+        return MemoryCache()
+    if backend == "redis":
+        import redis.asyncio as redis
+        return RedisCache(redis.from_url(REDIS_URL))
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r}; expected 'memory' or 'redis'")
+
+
+def profiles_key(user_id: str, profile_type: str, version: str) -> str:
+    """Key of a profile list at an ETag version; a write moves readers to a new key."""
+    return f"profiles:{user_id}:{profile_type}:{version}"
+
+
+profile_cache = create_cache()
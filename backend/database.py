@@ -0,0 +1,152 @@
+"""MongoDB client configuration.
+
+``create_client`` builds the Motor client from the environment:
+
+* ``MONGO_MAX_POOL_SIZE`` / ``MONGO_MIN_POOL_SIZE``: connections per server
+* ``MONGO_WAIT_QUEUE_TIMEOUT_MS``: how long a request may wait for a free
+  connection before failing (unset waits indefinitely)
+* ``MONGO_COMPRESSORS``: e.g. ``zstd,snappy``; needs the ``zstandard`` /
+  ``python-snappy`` packages and a server that supports them
+* ``MONGO_READ_HEAVY_PREFERENCE``: read preference for the history, stats
+  and export reads (``primary`` by default), with optional
+  ``MONGO_MAX_STALENESS_SECONDS``
+
+Routing reads to secondaries gives up read-your-writes: a stats or history
+read right after a save can miss it, and the ETag issued with it will keep
+the stale body until the next write. Only enable it where that is fine.
+
+``PoolMonitor`` tracks connection pool usage per server for the metrics
+endpoint.
+"""
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+import metrics
+
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+MONGO_COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "")
+MONGO_READ_HEAVY_PREFERENCE = os.environ.get("MONGO_READ_HEAVY_PREFERENCE", "primary")
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get("MONGO_MAX_STALENESS_SECONDS", "-1"))
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Open, in-use and waiting connections per server, plus checkout failures.
+
+    pymongo reports pool events from its own threads, hence the lock.
+    """
+
+    def __init__(self, max_pool_size: int = MONGO_MAX_POOL_SIZE):
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict[str, int]] = {}
+
+    def _pool(self, address) -> Dict[str, int]:
+        key = "%s:%s" % address
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {
+                "open": 0, "in_use": 0, "waiting": 0, "checkout_failures": 0,
+            }
+        return pool
+
+    def _change(self, address, **deltas: int) -> None:
+        with self._lock:
+            pool = self._pool(address)
+            for field, delta in deltas.items():
+                pool[field] = max(pool[field] + delta, 0)
+
+    def connection_created(self, event):
+        self._change(event.address, open=1)
+
+    def connection_closed(self, event):
+        self._change(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._change(event.address, waiting=1)
+
+    def connection_checked_out(self, event):
+        self._change(event.address, waiting=-1, in_use=1)
+
+    def connection_check_out_failed(self, event):
+        self._change(event.address, waiting=-1, checkout_failures=1)
+
+    def connection_checked_in(self, event):
+        self._change(event.address, in_use=-1)
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop("%s:%s" % event.address, None)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-server counters with ``saturation`` = in use / max pool size."""
+        with self._lock:
+            pools = {address: dict(pool) for address, pool in self._pools.items()}
+        for pool in pools.values():
+            pool["max_size"] = self.max_pool_size
+            pool["saturation"] = round(pool["in_use"] / self.max_pool_size, 4) if self.max_pool_size else 0.0
+        return pools
+
+    def collect(self) -> Iterable[str]:
+        """Prometheus gauges, rendered by the metrics endpoint."""
+        pools = self.stats()
+        for field in ("open", "in_use", "waiting", "checkout_failures", "max_size", "saturation"):
+            yield f"# HELP mongodb_pool_{field} Connection pool {field.replace('_', ' ')} per server."
+            yield f"# TYPE mongodb_pool_{field} gauge"
+            for address, pool in sorted(pools.items()):
+                yield f'mongodb_pool_{field}{{address="{address}"}} {pool[field]}'
+
+
+def client_options() -> Dict[str, object]:
+    """Motor client keyword arguments taken from the environment."""
+    options: Dict[str, object] = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+    }
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = int(MONGO_WAIT_QUEUE_TIMEOUT_MS)
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+def create_client(
+    mongo_url: str,
+    event_listeners: Optional[list] = None,
+) -> AsyncIOMotorClient:
+    """Build the Motor client with the configured pool and compression settings."""
+    return AsyncIOMotorClient(mongo_url, event_listeners=event_listeners or [], **client_options())
+
+
+def read_heavy_preference():
+    """Read preference for routes that tolerate slightly stale data."""
+    mode = read_pref_mode_from_name(MONGO_READ_HEAVY_PREFERENCE)
+    return make_read_preference(mode, tag_sets=None, max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+
+def read_heavy(collection):
+    """The collection with the read-heavy read preference applied."""
+    if MONGO_READ_HEAVY_PREFERENCE == "primary" and MONGO_MAX_STALENESS_SECONDS == -1:
+        return collection
+    return collection.with_options(read_preference=read_heavy_preference())
+
+
+pool_monitor = metrics.register(PoolMonitor())
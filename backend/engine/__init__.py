@@ -0,0 +1,40 @@
+"""Server-side calculation engine.
+
+NumPy implementations of the five calculator formulas that evaluate whole
+batches of inputs in one vectorized pass.
+
+Only ``DEFAULT_RATES`` is loaded with the package. The formulas, and NumPy
+with them, are imported the first time one of the other names is used, so
+processes that never compute anything do not pay for NumPy at startup.
+"""
+import importlib
+
+from .rates import DEFAULT_RATES
+
+__all__ = [
+    "DEFAULT_RATES", "FORMULAS", "MAX_GRID_CELLS", "EngineError",
+    "columns_from_rows", "compute", "compute_grid", "iter_cells",
+]
+
+_LAZY = {
+    "FORMULAS": "formulas",
+    "EngineError": "formulas",
+    "columns_from_rows": "formulas",
+    "compute": "formulas",
+    "MAX_GRID_CELLS": "grid",
+    "compute_grid": "grid",
+    "iter_cells": "grid",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,263 @@
+"""Vectorized calculator formulas.
+
+Each formula takes a mapping of input column name -> array (one element per
+row) plus a rates table, and returns output column name -> array. Every
+formula returns ``money_saved``, ``co2_reduced`` and ``points`` exactly as
+the matching React calculator saves them, plus the intermediate values the
+calculator displays.
+"""
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .rates import DEFAULT_RATES
+
+Columns = Mapping[str, Any]
+Results = Dict[str, np.ndarray]
+
+
+class EngineError(ValueError):
+    """Raised when inputs cannot be evaluated."""
+
+
+# Points are stored as int64; anything at or past 2**63 would wrap
+MAX_POINTS = 2.0 ** 63
+
+
+def js_round(values: np.ndarray) -> np.ndarray:
+    """Round half up like ``Math.round`` (NumPy rounds half to even)."""
+    rounded = np.floor(values + 0.5)
+    out_of_range = ~(np.abs(rounded) < MAX_POINTS)
+    if out_of_range.any():
+        row = int(np.flatnonzero(out_of_range)[0])
+        raise EngineError(f"Result is too large (row {row})")
+    return rounded.astype(np.int64)
+
+
+def _one_dimensional(name: str, values: np.ndarray) -> np.ndarray:
+    if values.ndim != 1:
+        raise EngineError(f"Input {name} must be a list of single values")
+    return values
+
+
+def _number(columns: Columns, name: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Get a numeric input column as floats.
+
+    ``rows`` is a boolean mask of the rows that must have a positive value;
+    by default all of them do, mirroring the calculators' required fields.
+    """
+    if name not in columns:
+        raise EngineError(f"Missing input: {name}")
+    try:
+        values = np.asarray(
+            [np.nan if value is None else value for value in columns[name]],
+            dtype=np.float64,
+        )
+    except (TypeError, ValueError, OverflowError):
+        raise EngineError(f"Input {name} must be numeric")
+    _one_dimensional(name, values)
+
+    # Missing values are NaN here; given ones must be finite
+    given = np.asarray([value is not None for value in columns[name]], dtype=bool)
+    non_finite = given & ~np.isfinite(values)
+    if non_finite.any():
+        row = int(np.flatnonzero(non_finite)[0])
+        raise EngineError(f"Input {name} must be a finite number (row {row})")
+
+    required = ~(values > 0)
+    if rows is not None:
+        required &= rows
+    if required.any():
+        row = int(np.flatnonzero(required)[0])
+        raise EngineError(f"Input {name} must be a positive number (row {row})")
+    return values
+
+
+def _lookup(columns: Columns, name: str, table: Mapping[str, float]) -> np.ndarray:
+    """Map a categorical input column through ``table``."""
+    if name not in columns:
+        raise EngineError(f"Missing input: {name}")
+    values = _one_dimensional(name, np.asarray(columns[name], dtype=str))
+    keys, inverse = np.unique(values, return_inverse=True)
+    unknown = [key for key in keys if key not in table]
+    if unknown:
+        raise EngineError(f"Unknown {name}: {', '.join(unknown)}")
+    return np.asarray([table[key] for key in keys], dtype=np.float64)[inverse]
+
+
+def solar(columns: Columns, rates: Mapping[str, Any] = DEFAULT_RATES) -> Results:
+    """SolarCalculator.jsx"""
+    rooftop_area = _number(columns, "rooftop_area")
+    sunlight_hours = _number(columns, "sunlight_hours")
+    solar_rates = rates["solar"]
+
+    system_capacity = rooftop_area * solar_rates["capacity_per_area"]
+    monthly_generation = (
+        system_capacity * sunlight_hours
+        * solar_rates["days_per_month"] * solar_rates["performance_ratio"]
+    )
+    money_saved = monthly_generation * solar_rates["tariff"]
+    annual_co2_reduction = monthly_generation * 12 * solar_rates["co2_per_kwh"]
+
+    return {
+        "money_saved": money_saved,
+        # Saved calculations store the monthly figure
+        "co2_reduced": annual_co2_reduction / 12,
+        "points": js_round(annual_co2_reduction * solar_rates["points_per_kg_co2"]),
+        "system_capacity": system_capacity,
+        "monthly_generation": monthly_generation,
+        "annual_savings": money_saved * 12,
+        "annual_co2_reduction": annual_co2_reduction,
+    }
+
+
+def afforestation(columns: Columns, rates: Mapping[str, Any] = DEFAULT_RATES) -> Results:
+    """AfforestationCalculator.jsx"""
+    number_of_trees = _number(columns, "number_of_trees")
+    land_area = _number(columns, "land_area")
+    years_of_growth = _number(columns, "years_of_growth")
+    multiplier = _lookup(columns, "tree_species", rates["tree_species"])
+    tree_rates = rates["afforestation"]
+
+    tree_years = number_of_trees * years_of_growth
+    co2_absorbed = tree_years * tree_rates["co2_per_tree_year"] * multiplier
+
+    return {
+        "money_saved": np.zeros_like(co2_absorbed),
+        "co2_reduced": co2_absorbed,
+        "points": js_round(co2_absorbed * tree_rates["points_per_kg_co2"]),
+        "oxygen_produced": tree_years * tree_rates["oxygen_per_tree_year"] * multiplier,
+        "biodiversity_score": land_area * tree_rates["biodiversity_per_area_tree"] * number_of_trees,
+        "soil_conservation": tree_years * tree_rates["soil_per_tree_year"],
+    }
+
+
+def water(columns: Columns, rates: Mapping[str, Any] = DEFAULT_RATES) -> Results:
+    """WaterCalculator.jsx, in either "bill" or "liters" mode per row."""
+    size = len(next(iter(columns.values())))
+    modes = np.asarray(columns.get("mode", ["bill"] * size), dtype=str)
+    unknown = set(np.unique(modes)) - {"bill", "liters"}
+    if unknown:
+        raise EngineError(f"Unknown mode: {', '.join(sorted(unknown))}")
+    by_bill = modes == "bill"
+
+    columns = {
+        "monthly_bill": [None] * size,
+        "liters_per_month": [None] * size,
+        "action": ["rainwater"] * size,
+        **columns,
+    }
+    monthly_bill = _number(columns, "monthly_bill", rows=by_bill)
+    liters_per_month = _number(columns, "liters_per_month", rows=~by_bill)
+    multiplier = _lookup(columns, "action", rates["water_actions"])
+
+    liters = np.where(by_bill, monthly_bill / rates["water"] * 1000, liters_per_month)
+    money_saved = np.where(
+        by_bill,
+        monthly_bill * rates["water_bill_reduction"],
+        liters / 1000 * rates["water"] * multiplier,
+    )
+    co2_reduced = liters / 1000 * rates["water_co2"]
+
+    return {
+        "money_saved": money_saved,
+        "co2_reduced": co2_reduced,
+        "points": js_round(money_saved + co2_reduced),
+        "liters_per_month": liters,
+    }
+
+
+def transport(columns: Columns, rates: Mapping[str, Any] = DEFAULT_RATES) -> Results:
+    """TransportCalculator.jsx"""
+    size = len(next(iter(columns.values())))
+    columns = {"frequency": ["daily"] * size, **columns}
+    distance = _number(columns, "distance")
+    trips = _lookup(columns, "frequency", rates["transport_frequencies"])
+    modes = rates["transport"]
+    cost = {mode: values["cost"] for mode, values in modes.items()}
+    co2 = {mode: values["co2"] for mode, values in modes.items()}
+
+    current_cost = _lookup(columns, "current_mode", cost)
+    alternate_cost = _lookup(columns, "alternate_mode", cost)
+    current_co2 = _lookup(columns, "current_mode", co2)
+    alternate_co2 = _lookup(columns, "alternate_mode", co2)
+    same = np.asarray(columns["current_mode"], dtype=str) == np.asarray(
+        columns["alternate_mode"], dtype=str
+    )
+    if same.any():
+        row = int(np.flatnonzero(same)[0])
+        raise EngineError(f"current_mode and alternate_mode must differ (row {row})")
+
+    trip_km = distance * trips
+    # A switch to a dearer or dirtier mode saves nothing rather than a negative amount
+    money_saved = np.maximum(trip_km * (current_cost - alternate_cost), 0)
+    # g -> kg
+    co2_reduced = np.maximum(trip_km * (current_co2 - alternate_co2) / 1000, 0)
+
+    return {
+        "money_saved": money_saved,
+        "co2_reduced": co2_reduced,
+        "points": js_round(money_saved + co2_reduced),
+    }
+
+
+def electricity(columns: Columns, rates: Mapping[str, Any] = DEFAULT_RATES) -> Results:
+    """ElectricityCalculator.jsx"""
+    size = len(next(iter(columns.values())))
+    columns = {"days_per_month": [30] * size, **columns}
+    hours_per_day = _number(columns, "hours_per_day")
+    days_per_month = _number(columns, "days_per_month")
+    appliances = rates["appliances"]
+    power_saved = _lookup(
+        columns, "appliance",
+        {name: power["from_power"] - power["to_power"] for name, power in appliances.items()},
+    )
+
+    kwh_saved = power_saved * hours_per_day * days_per_month
+    money_saved = kwh_saved * rates["electricity"]
+    co2_reduced = kwh_saved * rates["electricity_co2"]
+
+    return {
+        "money_saved": money_saved,
+        "co2_reduced": co2_reduced,
+        "points": js_round(money_saved + co2_reduced),
+        "kwh_saved": kwh_saved,
+    }
+
+
+FORMULAS: Dict[str, Callable[..., Results]] = {
+    "solar": solar,
+    "afforestation": afforestation,
+    "water": water,
+    "transport": transport,
+    "electricity": electricity,
+}
+
+
+def columns_from_rows(rows: Sequence[Mapping[str, Any]]) -> Dict[str, list]:
+    """Turn row dicts into columns; keys missing from a row become None."""
+    names = {name for row in rows for name in row}
+    return {name: [row.get(name) for row in rows] for name in names}
+
+
+def compute(
+    calc_type: str,
+    columns: Columns,
+    rates: Mapping[str, Any] = DEFAULT_RATES,
+) -> Results:
+    """Evaluate the ``calc_type`` formula over columnar inputs in one pass."""
+    if calc_type not in FORMULAS:
+        raise EngineError(f"Unknown calculation type: {calc_type}")
+    if not columns:
+        raise EngineError("No inputs given")
+    if len({len(values) for values in columns.values()}) != 1:
+        raise EngineError("Input columns must all have the same length")
+    # Overflow is reported below as an EngineError rather than a warning
+    with np.errstate(over="ignore", invalid="ignore"):
+        results = FORMULAS[calc_type](columns, rates)
+    for name, values in results.items():
+        non_finite = ~np.isfinite(values)
+        if non_finite.any():
+            row = int(np.flatnonzero(non_finite)[0])
+            raise EngineError(f"Result {name} is too large (row {row})")
+    return results
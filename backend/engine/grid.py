@@ -0,0 +1,127 @@
+"""Scenario grids over calculator inputs.
+
+Each input is given as a single value, a list of values or a numeric range.
+The Cartesian product of all axes is laid out by broadcasting, so the whole
+grid goes through the vectorized formulas in one call.
+"""
+import math
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+
+import numpy as np
+
+from .formulas import EngineError, Results, compute
+from .rates import DEFAULT_RATES
+
+# Hard cap on the number of cells in one grid
+MAX_GRID_CELLS = 100000
+
+
+def axis_values(name: str, spec: Any) -> np.ndarray:
+    """Expand one input spec into the values along its axis.
+
+    ``spec`` is a scalar, a list, or a range dict with ``start`` and ``stop``
+    (inclusive) plus either ``step`` or ``num``.
+    """
+    if isinstance(spec, Mapping):
+        try:
+            start, stop = float(spec["start"]), float(spec["stop"])
+        except (KeyError, TypeError, ValueError):
+            raise EngineError(f"Range for {name} needs numeric start and stop")
+        if not (math.isfinite(start) and math.isfinite(stop)):
+            raise EngineError(f"Range for {name} needs finite start and stop")
+        if stop < start:
+            raise EngineError(f"Range for {name} has stop before start")
+
+        if spec.get("num") is not None:
+            try:
+                count = int(spec["num"])
+            except (TypeError, ValueError, OverflowError):
+                raise EngineError(f"Range for {name} needs an integer num")
+            if count < 1:
+                raise EngineError(f"Range for {name} needs num >= 1")
+        elif spec.get("step") is not None:
+            try:
+                step = float(spec["step"])
+            except (TypeError, ValueError):
+                raise EngineError(f"Range for {name} needs a numeric step")
+            if not math.isfinite(step) or step <= 0:
+                raise EngineError(f"Range for {name} needs a positive, finite step")
+            steps = (stop - start) / step
+            if not steps < MAX_GRID_CELLS:
+                raise EngineError(f"Range for {name} has more than {MAX_GRID_CELLS} values")
+            # Tolerate float error so that e.g. 0.1 steps still reach stop
+            count = math.floor(steps + 1e-9) + 1
+        else:
+            raise EngineError(f"Range for {name} needs step or num")
+
+        if count > MAX_GRID_CELLS:
+            raise EngineError(f"Range for {name} has more than {MAX_GRID_CELLS} values")
+        if spec.get("num") is not None:
+            return np.linspace(start, stop, count)
+        return start + step * np.arange(count)
+
+    values = spec if isinstance(spec, list) else [spec]
+    if not values:
+        raise EngineError(f"No values given for {name}")
+    if any(isinstance(value, (list, tuple, Mapping)) for value in values):
+        raise EngineError(f"Values for {name} must be single numbers or strings")
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and not _finite(value):
+            raise EngineError(f"Values for {name} must be finite")
+    return np.asarray(values)
+
+
+def _finite(value: float) -> bool:
+    try:
+        return math.isfinite(float(value))
+    except OverflowError:
+        return False
+
+
+def build_grid(specs: Mapping[str, Any]) -> Tuple[Dict[str, np.ndarray], int]:
+    """Expand input specs into flat, equally long grid columns."""
+    if not specs:
+        raise EngineError("No inputs given")
+    axes = {name: axis_values(name, spec) for name, spec in specs.items()}
+    shape = tuple(len(values) for values in axes.values())
+    cells = math.prod(shape)
+    if cells > MAX_GRID_CELLS:
+        raise EngineError(f"Grid has {cells} cells, the limit is {MAX_GRID_CELLS}")
+
+    columns = {}
+    for position, (name, values) in enumerate(axes.items()):
+        # Put this axis on its own dimension, then broadcast to the full grid
+        view_shape = [1] * len(shape)
+        view_shape[position] = len(values)
+        columns[name] = np.broadcast_to(values.reshape(view_shape), shape).ravel()
+    return columns, cells
+
+
+def compute_grid(
+    calc_type: str,
+    specs: Mapping[str, Any],
+    rates: Mapping[str, Any] = DEFAULT_RATES,
+) -> Tuple[Dict[str, np.ndarray], Results, int]:
+    """Evaluate a calculator over every combination of its input specs."""
+    columns, cells = build_grid(specs)
+    return columns, compute(calc_type, columns, rates), cells
+
+
+def iter_cells(
+    columns: Mapping[str, np.ndarray],
+    results: Results,
+    chunk_size: int = 1000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield grid cells as lists of ``{"inputs": ..., "results": ...}`` dicts."""
+    size = len(next(iter(columns.values())))
+    for start in range(0, size, chunk_size):
+        stop = start + chunk_size
+        inputs = {name: values[start:stop].tolist() for name, values in columns.items()}
+        outputs = {name: values[start:stop].tolist() for name, values in results.items()}
+        yield [
+            {
+                "inputs": {name: values[row] for name, values in inputs.items()},
+                "results": {name: values[row] for name, values in outputs.items()},
+            }
+            for row in range(min(chunk_size, size - start))
+        ]
@@ -0,0 +1,74 @@
+"""Rates and factors used by the calculators.
+
+Mirrors ``RATES`` in ``frontend/src/mock.js`` and the constants and option
+tables hard-coded in the calculator components, so the server evaluates the
+exact same formulas the UI shows.
+"""
+
+DEFAULT_RATES = {
+    # mock.js RATES
+    "electricity": 7,  # ₹ per kWh
+    "electricity_co2": 0.82,  # kg CO₂ per kWh
+    "water": 30,  # ₹ per 1000 liters
+    "water_co2": 1.6,  # kg CO₂ per 1000 liters
+    "transport": {  # ₹ per km, g CO₂ per km
+        "taxi": {"cost": 18, "co2": 150},
+        "metro": {"cost": 2.5, "co2": 18},
+        "bus": {"cost": 1.5, "co2": 25},
+        "car": {"cost": 8, "co2": 120},
+    },
+
+    # SolarCalculator.jsx
+    "solar": {
+        "capacity_per_area": 0.01,  # kW per sqft of rooftop
+        "days_per_month": 30,
+        "performance_ratio": 0.8,
+        "tariff": 6,  # ₹ per kWh
+        "co2_per_kwh": 0.82,
+        "points_per_kg_co2": 10,  # of annual CO₂ reduction
+    },
+
+    # AfforestationCalculator.jsx
+    "afforestation": {
+        "co2_per_tree_year": 22,  # kg
+        "oxygen_per_tree_year": 118,  # kg
+        "points_per_kg_co2": 5,
+        "biodiversity_per_area_tree": 0.1,
+        "soil_per_tree_year": 2.5,  # cubic ft
+    },
+    "tree_species": {
+        "neem": 1.0,
+        "banyan": 1.5,
+        "peepal": 1.3,
+        "mango": 1.1,
+        "teak": 1.2,
+        "eucalyptus": 0.9,
+        "bamboo": 0.8,
+        "oak": 1.4,
+    },
+
+    # WaterCalculator.jsx
+    "water_bill_reduction": 0.3,  # assumed share of the bill saved
+    "water_actions": {
+        "rainwater": 1.0,
+        "lowflow": 0.3,
+        "greywater": 0.4,
+        "drip": 0.5,
+        "leak": 0.2,
+    },
+
+    # TransportCalculator.jsx
+    "transport_frequencies": {  # trips per month
+        "daily": 30,
+        "weekly": 4,
+        "monthly": 1,
+    },
+
+    # ElectricityCalculator.jsx, kW before -> after
+    "appliances": {
+        "ac_to_fan": {"from_power": 1.5, "to_power": 0.075},
+        "ac_reduce": {"from_power": 1.5, "to_power": 0.75},
+        "led_bulb": {"from_power": 0.06, "to_power": 0.01},
+        "energy_star": {"from_power": 2.0, "to_power": 1.4},
+    },
+}
@@ -0,0 +1,81 @@
+"""Per-user version stamps for conditional GETs.
+
+Each user has one version token per scope (calculations, profiles), kept in
+the cache backend and replaced by a fresh random token after every write
+in that scope. GET routes derive their ``ETag`` from the token and the
+request URL, so an ``If-None-Match`` revalidation is answered with 304
+from the token alone, before MongoDB is queried.
+
+Routes read the token before reading data and writers bump it after
+writing, so a response is never labelled newer than it is. A lost token
+(evicted, expired, restarted process) is simply regenerated, which only
+costs clients one full response. With the in-process cache backend each
+worker has its own tokens, so a bump also tells the other workers (through
+``invalidation``) to drop theirs.
+"""
+import hashlib
+import secrets
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+
+import invalidation
+from cache import CacheBackend, create_cache
+
+CALCULATIONS = "calculations"
+PROFILES = "profiles"
+
+version_store = invalidation.register_cache("etag_versions", create_cache())
+
+
+def _version_key(user_id: str, scope: str) -> str:
+    return f"version:{scope}:{user_id}"
+
+
+async def get_version(user_id: str, scope: str, store: CacheBackend = None) -> str:
+    """Current version token of a user's scope, created on first use."""
+    store = store or version_store
+    key = _version_key(user_id, scope)
+    version = await store.get(key)
+    if version is None:
+        version = secrets.token_hex(8).encode()
+        await store.set(key, version)
+    return version.decode() if isinstance(version, bytes) else version
+
+
+async def bump(user_id: str, *scopes: str, store: CacheBackend = None) -> None:
+    """Give the scopes new version tokens after a write."""
+    store = store or version_store
+    keys = [_version_key(user_id, scope) for scope in scopes]
+    for key in keys:
+        await store.set(key, secrets.token_hex(8).encode())
+    if store is version_store:
+        await invalidation.broadcast_delete("etag_versions", *keys)
+
+
+def tag(request: Request, version: str) -> str:
+    """ETag of the requested URL at a scope version."""
+    url = f"{request.url.path}?{request.url.query}"
+    url_hash = hashlib.sha1(url.encode()).hexdigest()[:12]
+    return f'"{version}-{url_hash}"'
+
+
+async def etag_for(request: Request, user_id: str, scope: str) -> str:
+    """ETag of the requested URL at the user's current scope version."""
+    return tag(request, await get_version(user_id, scope))
+
+
+def headers(etag: str) -> Dict[str, str]:
+    # private: responses differ per user; no-cache: always revalidate
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client's ``If-None-Match`` matches the ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers(etag))
+    return None
@@ -0,0 +1,166 @@
+"""Per-user live events for the ``/api/users/events`` SSE stream.
+
+``EventBus`` is an in-process pub/sub: each open stream subscribes with a
+bounded queue and the calculation routes publish stats and calculation
+events once their writes are done. A subscriber that falls too far behind
+has its backlog replaced by one ``resync`` event telling the client to
+refetch.
+
+With several API workers a write is only seen by streams on the same
+worker. Setting ``EVENTS_SOURCE=change_stream`` stops the routes from
+publishing and has every worker run ``watch_changes`` instead, which feeds
+its bus from MongoDB change streams (replica set required). Change events
+for deleted calculations carry no ``user_id``, so in that mode deletions
+only show up through the ``stats`` event.
+"""
+import asyncio
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+EVENTS_SOURCE = os.environ.get("EVENTS_SOURCE", "local")
+EVENT_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15.0
+
+# Above this many rows in one write, send one summary event instead
+MAX_CALCULATION_EVENTS = 50
+
+SUMMARY_FIELDS = ("type", "title", "money_saved", "co2_reduced", "points", "created_at")
+
+
+class EventBus:
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    @contextmanager
+    def subscribe(self, user_id: str) -> Iterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def subscriber_count(self, user_id: Optional[str] = None) -> int:
+        if user_id is not None:
+            return len(self._subscribers.get(user_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+
+bus = EventBus()
+
+
+def calculation_summary(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": doc["_id"], **{field: doc.get(field) for field in SUMMARY_FIELDS}}
+
+
+def publish_changes(
+    user_id: str,
+    changes: list,
+    inc: Dict[str, Any],
+    stats_doc: Optional[Dict[str, Any]],
+    event_bus: EventBus = bus,
+) -> None:
+    """Publish the stats delta and calculation events for committed changes."""
+    if not event_bus.subscriber_count(user_id):
+        return
+    if stats_doc is not None:
+        event_bus.publish(user_id, {"type": "stats", "delta": inc, "stats": stats_view(stats_doc)})
+    if len(changes) > MAX_CALCULATION_EVENTS:
+        event_bus.publish(user_id, {"type": "calculations.changed", "count": len(changes)})
+        return
+    for before, after in changes:
+        if before is None:
+            event_bus.publish(user_id, {"type": "calculation.created", "calculation": calculation_summary(after)})
+        elif after is None:
+            event_bus.publish(user_id, {"type": "calculation.deleted", "id": before["_id"]})
+        else:
+            event_bus.publish(user_id, {"type": "calculation.updated", "calculation": calculation_summary(after)})
+
+
+def stats_view(stats_doc: Dict[str, Any]) -> Dict[str, Any]:
+    """A stats document in the shape of the ``UserStats`` response."""
+    return {key: value for key, value in stats_doc.items() if key not in ("_id", "updated_at")}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode an event as an SSE frame named after its type."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=_default)}\n\n"
+
+
+async def stream(request, user_id: str, initial: Optional[Dict[str, Any]] = None, event_bus: EventBus = bus):
+    """SSE frames for one client until it disconnects, with heartbeats."""
+    with event_bus.subscribe(user_id) as queue:
+        # Tell EventSource to wait a few seconds before reconnecting
+        yield "retry: 5000\n\n"
+        if initial is not None:
+            yield format_sse(initial)
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(event)
+
+
+async def watch_changes(calculations_collection, user_stats_collection, event_bus: EventBus = bus) -> None:
+    """Feed the bus from change streams on ``user_stats`` and ``calculations``."""
+    async def watch_stats():
+        async with user_stats_collection.watch(full_document="updateLookup") as changes:
+            async for change in changes:
+                doc = change.get("fullDocument")
+                if doc is not None:
+                    event_bus.publish(doc["_id"], {"type": "stats", "stats": stats_view(doc)})
+
+    async def watch_calculations():
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        async with calculations_collection.watch(pipeline, full_document="updateLookup") as changes:
+            async for change in changes:
+                doc = change.get("fullDocument")
+                if doc is None:
+                    continue
+                kind = "created" if change["operationType"] == "insert" else "updated"
+                event_bus.publish(doc["user_id"], {
+                    "type": f"calculation.{kind}", "calculation": calculation_summary(doc),
+                })
+
+    while True:
+        watchers = [asyncio.create_task(watch_stats()), asyncio.create_task(watch_calculations())]
+        try:
+            done, _ = await asyncio.wait(watchers, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Change stream failed; restarting in 5s")
+        finally:
+            for task in watchers:
+                task.cancel()
+        await asyncio.sleep(5)
@@ -0,0 +1,168 @@
+"""Streaming export of a user's calculation history.
+
+Rows are read from the Motor cursor in bounded batches and encoded batch by
+batch, so memory stays flat however long the history is. For CSV and
+Parquet the ``details`` dict is flattened into one ``details.<key>`` column
+per key found in the user's calculations.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+
+EXPORT_BATCH_SIZE = 500
+
+BASE_COLUMNS = [
+    "id", "type", "title", "money_saved", "co2_reduced", "points",
+    "rate_version", "created_at", "updated_at",
+]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+async def detail_keys(collection, query: Dict[str, Any]) -> List[str]:
+    """Collect the distinct ``details`` keys of the matching calculations."""
+    pipeline = [
+        {"$match": query},
+        {"$project": {"keys": {"$map": {
+            "input": {"$objectToArray": {"$ifNull": ["$details", {}]}},
+            "in": "$$this.k"
+        }}}},
+        {"$unwind": "$keys"},
+        {"$group": {"_id": "$keys"}},
+        {"$sort": {"_id": 1}},
+    ]
+    return [group["_id"] async for group in collection.aggregate(pipeline)]
+
+
+def _text(value: Any) -> Any:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def flatten(doc: Dict[str, Any], keys: List[str]) -> Dict[str, Any]:
+    """Flatten a calculation document into export columns."""
+    row = {
+        "id": doc["_id"],
+        **{column: doc.get(column) for column in BASE_COLUMNS[1:]},
+    }
+    details = doc.get("details") or {}
+    for key in keys:
+        row[f"details.{key}"] = _text(details.get(key))
+    return row
+
+
+async def _batches(cursor) -> AsyncIterator[List[Dict[str, Any]]]:
+    batch = []
+    async for doc in cursor.batch_size(EXPORT_BATCH_SIZE):
+        batch.append(doc)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def stream_csv(cursor, keys: List[str]) -> AsyncIterator[str]:
+    """Encode calculations as CSV, one chunk per batch."""
+    columns = BASE_COLUMNS + [f"details.{key}" for key in keys]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    async for batch in _batches(cursor):
+        for doc in batch:
+            row = flatten(doc, keys)
+            for column in ("created_at", "updated_at"):
+                if isinstance(row[column], datetime):
+                    row[column] = row[column].isoformat()
+            writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def stream_ndjson(cursor) -> AsyncIterator[str]:
+    """Encode calculations as NDJSON with ``details`` kept nested."""
+    async for batch in _batches(cursor):
+        lines = []
+        for doc in batch:
+            doc["id"] = doc.pop("_id")
+            lines.append(json.dumps(doc, default=_json_default))
+        yield "\n".join(lines) + "\n"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back out in chunks.
+
+    ``tell`` keeps counting across drains so the Parquet footer offsets stay
+    correct while earlier row groups are already on the wire.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_parquet(cursor, keys: List[str]) -> AsyncIterator[bytes]:
+    """Encode calculations as Parquet, one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("id", pa.string()),
+            ("type", pa.string()),
+            ("title", pa.string()),
+            ("money_saved", pa.float64()),
+            ("co2_reduced", pa.float64()),
+            ("points", pa.int64()),
+            ("rate_version", pa.int64()),
+            ("created_at", pa.timestamp("ms")),
+            ("updated_at", pa.timestamp("ms")),
+        ]
+        + [(f"details.{key}", pa.string()) for key in keys]
+    )
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for batch in _batches(cursor):
+            rows = [flatten(doc, keys) for doc in batch]
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
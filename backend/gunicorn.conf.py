@@ -0,0 +1,50 @@
+"""Gunicorn settings for running the API with several worker processes.
+
+Run from the backend directory:
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Every setting can be overridden with the environment variables below or
+on the command line. See DEPLOYMENT.md for the shared-state requirements.
+"""
+import logging
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker opens its own MongoDB client in the app's lifespan handler;
+# importing the app before the fork would share nothing useful and makes
+# PyMongo warn about clients crossing fork().
+preload_app = False
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+
+
+def when_ready(server):
+    """Warn about settings that are only correct with a single process."""
+    if workers < 2:
+        return
+    logger = logging.getLogger("gunicorn.error")
+    if os.environ.get("INVALIDATION_BUS", "none").lower() == "none":
+        logger.warning(
+            "Running %d workers with INVALIDATION_BUS=none: profile and ETag caches, "
+            "leaderboard updates and new rate versions will not reach other workers",
+            workers,
+        )
+    if os.environ.get("EVENTS_SOURCE", "local") == "local":
+        logger.warning(
+            "Running %d workers with EVENTS_SOURCE=local: live events only reach "
+            "streams connected to the worker that handled the write",
+            workers,
+        )
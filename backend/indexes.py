@@ -0,0 +1,163 @@
+"""MongoDB index management.
+
+``INDEXES`` declares the indexes each collection needs, using the field names
+the code actually stores (``user_id``, ``created_at``, ``type``).
+``ensure_indexes`` creates them at startup and is safe to run repeatedly;
+``index_report`` shows what is missing and how each route's query shape is
+planned without changing anything.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # login / register lookups
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "calculations": [
+        # get_calculations, newest first; _id is the keyset tie-breaker
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_created_at",
+        ),
+        # get_calculations filtered by type, newest first
+        IndexModel(
+            [("user_id", ASCENDING), ("type", ASCENDING),
+             ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_type_created_at",
+        ),
+        # get_calculations?sort=<field>, either order; ranges on the sort
+        # field are bounds on the same scan
+        *[
+            IndexModel(
+                [("user_id", ASCENDING), (field, DESCENDING), ("_id", DESCENDING)],
+                name=f"user_{field}",
+            )
+            for field in ("money_saved", "co2_reduced", "points")
+        ],
+        # get_calculations?q=, text search within one user's titles
+        IndexModel([("user_id", ASCENDING), ("title", TEXT)], name="user_title_text"),
+    ],
+    "calculation_rollups": [
+        # get_user_trends
+        IndexModel(
+            [("user_id", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+            name="user_granularity_bucket",
+        ),
+    ],
+    "profiles": [
+        # get_profiles
+        IndexModel([("user_id", ASCENDING), ("type", ASCENDING)], name="user_type"),
+    ],
+    "jobs": [
+        # jobs.claim, oldest runnable job first
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+    ],
+}
+
+# Representative query of each route: (route, collection, filter, sort)
+QUERY_SHAPES = [
+    ("POST /api/auth/register", "users", {"email": "user@example.com"}, None),
+    ("POST /api/auth/login", "users", {"email": "user@example.com"}, None),
+    ("GET /api/calculations", "calculations",
+     {"user_id": "user-id"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/calculations?cursor=", "calculations",
+     {"user_id": "user-id", "$or": [
+         {"created_at": {"$lt": datetime(2024, 1, 1)}},
+         {"created_at": datetime(2024, 1, 1), "_id": {"$lt": "calc-id"}},
+     ]}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/calculations?calc_type=", "calculations",
+     {"user_id": "user-id", "type": "solar"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/calculations?sort=points&min_points=", "calculations",
+     {"user_id": "user-id", "points": {"$gte": 100}}, [("points", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/calculations?q=", "calculations",
+     {"user_id": "user-id", "$text": {"$search": "solar"}}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/users/trends", "calculation_rollups",
+     {"user_id": "user-id", "granularity": "month",
+      "bucket": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2025, 1, 1)}},
+     [("bucket", ASCENDING), ("type", ASCENDING)]),
+    ("GET /api/profiles/{profile_type}", "profiles",
+     {"user_id": "user-id", "type": "solar"}, None),
+    ("job worker claim", "jobs",
+     {"status": "queued"}, [("created_at", ASCENDING)]),
+]
+
+
+async def ensure_indexes(db) -> None:
+    """Create any declared index that does not exist yet."""
+    for collection_name, models in INDEXES.items():
+        try:
+            created = await db[collection_name].create_indexes(models)
+        except OperationFailure as exc:
+            # e.g. duplicate emails blocking the unique index, or an existing
+            # index with the same name but different options
+            logger.error("Could not create indexes on %s: %s", collection_name, exc)
+            continue
+        logger.info("Indexes ready on %s: %s", collection_name, ", ".join(created))
+
+
+async def missing_indexes(db) -> Dict[str, List[str]]:
+    """Return the names of declared indexes that do not exist yet."""
+    missing = {}
+    for collection_name, models in INDEXES.items():
+        existing = await db[collection_name].index_information()
+        names = [model.document["name"] for model in models
+                 if model.document["name"] not in existing]
+        if names:
+            missing[collection_name] = names
+    return missing
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten a winning plan into 'STAGE(index)' strings, outermost first."""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+
+async def explain_query_shapes(db) -> List[Dict[str, Any]]:
+    """Explain every route's query shape and summarize the winning plans."""
+    results = []
+    for route, collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query).limit(50)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation["queryPlanner"]["winningPlan"]
+        # Newer servers nest the classic plan under queryPlan
+        stages = _plan_stages(winning_plan.get("queryPlan", winning_plan))
+        results.append({
+            "route": route,
+            "collection": collection_name,
+            "stages": stages,
+            "collection_scan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+        })
+    return results
+
+
+async def index_report(db) -> str:
+    """Build a human-readable report of missing indexes and query plans."""
+    lines = []
+    missing = await missing_indexes(db)
+    for collection_name, names in missing.items():
+        lines.append(f"missing on {collection_name}: {', '.join(names)}")
+    if not missing:
+        lines.append("all declared indexes exist")
+
+    for result in await explain_query_shapes(db):
+        flags = [flag for flag in ("collection_scan", "in_memory_sort") if result[flag]]
+        suffix = f"  <-- {', '.join(flags)}" if flags else ""
+        lines.append(f"{result['route']}: {' <- '.join(result['stages'])}{suffix}")
+    return "\n".join(lines)
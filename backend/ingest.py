@@ -0,0 +1,135 @@
+"""Bulk ingestion of calculations.
+
+Items arrive as a JSON array or an NDJSON stream. They are validated in
+chunks and written with unordered ``insert_many`` batches, so one bad item
+only fails itself. Stats are updated once per chunk.
+"""
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from models.Calculation import Calculation, CalculationCreate
+
+BULK_CHUNK_SIZE = 1000
+MAX_BULK_ITEMS = 100000
+# Per-item errors listed in the response; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class InvalidLine:
+    """Placeholder for an NDJSON line that is not valid JSON."""
+
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Parse an NDJSON byte stream, yielding one item per non-empty line."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return InvalidLine(f"Invalid JSON: {exc}")
+
+
+async def iter_list(items: List[Any]) -> AsyncIterator[Any]:
+    """Adapt an already parsed JSON array to the item stream interface."""
+    for item in items:
+        yield item
+
+
+def _validation_detail(exc: ValidationError) -> List[Dict[str, Any]]:
+    return [{"loc": list(error["loc"]), "msg": error["msg"]} for error in exc.errors()]
+
+
+class BulkIngest:
+    """Accumulates the outcome of one bulk request."""
+
+    def __init__(self, collection, user_id: str,
+                 record_changes: Callable[[list], Awaitable[None]],
+                 chunk_size: Optional[int] = None,
+                 rate_version: Optional[int] = None):
+        self.collection = collection
+        self.user_id = user_id
+        self.rate_version = rate_version
+        self.record_changes = record_changes
+        self.chunk_size = chunk_size or BULK_CHUNK_SIZE
+        self.inserted = 0
+        self.failed = 0
+        self.truncated = False
+        self.errors: List[Dict[str, Any]] = []
+
+    def _fail(self, index: int, detail: Any) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"index": index, "detail": detail})
+
+    def _validate(self, index: int, item: Any):
+        if isinstance(item, InvalidLine):
+            self._fail(index, item.detail)
+            return None
+        if not isinstance(item, dict):
+            self._fail(index, "Item must be a JSON object")
+            return None
+        try:
+            calculation_data = CalculationCreate(**item)
+        except ValidationError as exc:
+            self._fail(index, _validation_detail(exc))
+            return None
+        calculation = Calculation(
+            user_id=self.user_id, rate_version=self.rate_version, **calculation_data.dict()
+        )
+        return calculation.dict(by_alias=True)
+
+    async def _write(self, chunk: List[Tuple[int, Dict[str, Any]]]) -> None:
+        docs = [doc for _, doc in chunk]
+        failed_positions = set()
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                failed_positions.add(error["index"])
+                self._fail(chunk[error["index"]][0], error.get("errmsg", "Write failed"))
+
+        inserted = [doc for position, doc in enumerate(docs) if position not in failed_positions]
+        self.inserted += len(inserted)
+        if inserted:
+            await self.record_changes([(None, doc) for doc in inserted])
+
+    async def run(self, items: AsyncIterator[Any]) -> Dict[str, Any]:
+        """Validate and insert every item, chunk by chunk."""
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        index = -1
+        async for item in items:
+            index += 1
+            if index >= MAX_BULK_ITEMS:
+                self.truncated = True
+                break
+            doc = self._validate(index, item)
+            if doc is not None:
+                chunk.append((index, doc))
+            if len(chunk) >= self.chunk_size:
+                await self._write(chunk)
+                chunk = []
+        if chunk:
+            await self._write(chunk)
+
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "truncated": self.truncated,
+            "errors": self.errors,
+        }
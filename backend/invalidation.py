@@ -0,0 +1,243 @@
+"""Cross-process invalidation of per-process state.
+
+Several pieces of state live in each API process: the in-memory cache
+backends (profile bodies, ETag version tokens), the leaderboard ranking and
+the rate table snapshot. When one worker changes the data behind them, the
+other workers hear about it on this bus and drop or patch their copy.
+
+``INVALIDATION_BUS`` picks the transport:
+
+* ``none`` (default): messages stay in the process; fine for one worker
+* ``redis``: Redis pub/sub on ``INVALIDATION_CHANNEL`` (``REDIS_URL``)
+* ``mongo``: a capped ``invalidations`` collection followed with a tailable
+  cursor, for deployments without Redis
+
+Delivery is best effort. A worker that misses a message (for example while
+reconnecting) serves stale data only until the entry's TTL, the next
+leaderboard rebuild or the next rates poll.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from pymongo import DESCENDING, CursorType
+from pymongo.errors import CollectionInvalid
+
+from cache import CacheBackend, MemoryCache, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_BUS = os.environ.get("INVALIDATION_BUS", "none").lower()
+INVALIDATION_CHANNEL = os.environ.get("INVALIDATION_CHANNEL", "greenwallet:invalidation")
+INVALIDATION_COLLECTION_BYTES = 1024 * 1024
+
+CACHE_DELETE = "cache.delete"
+
+Handler = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+# Named caches that cache.delete messages can target
+CACHES: Dict[str, CacheBackend] = {}
+
+
+class InvalidationBus:
+    """Fan-out of invalidation messages; subclasses carry them between processes.
+
+    Handlers run for messages from other processes only; the publishing
+    process has already applied the change itself.
+    """
+
+    transport = "none"
+
+    def __init__(self):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._handlers: Dict[str, List[Handler]] = {}
+        self.published = 0
+        self.received = 0
+
+    def on(self, kind: str, handler: Handler) -> None:
+        self._handlers.setdefault(kind, []).append(handler)
+
+    async def publish(self, kind: str, **payload: Any) -> None:
+        message = {"kind": kind, "origin": self.origin, **payload}
+        try:
+            await self._send(message)
+            self.published += 1
+        except Exception:
+            logger.exception("Could not publish %s invalidation", kind)
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        pass
+
+    async def dispatch(self, message: Dict[str, Any]) -> None:
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        for handler in self._handlers.get(message.get("kind"), ()):
+            try:
+                result = handler(message)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", message.get("kind"))
+
+    async def listen(self) -> None:
+        """Receive messages until cancelled; reconnects after errors."""
+        while True:
+            try:
+                await self._listen()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Invalidation bus disconnected; reconnecting in 5s")
+                await asyncio.sleep(5)
+
+    async def _listen(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"transport": self.transport, "published": self.published, "received": self.received}
+
+
+class RedisBus(InvalidationBus):
+    transport = "redis"
+
+    def __init__(self, client, channel: str = INVALIDATION_CHANNEL):
+        super().__init__()
+        self.client = client
+        self.channel = channel
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        await self.client.publish(self.channel, json.dumps(message))
+
+    async def _listen(self) -> None:
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for item in pubsub.listen():
+                if item.get("type") == "message":
+                    await self.dispatch(json.loads(item["data"]))
+        finally:
+            await pubsub.close()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class MongoBus(InvalidationBus):
+    """Messages are inserted into a capped collection and tailed by every worker.
+
+    A capped collection returns documents in insertion order, which neither
+    the workers' clocks nor their client-generated ``_id`` values follow.
+    After a cursor dies the listener therefore re-reads the collection in
+    that order and resumes after the ``_id`` of the last message it handled,
+    matched exactly rather than compared.
+    """
+
+    transport = "mongo"
+
+    def __init__(self, db, collection_name: str = "invalidations"):
+        super().__init__()
+        self.db = db
+        self.collection = db[collection_name]
+        self.last_id = None
+        self._positioned = False
+
+    async def ensure_collection(self) -> None:
+        try:
+            await self.db.create_collection(
+                self.collection.name, capped=True, size=INVALIDATION_COLLECTION_BYTES
+            )
+        except CollectionInvalid:
+            pass
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        await self.collection.insert_one({**message, "sent_at": datetime.utcnow()})
+
+    async def _listen(self) -> None:
+        await self.ensure_collection()
+        if not self._positioned:
+            # Messages sent before this worker started are not for it
+            newest = await self.collection.find_one({}, {"_id": 1}, sort=[("$natural", DESCENDING)])
+            self.last_id = newest["_id"] if newest else None
+            self._positioned = True
+        while True:
+            skipping = self.last_id is not None
+            if skipping and await self.collection.count_documents({"_id": self.last_id}, limit=1) == 0:
+                logger.warning("Invalidation messages were overwritten before this worker read them")
+                skipping = False
+            cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                async for doc in cursor:
+                    if skipping:
+                        skipping = doc["_id"] != self.last_id
+                        continue
+                    self.last_id = doc.pop("_id")
+                    await self.dispatch(doc)
+            # A tailable cursor on an empty collection dies at once
+            await asyncio.sleep(1)
+
+
+def create_bus(transport: str = INVALIDATION_BUS, db=None) -> InvalidationBus:
+    """Build the configured bus; ``mongo`` needs the database."""
+    if transport == "none":
+        return InvalidationBus()
+    if transport == "redis":
+        import redis.asyncio as redis
+        return RedisBus(redis.from_url(REDIS_URL))
+    if transport == "mongo":
+        if db is None:
+            raise ValueError("INVALIDATION_BUS=mongo needs a database")
+        return MongoBus(db)
+    raise ValueError(f"Unknown INVALIDATION_BUS {transport!r}; expected 'none', 'redis' or 'mongo'")
+
+
+bus = InvalidationBus()
+
+
+def use_bus(new_bus: InvalidationBus) -> InvalidationBus:
+    """Install the process-wide bus, keeping the registered handlers."""
+    global bus
+    new_bus._handlers = bus._handlers
+    bus = new_bus
+    return bus
+
+
+def register_cache(name: str, cache: CacheBackend) -> CacheBackend:
+    """Make a cache addressable by cache.delete messages."""
+    CACHES[name] = cache
+    return cache
+
+
+async def broadcast_delete(name: str, *keys: str) -> None:
+    """Tell other processes to drop ``keys`` from their copy of a cache.
+
+    Only per-process caches need this; a shared Redis cache is already
+    consistent.
+    """
+    if keys and isinstance(CACHES.get(name), MemoryCache):
+        await bus.publish(CACHE_DELETE, cache=name, keys=list(keys))
+
+
+async def invalidate(name: str, *keys: str) -> None:
+    """Delete ``keys`` from a named cache here and in every other process."""
+    await CACHES[name].delete(*keys)
+    await broadcast_delete(name, *keys)
+
+
+async def _on_cache_delete(message: Dict[str, Any]) -> None:
+    cache: Optional[CacheBackend] = CACHES.get(message.get("cache"))
+    if cache is not None:
+        await cache.delete(*message.get("keys", ()))
+
+
+bus.on(CACHE_DELETE, _on_cache_delete)
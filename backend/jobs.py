@@ -0,0 +1,219 @@
+"""Background jobs backed by the ``jobs`` collection.
+
+``enqueue`` inserts a ``queued`` job document. Workers (``python worker.py``,
+any number of processes, or the API itself with ``JOBS_IN_PROCESS=1``)
+``claim`` the oldest runnable job with one ``find_one_and_update`` and hold
+a lease on it. Handlers report progress through ``JobContext.checkpoint``,
+which saves the progress document and renews the lease in the same write.
+
+A job whose worker dies keeps ``running`` until its lease expires; the next
+worker to claim it gets the saved progress back and resumes from its last
+checkpoint. Jobs are given up after ``MAX_ATTEMPTS`` claims. A handler that
+raises fails the job right away, since retrying the same input would fail
+the same way.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "2"))
+MAX_ATTEMPTS = 3
+
+# Also run a worker inside each API process (handy for development)
+JOBS_IN_PROCESS = os.environ.get("JOBS_IN_PROCESS", "0") == "1"
+
+Handler = Callable[["JobContext"], Awaitable[None]]
+
+HANDLERS: Dict[str, Handler] = {}
+
+
+class LeaseLost(Exception):
+    """Raised when another worker has taken over the job."""
+
+
+def handler(kind: str) -> Callable[[Handler], Handler]:
+    """Register the function that runs jobs of ``kind``."""
+    def decorator(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def enqueue(jobs_collection, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue a job, or return the queued/running one with the same parameters."""
+    existing = await jobs_collection.find_one(
+        {"kind": kind, "params": params, "status": {"$in": list(ACTIVE_STATUSES)}}
+    )
+    if existing is not None:
+        return existing
+
+    now = datetime.utcnow()
+    job = {
+        "_id": str(uuid.uuid4()),
+        "kind": kind,
+        "params": params,
+        "status": QUEUED,
+        "progress": {},
+        "attempts": 0,
+        "error": None,
+        "worker": None,
+        "lease_until": None,
+        "created_at": now,
+        "finished_at": None,
+        "updated_at": now,
+    }
+    await jobs_collection.insert_one(job)
+    return job
+
+
+async def claim(jobs_collection, worker_id: str) -> Optional[Dict[str, Any]]:
+    """Take the oldest queued job, or a running one whose lease has expired."""
+    now = datetime.utcnow()
+    await jobs_collection.update_many(
+        {"status": RUNNING, "lease_until": {"$lt": now}, "attempts": {"$gte": MAX_ATTEMPTS}},
+        {"$set": {
+            "status": FAILED, "error": "Worker lease expired too many times",
+            "finished_at": now, "updated_at": now,
+        }},
+    )
+    return await jobs_collection.find_one_and_update(
+        {"$or": [
+            {"status": QUEUED},
+            {"status": RUNNING, "lease_until": {"$lt": now}},
+        ]},
+        {
+            "$set": {
+                "status": RUNNING,
+                "worker": worker_id,
+                "lease_until": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+            # Only set by the first claim; resumed jobs keep it
+            "$min": {"started_at": now},
+        },
+        sort=[("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def finish(jobs_collection, job_id: str, worker_id: str, error: Optional[str] = None) -> None:
+    """Mark a job succeeded, or failed with ``error``."""
+    now = datetime.utcnow()
+    await jobs_collection.update_one(
+        {"_id": job_id, "worker": worker_id},
+        {"$set": {
+            "status": FAILED if error else SUCCEEDED,
+            "error": error,
+            "lease_until": None,
+            "finished_at": now,
+            "updated_at": now,
+        }},
+    )
+
+
+class JobContext:
+    """What a handler gets: the claimed job and a way to save progress."""
+
+    def __init__(self, jobs_collection, job: Dict[str, Any], worker_id: str, db):
+        self.jobs_collection = jobs_collection
+        self.job = job
+        self.worker_id = worker_id
+        self.db = db
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self.job["params"]
+
+    @property
+    def progress(self) -> Dict[str, Any]:
+        return self.job.get("progress") or {}
+
+    @property
+    def resumed(self) -> bool:
+        """Whether an earlier attempt already made progress on this job."""
+        return self.job["attempts"] > 1 and bool(self.progress)
+
+    async def checkpoint(self, progress: Dict[str, Any]) -> None:
+        """Save progress and renew the lease; raises LeaseLost if taken over."""
+        now = datetime.utcnow()
+        result = await self.jobs_collection.update_one(
+            {"_id": self.job["_id"], "worker": self.worker_id, "status": RUNNING},
+            {"$set": {
+                "progress": progress,
+                "lease_until": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            }},
+        )
+        if result.matched_count != 1:
+            raise LeaseLost(self.job["_id"])
+        self.job["progress"] = progress
+
+
+async def run_job(db, job: Dict[str, Any], worker_id: str) -> None:
+    """Run one claimed job to completion and record the outcome."""
+    context = JobContext(db.jobs, job, worker_id, db)
+    run = HANDLERS.get(job["kind"])
+    if run is None:
+        await finish(db.jobs, job["_id"], worker_id, error=f"Unknown job kind: {job['kind']}")
+        return
+
+    logger.info("Running %s job %s (attempt %d)", job["kind"], job["_id"], job["attempts"])
+    try:
+        await run(context)
+    except LeaseLost:
+        logger.warning("Lost the lease on job %s; leaving it to the new worker", job["_id"])
+        return
+    except asyncio.CancelledError:
+        # Shutting down: the lease runs out and another worker resumes it
+        raise
+    except Exception as exc:
+        logger.exception("Job %s failed", job["_id"])
+        await finish(db.jobs, job["_id"], worker_id, error=str(exc) or type(exc).__name__)
+        return
+    await finish(db.jobs, job["_id"], worker_id)
+    logger.info("Finished %s job %s", job["kind"], job["_id"])
+
+
+async def run_worker(
+    db,
+    worker_id: Optional[str] = None,
+    poll_interval: float = POLL_INTERVAL_SECONDS,
+    burst: bool = False,
+) -> None:
+    """Claim and run jobs until cancelled; with ``burst``, until the queue is empty."""
+    worker_id = worker_id or default_worker_id()
+    while True:
+        try:
+            job = await claim(db.jobs, worker_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Could not claim a job; retrying")
+            job = None
+        if job is not None:
+            await run_job(db, job, worker_id)
+            continue
+        if burst:
+            return
+        await asyncio.sleep(poll_interval)
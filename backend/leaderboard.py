@@ -0,0 +1,173 @@
+"""Points leaderboard.
+
+Rankings are kept in memory as a ``SortedList`` of ``(-points, user_id)``,
+so point changes, rank lookups, top-N slices and neighbourhoods are all
+logarithmic instead of grouping ``calculations`` per request. The calculation
+routes push each user's new ``total_points`` as their stats change, which
+``publish_points`` also sends to the other API processes over the
+invalidation bus, and ``publish_removals`` drops users whose stats were
+deleted. A periodic rebuild from ``user_stats`` corrects any drift (e.g.
+writes by the job worker or a missed message); it is merged into the live
+ranking so changes that land while it scans are kept.
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+import invalidation
+
+logger = logging.getLogger(__name__)
+
+REBUILD_INTERVAL_SECONDS = 300
+
+POINTS_CHANGED = "leaderboard.points"
+POINTS_REMOVED = "leaderboard.removed"
+
+
+class Leaderboard:
+    """Users ranked by points, highest first; ties are ordered by user id."""
+
+    def __init__(self):
+        self._keys: SortedList = SortedList()
+        self._points: Dict[str, int] = {}
+        # Change counter and the value it had at each user's last change
+        self._clock = 0
+        self._changed_at: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self, entries: Iterable[Tuple[str, int]]) -> None:
+        """Replace the whole ranking."""
+        self._points = {user_id: int(points) for user_id, points in entries}
+        self._keys = SortedList((-points, user_id) for user_id, points in self._points.items())
+        self._changed_at.clear()
+
+    def mark(self) -> int:
+        """Position in the change history, to pass to ``merge`` after a scan."""
+        return self._clock
+
+    def merge(self, entries: Iterable[Tuple[str, int]], since: int) -> None:
+        """Apply a full scan started at ``mark() == since``.
+
+        Users updated or removed after the mark keep their live entry, which
+        is newer than what the scan read; everyone else takes the scanned
+        points, and users missing from the scan are dropped.
+        """
+        scanned = {user_id: int(points) for user_id, points in entries}
+        for user_id in [user_id for user_id in self._points if user_id not in scanned]:
+            if self._changed_at.get(user_id, 0) <= since:
+                self._remove(user_id)
+        for user_id, points in scanned.items():
+            if self._changed_at.get(user_id, 0) <= since:
+                self._set(user_id, points)
+        self._changed_at = {
+            user_id: changed for user_id, changed in self._changed_at.items() if changed > since
+        }
+
+    def update(self, user_id: str, points: int) -> None:
+        """Set a user's points, moving them to their new position."""
+        self._touch(user_id)
+        self._set(user_id, int(points))
+
+    def remove(self, user_id: str) -> None:
+        self._touch(user_id)
+        self._remove(user_id)
+
+    def _touch(self, user_id: str) -> None:
+        self._clock += 1
+        self._changed_at[user_id] = self._clock
+
+    def _set(self, user_id: str, points: int) -> None:
+        old_points = self._points.get(user_id)
+        if old_points == points:
+            return
+        if old_points is not None:
+            self._keys.remove((-old_points, user_id))
+        self._keys.add((-points, user_id))
+        self._points[user_id] = points
+
+    def _remove(self, user_id: str) -> None:
+        old_points = self._points.pop(user_id, None)
+        if old_points is not None:
+            self._keys.remove((-old_points, user_id))
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based rank of a user, or None if they are not ranked."""
+        points = self._points.get(user_id)
+        if points is None:
+            return None
+        return self._keys.bisect_left((-points, user_id)) + 1
+
+    def points(self, user_id: str) -> Optional[int]:
+        return self._points.get(user_id)
+
+    def slice(self, start: int, stop: int) -> List[Tuple[int, str, int]]:
+        """``(rank, user_id, points)`` for 0-based positions ``start:stop``."""
+        start = max(start, 0)
+        return [
+            (position + 1, user_id, -negative_points)
+            for position, (negative_points, user_id)
+            in enumerate(self._keys.islice(start, stop), start=start)
+        ]
+
+    def top(self, count: int) -> List[Tuple[int, str, int]]:
+        return self.slice(0, count)
+
+    def around(self, user_id: str, radius: int) -> List[Tuple[int, str, int]]:
+        """The user's entry plus up to ``radius`` neighbours on each side."""
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        return self.slice(rank - 1 - radius, rank + radius)
+
+
+leaderboard = Leaderboard()
+
+
+async def publish_points(user_id: str, points: int, board: Leaderboard = leaderboard) -> None:
+    """Update a user's points here and in every other API process."""
+    board.update(user_id, points)
+    await invalidation.bus.publish(POINTS_CHANGED, user_id=user_id, points=points)
+
+
+async def publish_removals(user_ids: Iterable[str], board: Leaderboard = leaderboard) -> None:
+    """Drop users whose stats were deleted, here and in every other API process."""
+    for user_id in user_ids:
+        board.remove(user_id)
+        await invalidation.bus.publish(POINTS_REMOVED, user_id=user_id)
+
+
+invalidation.bus.on(
+    POINTS_CHANGED, lambda message: leaderboard.update(message["user_id"], message["points"])
+)
+invalidation.bus.on(POINTS_REMOVED, lambda message: leaderboard.remove(message["user_id"]))
+
+
+async def rebuild(user_stats_collection, board: Leaderboard = leaderboard) -> int:
+    """Reload the ranking from the materialized user stats.
+
+    The scan is merged into the live ranking rather than replacing it, so
+    an update published while it runs is not reverted.
+    """
+    since = board.mark()
+    cursor = user_stats_collection.find({}, {"total_points": 1})
+    board.merge([(doc["_id"], doc.get("total_points", 0)) async for doc in cursor], since)
+    return len(board)
+
+
+async def rebuild_periodically(
+    user_stats_collection,
+    interval: float = REBUILD_INTERVAL_SECONDS,
+    board: Leaderboard = leaderboard,
+) -> None:
+    """Rebuild the ranking now and then every ``interval`` seconds."""
+    while True:
+        try:
+            ranked = await rebuild(user_stats_collection, board)
+            logger.info("Leaderboard rebuilt with %d users", ranked)
+        except Exception:
+            logger.exception("Leaderboard rebuild failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,93 @@
+"""GreenWallet maintenance commands.
+
+Run from the backend directory, e.g. ``python manage.py rebuild-stats``.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Optional
+
+import typer
+from dotenv import load_dotenv
+import database
+import indexes
+import invalidation
+import leaderboard
+import rollups
+import stats
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+cli = typer.Typer(help="GreenWallet maintenance commands.")
+
+
+def get_database():
+    """Connect to the configured MongoDB database."""
+    client = database.create_client(os.environ['MONGO_URL'])
+    return client, client[os.environ['DB_NAME']]
+
+
+@cli.command("rebuild-stats")
+def rebuild_stats(
+    user_id: Optional[str] = typer.Option(None, help="Only rebuild this user's stats.")
+):
+    """Recompute materialized user stats from the calculations collection."""
+    async def run():
+        client, db = get_database()
+        # Tells the API processes to unrank users whose stats were removed
+        bus = invalidation.use_bus(invalidation.create_bus(db=db))
+        try:
+            await stats.rebuild_user_stats(
+                db.calculations, db.user_stats, user_id=user_id,
+                on_removed=leaderboard.publish_removals,
+            )
+        finally:
+            await bus.close()
+            client.close()
+
+    asyncio.run(run())
+    typer.echo(f"Rebuilt stats for {user_id or 'all users'}")
+
+
+@cli.command("rebuild-rollups")
+def rebuild_rollups(
+    user_id: Optional[str] = typer.Option(None, help="Only rebuild this user's rollups."),
+    batch_size: int = typer.Option(rollups.REBUILD_BATCH_SIZE, help="Calculations per batch."),
+):
+    """Backfill daily and monthly rollups from the calculations collection."""
+    async def run():
+        client, db = get_database()
+        try:
+            return await rollups.rebuild_rollups(
+                db.calculations, db.calculation_rollups,
+                user_id=user_id, batch_size=batch_size,
+            )
+        finally:
+            client.close()
+
+    processed = asyncio.run(run())
+    typer.echo(f"Rolled up {processed} calculations for {user_id or 'all users'}")
+
+
+@cli.command("indexes")
+def manage_indexes(
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Only report missing indexes and query plans."
+    )
+):
+    """Create the declared indexes and print each route's query plan."""
+    async def run():
+        client, db = get_database()
+        try:
+            if not dry_run:
+                await indexes.ensure_indexes(db)
+            typer.echo(await indexes.index_report(db))
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    cli()
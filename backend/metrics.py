@@ -0,0 +1,291 @@
+"""Latency instrumentation exposed in the Prometheus text format.
+
+``InstrumentMiddleware`` is an ASGI middleware timing every request per route
+template. MongoDB commands are timed by ``MongoCommandListener`` (passed to
+the Motor client), bcrypt and JWT work by ``auth``, and response encoding
+by ``serialization``. ``render`` produces the ``/api/metrics`` payload.
+
+With ``PROFILING_ENABLED`` set, a request carrying ``X-Profile: 1`` is
+sampled by ``StackSampler`` while it runs; if it takes longer than
+``PROFILE_SLOW_SECONDS`` the samples are written to ``PROFILE_DIR`` as
+collapsed stacks, the input format of flamegraph.pl and speedscope.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/greenwallet-profiles")
+PROFILE_SLOW_SECONDS = float(os.environ.get("PROFILE_SLOW_SECONDS", "0.1"))
+PROFILE_INTERVAL_SECONDS = float(os.environ.get("PROFILE_INTERVAL_SECONDS", "0.005"))
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[str, ...]
+
+
+def _label_text(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative-bucket histogram; safe to observe from pymongo's threads."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # per-bucket counts, then +Inf count and sum
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _label_text(self.labelnames, labels, f'le="{le}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labelnames, labels)} {values[-1]}"
+            yield f"{self.name}_count{_label_text(self.labelnames, labels)} {cumulative}"
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+REGISTRY: List = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status"),
+))
+MONGO_SECONDS = register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency reported by the driver.",
+    ("command", "outcome"),
+))
+AUTH_SECONDS = register(Histogram(
+    "auth_duration_seconds",
+    "Time spent hashing/verifying passwords (including executor queueing) and in JWT encode/decode.",
+    ("operation",),
+))
+SERIALIZATION_SECONDS = register(Histogram(
+    "response_serialization_duration_seconds", "Time spent encoding response bodies.",
+    ("encoder",),
+))
+
+
+class CacheGauges:
+    """``cache_<stat>{cache=...}`` gauges read from registered ``stats()`` callables."""
+
+    STATS = ("size", "hits", "misses", "hit_rate")
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], Dict[str, Optional[float]]]] = {}
+
+    def collect(self) -> Iterable[str]:
+        snapshots = {name: stats() for name, stats in sorted(self.sources.items())}
+        for key in self.STATS:
+            yield f"# HELP cache_{key} Cache {key.replace('_', ' ')}."
+            yield f"# TYPE cache_{key} gauge"
+            for name, snapshot in snapshots.items():
+                if snapshot.get(key) is not None:
+                    yield f'cache_{key}{{cache="{_escape(name)}"}} {snapshot[key]}'
+
+
+CACHE_GAUGES = register(CacheGauges())
+
+
+def register_cache_stats(name: str, stats: Callable[[], Dict[str, Optional[float]]]) -> None:
+    """Expose a cache's ``stats()`` counters on the metrics endpoint."""
+    CACHE_GAUGES.sources[name] = stats
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Record the driver-measured duration of every MongoDB command."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_SECONDS.observe(event.duration_micros / 1e6, event.command_name, "succeeded")
+
+    def failed(self, event):
+        MONGO_SECONDS.observe(event.duration_micros / 1e6, event.command_name, "failed")
+
+
+class StackSampler:
+    """Sample one thread's Python stack on a background thread.
+
+    Requests share the event loop thread, so samples also include whatever
+    other requests were running at the time.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str) -> None:
+        """Write the samples as collapsed stacks, one ``stack count`` per line."""
+        with open(path, "w") as out:
+            for stack, count in self.samples.most_common():
+                out.write(f"{stack} {count}\n")
+
+
+_route_paths: Dict[Callable, str] = {}
+
+
+def _route_template(scope) -> str:
+    """Path template of the matched route, keeping the label set bounded."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in _route_paths:
+        for route in scope["app"].routes:
+            _route_paths[getattr(route, "endpoint", None)] = getattr(route, "path", "")
+    return _route_paths.get(endpoint, "unmatched")
+
+
+def _write_profile(sampler: StackSampler, filename: str) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    sampler.dump(os.path.join(PROFILE_DIR, filename))
+
+
+class InstrumentMiddleware:
+    """ASGI middleware timing requests and running the opt-in profiler.
+
+    Requests are timed until their response headers are sent; the body,
+    streamed or SSE, passes through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampler = None
+        if PROFILING_ENABLED and (b"x-profile", b"1") in scope.get("headers", ()):
+            sampler = StackSampler(threading.get_ident()).start()
+        start = time.perf_counter()
+        finished = False
+
+        async def finish(status_code: int) -> Optional[str]:
+            nonlocal finished
+            finished = True
+            elapsed = time.perf_counter() - start
+            route_path = _route_template(scope)
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route_path, str(status_code))
+            if sampler is None:
+                return None
+
+            # Joining the sampler thread and writing the file both block
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, sampler.stop)
+            if elapsed < PROFILE_SLOW_SECONDS:
+                return None
+            filename = f"{int(time.time())}-{uuid.uuid4().hex[:8]}.folded"
+            await loop.run_in_executor(None, _write_profile, sampler, filename)
+            logger.info("Profiled %s %s (%.3fs) to %s", scope["method"], route_path, elapsed, filename)
+            return filename
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start" and not finished:
+                filename = await finish(message["status"])
+                if filename is not None:
+                    headers = [*message.get("headers", ()), (b"x-profile-file", filename.encode())]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            if not finished:
+                await finish(500)
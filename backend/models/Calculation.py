@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 from enum import Enum
 import uuid
@@ -20,6 +20,8 @@ class Calculation(BaseModel):
     co2_reduced: float
     points: int
     details: Dict[str, Any] = Field(default_factory=dict)
+    # Rate table version in effect when the row was saved or recomputed
+    rate_version: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -64,8 +66,82 @@ class CalculationResponse(BaseModel):
     co2_reduced: float
     points: int
     details: Dict[str, Any]
+    rate_version: Optional[int] = None
     created_at: datetime
     updated_at: datetime
     
     class Config:
-        populate_by_name = True
\ No newline at end of file
+        populate_by_name = True
+
+class BulkItemError(BaseModel):
+    index: int
+    detail: Any
+
+class BulkInsertResponse(BaseModel):
+    inserted: int
+    failed: int
+    truncated: bool = False
+    errors: List[BulkItemError] = Field(default_factory=list)
+
+class BatchSelection(BaseModel):
+    """Rows to act on: explicit ids and/or a type and created_at range."""
+    ids: Optional[List[str]] = None
+    type: Optional[CalculationType] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+    class Config:
+        use_enum_values = True
+
+class BatchDeleteRequest(BatchSelection):
+    pass
+
+class BatchUpdateRequest(BatchSelection):
+    changes: CalculationUpdate
+
+class BatchResponse(BaseModel):
+    matched: int
+    stats_rebuilt: bool = False
+
+class ComputeRequest(BaseModel):
+    """Calculator inputs, either as row dicts or as columns of equal length."""
+    rows: Optional[List[Dict[str, Any]]] = None
+    columns: Optional[Dict[str, List[Any]]] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "rows": [
+                    {"monthly_bill": 2500, "rooftop_area": 300, "sunlight_hours": 6},
+                    {"monthly_bill": 4000, "rooftop_area": 500, "sunlight_hours": 5}
+                ]
+            }
+        }
+
+class ComputeResponse(BaseModel):
+    type: str
+    count: int
+    rate_version: int
+    results: Dict[str, List[Any]]
+
+class ScenarioRange(BaseModel):
+    """Numeric range with inclusive stop, split by step or into num values."""
+    start: float
+    stop: float
+    step: Optional[float] = None
+    num: Optional[int] = None
+
+class ScenarioRequest(BaseModel):
+    """Calculator inputs as single values, lists or ranges, one axis each."""
+    inputs: Dict[str, Union[ScenarioRange, List[Any], float, str]]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "inputs": {
+                    "rooftop_area": {"start": 50, "stop": 500, "step": 50},
+                    "sunlight_hours": {"start": 3, "stop": 8, "step": 1},
+                    "monthly_bill": 3000
+                }
+            }
+        }
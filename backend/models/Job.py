@@ -0,0 +1,37 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+from models.Calculation import CalculationType
+
+class RecomputeRequest(BaseModel):
+    """Rows to recompute (everything by default) and the rate version to use."""
+    type: Optional[CalculationType] = None
+    user_id: Optional[str] = None
+    rate_version: Optional[int] = None
+
+    class Config:
+        use_enum_values = True
+
+class JobProgress(BaseModel):
+    scanned: int = 0
+    updated: int = 0
+    skipped: int = 0
+    rebuilt_users: int = 0
+    last_id: Optional[str] = None
+
+class JobResponse(BaseModel):
+    id: str = Field(alias="_id")
+    kind: str
+    status: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    progress: JobProgress = Field(default_factory=JobProgress)
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime
+
+    class Config:
+        populate_by_name = True
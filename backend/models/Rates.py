@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+class RatesResponse(BaseModel):
+    version: int
+    effective_from: datetime
+    rates: Dict[str, Any]
+
+class RatesPublish(BaseModel):
+    """Rates to change, merged onto the latest version."""
+    rates: Dict[str, Any] = Field(default_factory=dict)
+    effective_from: Optional[datetime] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "rates": {"electricity": 7.5, "solar": {"tariff": 6.5}},
+                "effective_from": "2025-04-01T00:00:00Z"
+            }
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import Optional, Dict, List
 from datetime import datetime
 import uuid
 
@@ -39,8 +39,47 @@ class UserResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+class TypeStats(BaseModel):
+    total_saved: float = 0.0
+    total_co2_reduced: float = 0.0
+    total_points: int = 0
+    calculation_count: int = 0
+
 class UserStats(BaseModel):
     total_saved: float = 0.0
     total_co2_reduced: float = 0.0
     total_points: int = 0
-    calculation_count: int = 0
\ No newline at end of file
+    calculation_count: int = 0
+    by_type: Dict[str, TypeStats] = Field(default_factory=dict)
+
+class TrendBucket(BaseModel):
+    bucket: datetime
+    type: str
+    money_saved: float = 0.0
+    co2_reduced: float = 0.0
+    points: int = 0
+    count: int = 0
+
+class UserTrends(BaseModel):
+    granularity: str
+    buckets: List[TrendBucket] = Field(default_factory=list)
+
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: str
+    name: str
+    points: int
+
+class LeaderboardResponse(BaseModel):
+    total_users: int
+    entries: List[LeaderboardEntry] = Field(default_factory=list)
+
+class LeaderboardPosition(BaseModel):
+    rank: Optional[int] = None
+    points: int = 0
+    total_users: int
+    neighbours: List[LeaderboardEntry] = Field(default_factory=list)
\ No newline at end of file
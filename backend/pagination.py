@@ -0,0 +1,77 @@
+"""Keyset (cursor) pagination for calculation history.
+
+A cursor is an opaque, URL-safe token encoding the sort key and ``_id`` of
+the last row of a page. The next page is everything strictly after that
+pair in ``(sort field, _id)`` order, which is a range scan on the matching
+``user_id, <field>, _id`` index no matter how deep the page is.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from pymongo import DESCENDING
+
+# Fields history can be sorted by; each has a user_id, <field>, _id index
+SORT_FIELDS = ("created_at", "money_saved", "co2_reduced", "points")
+
+# Default order every legacy cursor is relative to; _id breaks ties
+CURSOR_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+def sort_spec(field: str = "created_at", direction: int = DESCENDING) -> List[Tuple[str, int]]:
+    """Sort by ``field`` with ``_id`` as the tie-breaker in the same direction."""
+    return [(field, direction), ("_id", direction)]
+
+
+def encode_cursor(doc: Dict[str, Any], field: str = "created_at", direction: int = DESCENDING) -> str:
+    """Encode the position of a calculation document as a cursor.
+
+    Accepts raw documents as well as ones projected to the response shape.
+    """
+    doc_id = doc["_id"] if "_id" in doc else doc["id"]
+    value = doc[field]
+    if isinstance(value, datetime):
+        payload = {"t": value.isoformat(), "id": doc_id}
+    else:
+        payload = {"v": value, "id": doc_id}
+    if field != "created_at":
+        payload["f"] = field
+    if direction != DESCENDING:
+        payload["d"] = direction
+    encoded = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(encoded.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, Any, str]:
+    """Decode a cursor into ``(field, direction, value, _id)``; raises ValueError if invalid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        field = payload.get("f", "created_at")
+        if field not in SORT_FIELDS:
+            raise ValueError(field)
+        if "t" in payload:
+            value = datetime.fromisoformat(payload["t"])
+        else:
+            value = payload["v"]
+            if not isinstance(value, (int, float)):
+                raise ValueError(value)
+        return field, int(payload.get("d", DESCENDING)), value, str(payload["id"])
+    except (ValueError, TypeError, KeyError, AttributeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def cursor_filter(cursor: str, field: str = "created_at", direction: int = DESCENDING) -> Dict[str, Any]:
+    """Build the query clause selecting rows after the cursor position.
+
+    Raises ValueError if the cursor is invalid or was issued for another order.
+    """
+    cursor_field, cursor_direction, value, last_id = decode_cursor(cursor)
+    if (cursor_field, cursor_direction) != (field, direction):
+        raise ValueError("Cursor does not match the sort order")
+    after = "$lt" if direction == DESCENDING else "$gt"
+    return {"$or": [
+        {field: {after: value}},
+        {field: value, "_id": {after: last_id}},
+    ]}
@@ -0,0 +1,221 @@
+"""Versioned, effective-dated rate tables.
+
+Every published set of rates is one document in ``rate_tables``, keyed by
+an increasing integer version::
+
+    {"_id": 3, "effective_from": <datetime>, "rates": {...}, "created_at": ...}
+
+Versions are never edited; a change publishes a new version. The built-in
+``engine.DEFAULT_RATES`` are version 0 and apply until the first published
+version takes effect.
+
+Each process keeps every version it has seen in ``tables``, frozen into
+read-only ``RateSnapshot`` objects. The current snapshot is picked from
+memory by ``effective_from``, so no request reads the collection. A
+background task polls for versions newer than the highest one known,
+which is one ``_id`` index lookup per ``RATES_POLL_SECONDS``.
+"""
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+import engine
+
+logger = logging.getLogger(__name__)
+
+RATES_POLL_SECONDS = float(os.environ.get("RATES_POLL_SECONDS", "30"))
+
+DEFAULT_VERSION = 0
+
+
+class RateTableError(ValueError):
+    """Raised for invalid rates or an unknown version."""
+
+
+class RateVersionConflict(RateTableError):
+    """Raised when another process published the same version first."""
+
+
+def freeze(value: Any) -> Any:
+    """Deep read-only copy: dicts become mapping proxies, lists tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Plain dict/list copy of a frozen value, e.g. for JSON or BSON."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+class RateSnapshot:
+    """One version of the rates; ``rates`` is read-only."""
+
+    __slots__ = ("version", "effective_from", "rates")
+
+    def __init__(self, version: int, effective_from: datetime, rates: Mapping[str, Any]):
+        self.version = version
+        self.effective_from = effective_from
+        self.rates = freeze(rates)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "effective_from": self.effective_from,
+            "rates": thaw(self.rates),
+        }
+
+
+DEFAULT_SNAPSHOT = RateSnapshot(DEFAULT_VERSION, datetime.min, engine.DEFAULT_RATES)
+
+
+def merge_rates(base: Mapping[str, Any], changes: Mapping[str, Any]) -> Dict[str, Any]:
+    """Apply partial ``changes`` on top of ``base``.
+
+    Top-level keys must already exist; nested tables may gain entries (a new
+    tree species, say), which must carry the same keys as their siblings.
+    Every leaf must be a finite, non-negative number.
+    """
+    merged = thaw(base)
+    for key, value in changes.items():
+        if key not in merged:
+            raise RateTableError(f"Unknown rate: {key}")
+        merged[key] = _merge_value(key, merged[key], value)
+    return merged
+
+
+def _merge_value(path: str, base: Any, value: Any) -> Any:
+    if isinstance(base, dict):
+        if not isinstance(value, Mapping):
+            raise RateTableError(f"Rate {path} must be a table")
+        merged = dict(base)
+        for key, item in value.items():
+            if key in base:
+                merged[key] = _merge_value(f"{path}.{key}", base[key], item)
+            else:
+                merged[key] = _new_entry(f"{path}.{key}", base, item)
+        return merged
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RateTableError(f"Rate {path} must be a number")
+    if not math.isfinite(value) or value < 0:
+        raise RateTableError(f"Rate {path} must be a finite, non-negative number")
+    return value
+
+
+def _new_entry(path: str, table: Dict[str, Any], value: Any) -> Any:
+    # Shaped like the existing entries, so the formulas find every key
+    sibling = next(iter(table.values()), None)
+    if not isinstance(sibling, dict):
+        return _merge_value(path, 0, value)
+    if not isinstance(value, Mapping):
+        raise RateTableError(f"Rate {path} must be a table")
+    missing = sorted(set(sibling) - set(value))
+    if missing:
+        raise RateTableError(f"Rate {path} is missing {', '.join(missing)}")
+    unknown = sorted(set(value) - set(sibling))
+    if unknown:
+        raise RateTableError(f"Unknown rate: {path}.{unknown[0]}")
+    return {key: _merge_value(f"{path}.{key}", sibling[key], item) for key, item in value.items()}
+
+
+class RateTables:
+    """In-process cache of every known rate version."""
+
+    def __init__(self):
+        self._versions: Dict[int, RateSnapshot] = {DEFAULT_VERSION: DEFAULT_SNAPSHOT}
+        # Ordered by effective_from, then version, for current()
+        self._timeline: List[RateSnapshot] = [DEFAULT_SNAPSHOT]
+
+    @property
+    def latest_version(self) -> int:
+        return max(self._versions)
+
+    def current(self, at: Optional[datetime] = None) -> RateSnapshot:
+        """The snapshot in effect at ``at`` (now by default)."""
+        at = at or datetime.utcnow()
+        for snapshot in reversed(self._timeline):
+            if snapshot.effective_from <= at:
+                return snapshot
+        return DEFAULT_SNAPSHOT
+
+    def get(self, version: Optional[int]) -> Optional[RateSnapshot]:
+        """A snapshot by version; ``None`` (rows saved before versioning) is 0."""
+        return self._versions.get(DEFAULT_VERSION if version is None else version)
+
+    def versions(self) -> List[RateSnapshot]:
+        return [self._versions[version] for version in sorted(self._versions)]
+
+    def add(self, doc: Mapping[str, Any]) -> RateSnapshot:
+        snapshot = RateSnapshot(doc["_id"], doc["effective_from"], doc["rates"])
+        self._versions[snapshot.version] = snapshot
+        # Swap in a new list so readers never see a half-sorted one
+        self._timeline = sorted(
+            self._versions.values(), key=lambda item: (item.effective_from, item.version)
+        )
+        return snapshot
+
+    async def refresh(self, rate_tables_collection) -> int:
+        """Load versions newer than the latest known; returns how many."""
+        newest = await rate_tables_collection.find_one({}, {"_id": 1}, sort=[("_id", DESCENDING)])
+        if newest is None or newest["_id"] <= self.latest_version:
+            return 0
+        loaded = 0
+        async for doc in rate_tables_collection.find(
+            {"_id": {"$gt": self.latest_version}}
+        ).sort("_id", ASCENDING):
+            self.add(doc)
+            loaded += 1
+        logger.info("Loaded rate versions up to %d", self.latest_version)
+        return loaded
+
+    async def publish(
+        self,
+        rate_tables_collection,
+        changes: Mapping[str, Any],
+        effective_from: Optional[datetime] = None,
+    ) -> RateSnapshot:
+        """Store ``changes`` merged onto the latest version as a new version."""
+        await self.refresh(rate_tables_collection)
+        latest = self._versions[self.latest_version]
+        now = datetime.utcnow()
+        if effective_from is not None and effective_from.tzinfo is not None:
+            # Stored and compared as naive UTC, like every other timestamp
+            effective_from = effective_from.astimezone(timezone.utc).replace(tzinfo=None)
+        doc = {
+            "_id": latest.version + 1,
+            "effective_from": effective_from or now,
+            "rates": merge_rates(latest.rates, changes),
+            "created_at": now,
+        }
+        try:
+            await rate_tables_collection.insert_one(doc)
+        except DuplicateKeyError:
+            raise RateVersionConflict("Another rate version was published at the same time; retry")
+        return self.add(doc)
+
+    async def poll(self, rate_tables_collection, interval: float = RATES_POLL_SECONDS) -> None:
+        """Refresh every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh(rate_tables_collection)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Rate table refresh failed")
+
+
+tables = RateTables()
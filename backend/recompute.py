@@ -0,0 +1,299 @@
+"""Recompute stored calculations from their ``details``.
+
+The ``recompute`` job walks ``calculations`` in ``_id`` order,
+``RECOMPUTE_CHUNK_SIZE`` rows at a time. Each chunk's ``details`` are parsed
+back into calculator inputs, evaluated with the vectorized engine in one
+pass per type, and rows whose ``money_saved``/``co2_reduced``/``points``
+changed are rewritten with one unordered ``bulk_write``. Stats and rollups
+get the matching deltas, and the job checkpoints the last ``_id`` so a
+restarted worker carries on from there.
+
+``details`` hold what the calculators display (``"300 sqft"``, option
+labels such as ``"Switch AC to Fan"``), so only rows whose details still
+map back to valid inputs can be recomputed; the others are counted as
+skipped and left alone. Water rows saved in bill mode keep no bill, so it
+is recovered from ``money_saved`` with the rates of the row's own
+``rate_version``.
+
+Rows are evaluated with the rate version pinned in the job's params (the
+current one when the job was queued) and stamped with it.
+
+A row edited while its chunk is being processed no longer matches its
+update (the filter includes ``updated_at``). The chunk's deltas are then
+discarded and the affected users' stats and rollups rebuilt instead; the
+same happens for the first chunk of a resumed job, whose writes may have
+been cut off half way by the crash.
+"""
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+
+import engine
+import etag
+import rate_tables
+import rollups
+import stats
+from jobs import JobContext, handler
+from rate_tables import DEFAULT_SNAPSHOT, RateSnapshot, RateTables
+
+RECOMPUTE_CHUNK_SIZE = 1000
+
+# Fields read for each row: inputs plus everything the deltas need
+RECOMPUTE_PROJECTION = {
+    "user_id": 1, "type": 1, "title": 1, "details": 1, "rate_version": 1,
+    "created_at": 1, "updated_at": 1, "money_saved": 1, "co2_reduced": 1, "points": 1,
+}
+
+# Option labels the calculators save in details -> engine keys
+APPLIANCE_LABELS = {
+    "Switch AC to Fan": "ac_to_fan",
+    "Reduce AC Usage (50%)": "ac_reduce",
+    "Switch to LED Bulbs": "led_bulb",
+    "Energy Star Appliances": "energy_star",
+}
+TRANSPORT_LABELS = {
+    "Taxi/Cab": "taxi",
+    "Personal Car": "car",
+    "Metro/Subway": "metro",
+    "Bus": "bus",
+}
+WATER_ACTION_LABELS = {
+    "Rainwater Harvesting": "rainwater",
+    "Low-flow Fixtures": "lowflow",
+    "Greywater Recycling": "greywater",
+    "Drip Irrigation": "drip",
+    "Fix Water Leaks": "leak",
+}
+# Title WaterCalculator.jsx saves in bill mode
+WATER_BILL_TITLE = "Monthly Bill Reduction"
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def _positive(value: Any) -> Optional[float]:
+    """Read a number out of a details value like ``"300 sqft"`` or ``6``."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str):
+        match = _NUMBER.search(value.replace(",", ""))
+        if match is None:
+            return None
+        number = float(match.group())
+    else:
+        return None
+    return number if number > 0 else None
+
+
+def _all_set(inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return inputs if all(value is not None for value in inputs.values()) else None
+
+
+def solar_inputs(doc, rates, saved_rates):
+    details = doc["details"]
+    return _all_set({
+        "rooftop_area": _positive(details.get("rooftop_area")),
+        "sunlight_hours": _positive(details.get("sunlight_hours")),
+    })
+
+
+def afforestation_inputs(doc, rates, saved_rates):
+    details = doc["details"]
+    species = str(details.get("tree_species", "")).strip().lower()
+    return _all_set({
+        "number_of_trees": _positive(details.get("number_of_trees")),
+        "land_area": _positive(details.get("land_area")),
+        "years_of_growth": _positive(details.get("years_of_growth")),
+        "tree_species": species if species in rates["tree_species"] else None,
+    })
+
+
+def water_inputs(doc, rates, saved_rates):
+    details = doc["details"]
+    if doc.get("title") == WATER_BILL_TITLE:
+        # Bill mode saves bill * water_bill_reduction as money_saved
+        money_saved = _positive(doc.get("money_saved"))
+        if money_saved is None:
+            return None
+        return {
+            "mode": "bill",
+            "monthly_bill": money_saved / saved_rates["water_bill_reduction"],
+            # Unused in bill mode, but the column must be valid for every row
+            "action": "rainwater",
+        }
+    return _all_set({
+        "mode": "liters",
+        "liters_per_month": _positive(details.get("litersPerMonth")),
+        "action": WATER_ACTION_LABELS.get(details.get("action")),
+    })
+
+
+def transport_inputs(doc, rates, saved_rates):
+    details = doc["details"]
+    frequency = details.get("frequency")
+    inputs = _all_set({
+        "distance": _positive(details.get("distance")),
+        "frequency": frequency if frequency in rates["transport_frequencies"] else None,
+        "current_mode": TRANSPORT_LABELS.get(details.get("from")),
+        "alternate_mode": TRANSPORT_LABELS.get(details.get("to")),
+    })
+    # The calculator refuses identical modes; so does the engine
+    if inputs is not None and inputs["current_mode"] == inputs["alternate_mode"]:
+        return None
+    return inputs
+
+
+def electricity_inputs(doc, rates, saved_rates):
+    details = doc["details"]
+    return _all_set({
+        "hours_per_day": _positive(details.get("hoursPerDay")),
+        "days_per_month": _positive(details.get("daysPerMonth")),
+        "appliance": APPLIANCE_LABELS.get(details.get("appliance")),
+    })
+
+
+INPUT_PARSERS = {
+    "solar": solar_inputs,
+    "afforestation": afforestation_inputs,
+    "water": water_inputs,
+    "transport": transport_inputs,
+    "electricity": electricity_inputs,
+}
+
+
+def _unchanged(doc: Dict[str, Any], values: Dict[str, Any]) -> bool:
+    if doc.get("rate_version") != values["rate_version"]:
+        return False
+    # The browser and NumPy can disagree in the last bits of a float
+    return doc.get("points") == values["points"] and all(
+        isinstance(doc.get(field), (int, float))
+        and math.isclose(doc[field], values[field], rel_tol=1e-9, abs_tol=1e-9)
+        for field in ("money_saved", "co2_reduced")
+    )
+
+
+def recompute_results(
+    docs: Iterable[Dict[str, Any]],
+    snapshot: RateSnapshot = DEFAULT_SNAPSHOT,
+    tables: RateTables = rate_tables.tables,
+) -> Tuple[List[Tuple[Dict[str, Any], Dict[str, Any]]], int]:
+    """Re-evaluate rows; returns ``(changed (doc, new values) pairs, skipped)``."""
+    rates = snapshot.rates
+    by_type: Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+    skipped = 0
+    for doc in docs:
+        parse = INPUT_PARSERS.get(doc.get("type"))
+        inputs = None
+        if parse is not None and isinstance(doc.get("details"), dict):
+            saved = tables.get(doc.get("rate_version")) or DEFAULT_SNAPSHOT
+            inputs = parse(doc, rates, saved.rates)
+        if inputs is None:
+            skipped += 1
+            continue
+        by_type.setdefault(doc["type"], []).append((doc, inputs))
+
+    changed = []
+    for calc_type, rows in by_type.items():
+        columns = engine.columns_from_rows([inputs for _, inputs in rows])
+        results = engine.compute(calc_type, columns, rates)
+        for (doc, _), money, co2, points in zip(
+            rows, results["money_saved"].tolist(), results["co2_reduced"].tolist(),
+            results["points"].tolist()
+        ):
+            values = {
+                "money_saved": money, "co2_reduced": co2, "points": points,
+                "rate_version": snapshot.version,
+            }
+            if not _unchanged(doc, values):
+                changed.append((doc, values))
+    return changed, skipped
+
+
+def build_query(params: Dict[str, Any]) -> Dict[str, Any]:
+    query = {}
+    if params.get("user_id"):
+        query["user_id"] = params["user_id"]
+    if params.get("type"):
+        query["type"] = params["type"]
+    return query
+
+
+async def rebuild_users(db, user_ids: Iterable[str]) -> None:
+    for user_id in user_ids:
+        await stats.rebuild_user_stats(db.calculations, db.user_stats, user_id=user_id)
+        await rollups.rebuild_rollups(db.calculations, db.calculation_rollups, user_id=user_id)
+        await etag.bump(user_id, etag.CALCULATIONS)
+
+
+async def record_changes(db, changes: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+    """Apply recompute deltas to the stats and rollups of every user touched."""
+    by_user: Dict[str, list] = {}
+    for change in changes:
+        by_user.setdefault(change[0]["user_id"], []).append(change)
+    for user_id, user_changes in by_user.items():
+        await stats.apply_increment(
+            db.calculations, db.user_stats, user_id, stats.build_increment(user_changes)
+        )
+        await etag.bump(user_id, etag.CALCULATIONS)
+    await rollups.apply_changes(db.calculation_rollups, changes)
+
+
+@handler("recompute")
+async def run_recompute(context: JobContext) -> None:
+    """Recompute money_saved, co2_reduced and points of the selected rows."""
+    db = context.db
+    await rate_tables.tables.refresh(db.rate_tables)
+    version = context.params.get("rate_version")
+    if version is None:
+        snapshot = rate_tables.tables.current()
+    else:
+        snapshot = rate_tables.tables.get(version)
+        if snapshot is None:
+            raise rate_tables.RateTableError(f"Unknown rate version: {version}")
+    query = build_query(context.params)
+    progress = {"scanned": 0, "updated": 0, "skipped": 0, "rebuilt_users": 0, "last_id": None}
+    progress.update(context.progress)
+    suspect_chunk = context.resumed
+
+    while True:
+        chunk_query = query
+        if progress["last_id"] is not None:
+            chunk_query = {**query, "_id": {"$gt": progress["last_id"]}}
+        chunk = await db.calculations.find(chunk_query, RECOMPUTE_PROJECTION)\
+            .sort("_id", ASCENDING)\
+            .limit(RECOMPUTE_CHUNK_SIZE)\
+            .to_list(RECOMPUTE_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        changed, skipped = recompute_results(chunk, snapshot)
+        updated = 0
+        drifted = False
+        if changed:
+            for user_id in {doc["user_id"] for doc, _ in changed}:
+                await stats.ensure_user_stats(db.calculations, db.user_stats, user_id)
+            result = await db.calculations.bulk_write([
+                UpdateOne(
+                    {"_id": doc["_id"], "updated_at": doc["updated_at"]},
+                    {"$set": values},
+                )
+                for doc, values in changed
+            ], ordered=False)
+            updated = result.matched_count
+            drifted = updated != len(changed)
+            if not drifted and not suspect_chunk:
+                await record_changes(db, [(doc, {**doc, **values}) for doc, values in changed])
+        if drifted or suspect_chunk:
+            user_ids = {doc["user_id"] for doc in chunk}
+            await rebuild_users(db, user_ids)
+            progress["rebuilt_users"] += len(user_ids)
+        suspect_chunk = False
+
+        progress["scanned"] += len(chunk)
+        progress["updated"] += updated
+        progress["skipped"] += skipped
+        progress["last_id"] = chunk[-1]["_id"]
+        await context.checkpoint(dict(progress))
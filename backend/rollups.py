@@ -0,0 +1,230 @@
+"""Time-bucketed calculation rollups.
+
+One document per ``user_id`` x granularity x bucket x ``CalculationType``
+holds the summed ``money_saved``, ``co2_reduced``, ``points`` and the count
+of calculations created in that bucket. The calculation routes keep them
+current with ``$inc`` upserts, so trend charts read a handful of rollup rows
+instead of scanning ``calculations``. ``rebuild_rollups`` backfills them
+from existing history in batches.
+
+Every ``$inc`` also bumps the rollup's ``version``. Rebuilding one user's
+rollups writes each bucket only over the version read before aggregating,
+like ``stats.rebuild_user_stats``, so concurrent increments are not lost.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("day", "month")
+
+REBUILD_BATCH_SIZE = 1000
+
+# Guarded writes a user's rebuild tries before giving up on this pass
+REBUILD_ATTEMPTS = 5
+
+ROLLUP_FIELDS = ("money_saved", "co2_reduced", "points")
+
+CalculationChange = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def bucket_start(created_at: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its day or month."""
+    if granularity == "day":
+        return datetime(created_at.year, created_at.month, created_at.day)
+    return datetime(created_at.year, created_at.month, 1)
+
+
+def rollup_id(user_id: str, granularity: str, bucket: datetime, calc_type: str) -> str:
+    return f"{user_id}:{granularity}:{bucket:%Y-%m-%d}:{calc_type}"
+
+
+def _bucket_totals(
+    changes: Iterable[CalculationChange],
+) -> Dict[Tuple[str, str, datetime, str], Dict[str, Any]]:
+    """Signed totals per ``(user_id, granularity, bucket, type)`` of the changes."""
+    increments: Dict[Tuple[str, str, datetime, str], Dict[str, Any]] = {}
+    for before, after in changes:
+        for doc, sign in ((before, -1), (after, 1)):
+            if doc is None:
+                continue
+            for granularity in GRANULARITIES:
+                key = (
+                    doc["user_id"], granularity,
+                    bucket_start(doc["created_at"], granularity), doc["type"],
+                )
+                inc = increments.setdefault(key, {})
+                for field in ROLLUP_FIELDS:
+                    inc[field] = inc.get(field, 0) + sign * doc.get(field, 0)
+                inc["count"] = inc.get("count", 0) + sign
+    return increments
+
+
+def build_rollup_updates(
+    changes: Iterable[CalculationChange],
+) -> List[UpdateOne]:
+    """Build ``$inc`` upserts for every bucket touched by the changes.
+
+    Changes may belong to different users; each side of a change must carry
+    ``user_id``, ``type`` and ``created_at``.
+    """
+    updates = []
+    for (user_id, granularity, bucket, calc_type), inc in _bucket_totals(changes).items():
+        inc = {field: value for field, value in inc.items() if value != 0}
+        if not inc:
+            continue
+        updates.append(UpdateOne(
+            {"_id": rollup_id(user_id, granularity, bucket, calc_type)},
+            {
+                "$inc": {**inc, "version": 1},
+                "$setOnInsert": {
+                    "user_id": user_id,
+                    "granularity": granularity,
+                    "bucket": bucket,
+                    "type": calc_type,
+                },
+            },
+            upsert=True,
+        ))
+    return updates
+
+
+async def apply_changes(rollups_collection, changes: Iterable[CalculationChange]) -> None:
+    """Apply calculation changes to the rollups in one bulk write."""
+    updates = build_rollup_updates(changes)
+    if updates:
+        await rollups_collection.bulk_write(updates, ordered=False)
+
+
+async def get_trends(
+    rollups_collection,
+    user_id: str,
+    granularity: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Read a user's rollup rows for ``start <= bucket < end``, oldest first."""
+    query: Dict[str, Any] = {"user_id": user_id, "granularity": granularity}
+    bucket_range = {}
+    if start is not None:
+        bucket_range["$gte"] = bucket_start(start, granularity)
+    if end is not None:
+        bucket_range["$lt"] = end
+    if bucket_range:
+        query["bucket"] = bucket_range
+
+    cursor = rollups_collection.find(query, {"_id": 0, "user_id": 0, "granularity": 0})\
+        .sort([("bucket", ASCENDING), ("type", ASCENDING)])
+    return [row async for row in cursor if row.get("count")]
+
+
+async def rebuild_rollups(
+    calculations_collection,
+    rollups_collection,
+    user_id: Optional[str] = None,
+    batch_size: int = REBUILD_BATCH_SIZE,
+) -> int:
+    """Backfill rollups from ``calculations``, batch by batch in ``_id`` order.
+
+    With ``user_id`` the user's rollups are rewritten bucket by bucket with
+    guarded writes (see ``rebuild_user_rollups``). Without it all rollups
+    are dropped first. Calculations written while that backfill runs can
+    be counted twice, so run it while the API is idle.
+    """
+    if user_id is not None:
+        return await rebuild_user_rollups(calculations_collection, rollups_collection, user_id)
+
+    await rollups_collection.delete_many({})
+    processed = 0
+    async for batch in _calculation_batches(calculations_collection, {}, batch_size):
+        await apply_changes(rollups_collection, [(None, doc) for doc in batch])
+        processed += len(batch)
+    return processed
+
+
+async def _calculation_batches(calculations_collection, scope: Dict[str, Any], batch_size: int):
+    projection = {"user_id": 1, "type": 1, "created_at": 1, **{f: 1 for f in ROLLUP_FIELDS}}
+    last_id = None
+    while True:
+        query = dict(scope)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await calculations_collection.find(query, projection)\
+            .sort("_id", ASCENDING)\
+            .limit(batch_size)\
+            .to_list(batch_size)
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]["_id"]
+
+
+async def rebuild_user_rollups(
+    calculations_collection,
+    rollups_collection,
+    user_id: str,
+    batch_size: int = REBUILD_BATCH_SIZE,
+) -> int:
+    """Recompute one user's rollups without dropping them.
+
+    Each bucket is written only over the ``version`` read before
+    aggregating, and the whole user is retried if an increment got in
+    between. Buckets that no longer have calculations are zeroed.
+    """
+    for _ in range(REBUILD_ATTEMPTS):
+        versions = {
+            doc["_id"]: doc.get("version")
+            async for doc in rollups_collection.find({"user_id": user_id}, {"version": 1})
+        }
+        totals: Dict[Tuple[str, str, datetime, str], Dict[str, Any]] = {}
+        processed = 0
+        async for batch in _calculation_batches(calculations_collection, {"user_id": user_id}, batch_size):
+            for key, inc in _bucket_totals((None, doc) for doc in batch).items():
+                bucket_totals = totals.setdefault(key, {})
+                for field, value in inc.items():
+                    bucket_totals[field] = bucket_totals.get(field, 0) + value
+            processed += len(batch)
+
+        writes = []
+        written = set()
+        for (_, granularity, bucket, calc_type), values in totals.items():
+            rollup = rollup_id(user_id, granularity, bucket, calc_type)
+            written.add(rollup)
+            if rollup in versions:
+                writes.append(_guarded_update(rollup, versions[rollup], values))
+            else:
+                # Collides on _id if the bucket was created meanwhile
+                writes.append(UpdateOne(
+                    {"_id": rollup, "version": {"$exists": False}},
+                    {"$setOnInsert": {
+                        "user_id": user_id, "granularity": granularity, "bucket": bucket,
+                        "type": calc_type, **values, "version": 0,
+                    }},
+                    upsert=True,
+                ))
+        empty = {**{field: 0 for field in ROLLUP_FIELDS}, "count": 0}
+        writes += [
+            _guarded_update(rollup, version, empty)
+            for rollup, version in versions.items() if rollup not in written
+        ]
+        if not writes or await _write_guarded(rollups_collection, writes):
+            return processed
+    logger.warning("Rollups of user %s kept changing during the rebuild; left as they are", user_id)
+    return processed
+
+
+def _guarded_update(rollup: str, version: Any, values: Dict[str, Any]) -> UpdateOne:
+    # Rollups stored before versioning have no version; None matches them
+    return UpdateOne({"_id": rollup, "version": version}, {"$set": values, "$inc": {"version": 1}})
+
+
+async def _write_guarded(rollups_collection, writes: List[UpdateOne]) -> bool:
+    try:
+        result = await rollups_collection.bulk_write(writes, ordered=False)
+    except BulkWriteError:
+        return False
+    return result.matched_count + result.upserted_count == len(writes)
@@ -0,0 +1,102 @@
+"""Fast serialization path for list endpoints.
+
+With ``FAST_RESPONSES`` enabled, list routes ask MongoDB for just the
+response fields, lay each document out with ``shape`` and encode it with
+orjson, skipping the per-row Pydantic models and FastAPI's ``response_model``
+re-validation. ``shape`` emits the same keys, order, nulls and number types
+as the model path, so both paths produce the same bytes. With ``DEBUG`` also
+set, every row is still validated against the response model so schema
+drift is caught.
+"""
+import functools
+import os
+from typing import Any, Dict, List, Optional, Tuple, Type, get_args
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+import metrics
+
+
+def _flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+FAST_RESPONSES = _flag("FAST_RESPONSES")
+DEBUG = _flag("DEBUG")
+
+# Only the fields the response models expose
+CALCULATION_PROJECTION = {
+    "_id": 1, "type": 1, "title": 1, "money_saved": 1, "co2_reduced": 1,
+    "points": 1, "details": 1, "rate_version": 1, "created_at": 1, "updated_at": 1,
+}
+PROFILE_PROJECTION = {
+    "_id": 1, "type": 1, "name": 1, "data": 1, "created_at": 1, "updated_at": 1,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def response_layout(model: Type[BaseModel]) -> Tuple[Tuple[str, Optional[type]], ...]:
+    """``(key, int or float or None)`` per field of ``model``, in output order.
+
+    Keys are the aliases the model path serializes with (``_id``, not ``id``).
+    """
+    layout = []
+    for name, field in model.model_fields.items():
+        types = (field.annotation, *get_args(field.annotation))
+        number = next((kind for kind in types if kind in (int, float)), None)
+        layout.append((field.alias or name, number))
+    return tuple(layout)
+
+
+def shape(docs: List[Dict[str, Any]], model: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """Lay documents out the way ``model`` serializes them.
+
+    Fields come out in model order, absent ones as ``None``, and numbers as
+    the model's ``int`` or ``float`` (a stored ``100`` is ``100.0`` for a
+    float field).
+    """
+    layout = response_layout(model)
+    return [
+        {
+            key: value if number is None or value is None else number(value)
+            for key, number in layout
+            for value in (doc.get(key),)
+        }
+        for doc in docs
+    ]
+
+
+def encode(content: Any) -> bytes:
+    """Encode JSON-compatible content (datetimes included) with orjson."""
+    with metrics.SERIALIZATION_SECONDS.time("orjson"):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class TimedJSONResponse(JSONResponse):
+    """Standard JSON response that records its encoding time."""
+
+    def render(self, content: Any) -> bytes:
+        with metrics.SERIALIZATION_SECONDS.time("json"):
+            return super().render(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return encode(content)
+
+
+def fast_response(
+    docs: List[Dict[str, Any]],
+    model: Type[BaseModel],
+    headers: Optional[Dict[str, str]] = None,
+) -> FastJSONResponse:
+    """Encode projected documents directly, validating them only in debug mode."""
+    docs = shape(docs, model)
+    if DEBUG:
+        for doc in docs:
+            model.model_validate(doc)
+    return FastJSONResponse(docs, headers=headers)
@@ -1,53 +1,132 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import json
+import re
+import asyncio
 import logging
 from pathlib import Path
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import List, Optional
 
 # Import models and auth
-from models.User import User, UserCreate, UserLogin, UserResponse, UserStats
+from models.User import (
+    User, UserCreate, UserLogin, UserResponse, UserStats, UserTrends,
+    LeaderboardEntry, LeaderboardResponse, LeaderboardPosition, StreamTicket
+)
 from models.Calculation import (
     Calculation, CalculationCreate, CalculationUpdate, 
-    CalculationResponse, CalculationType
+    CalculationResponse, CalculationType, BulkInsertResponse,
+    BatchSelection, BatchDeleteRequest, BatchUpdateRequest, BatchResponse,
+    ComputeRequest, ComputeResponse,
+    ScenarioRange, ScenarioRequest
 )
 from models.Profile import Profile, ProfileCreate, ProfileUpdate, ProfileResponse, ProfileType
+from models.Job import RecomputeRequest, JobResponse
+from models.Rates import RatesResponse, RatesPublish
+from settings import Settings
 from auth import (
-    get_password_hash, verify_password, create_access_token, 
-    get_current_user_id, ACCESS_TOKEN_EXPIRE_MINUTES
+    get_password_hash_async, verify_password_async, create_access_token, 
+    get_current_user_id, get_stream_user_id, require_admin, shutdown_password_executor, token_cache,
+    create_stream_ticket, ACCESS_TOKEN_EXPIRE_MINUTES, STREAM_TICKET_SECONDS
 )
+from cache import profile_cache, profiles_key
+import stats
+import rollups
+import leaderboard
+import indexes
+import pagination
+import engine
+import ingest
+import export
+import serialization
+import etag
+import metrics
+import database
+import batch
+import events
+import jobs
+import recompute  # registers the recompute job handler
+import rate_tables
+import invalidation
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, opened per worker process by the lifespan handler
+client = None
+db = None
 
 # Collections
-users_collection = db.users
-calculations_collection = db.calculations
-profiles_collection = db.profiles
+users_collection = None
+calculations_collection = None
+profiles_collection = None
+user_stats_collection = None
+rollups_collection = None
+jobs_collection = None
+rate_tables_collection = None
 
-# Create the main app
-app = FastAPI(title="GreenWallet API", version="1.0.0")
+# Read-heavy routes (history, stats, export) use MONGO_READ_HEAVY_PREFERENCE
+calculations_read_collection = None
+user_stats_read_collection = None
 
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+def bind_database(mongo_client, db_name: str):
+    """Point the module's database and collection handles at a client."""
+    global client, db, users_collection, calculations_collection, profiles_collection
+    global user_stats_collection, rollups_collection, jobs_collection, rate_tables_collection
+    global calculations_read_collection, user_stats_read_collection
+    client = mongo_client
+    db = client[db_name]
+    users_collection = db.users
+    calculations_collection = db.calculations
+    profiles_collection = db.profiles
+    user_stats_collection = db.user_stats
+    rollups_collection = db.calculation_rollups
+    jobs_collection = db.jobs
+    rate_tables_collection = db.rate_tables
+    calculations_read_collection = database.read_heavy(calculations_collection)
+    user_stats_read_collection = database.read_heavy(user_stats_collection)
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def unbind_database():
+    """Clear the handles set by bind_database; the client is not closed."""
+    global client, db, users_collection, calculations_collection, profiles_collection
+    global user_stats_collection, rollups_collection, jobs_collection, rate_tables_collection
+    global calculations_read_collection, user_stats_read_collection
+    client = db = None
+    users_collection = calculations_collection = profiles_collection = None
+    user_stats_collection = rollups_collection = jobs_collection = rate_tables_collection = None
+    calculations_read_collection = user_stats_read_collection = None
+
+# Largest batch accepted by the compute endpoint
+MAX_COMPUTE_ROWS = 50000
+
+# Largest history page a client can request
+MAX_PAGE_SIZE = 500
+
+# Long-running tasks started with the app, cancelled on shutdown
+background_tasks = []
+
+# Apps in this process whose lifespan is running, and whether startup()
+# opened the bound client (rather than e.g. a test binding its own)
+running_apps = 0
+owns_client = False
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-process startup and shutdown, defined at the end of this module."""
+    await startup(app.state.settings)
+    try:
+        yield
+    finally:
+        await shutdown()
+
+# Create a router with the /api prefix; create_app includes it in the app
+api_router = APIRouter(prefix="/api")
 
 # ==================== AUTHENTICATION ROUTES ====================
 
@@ -63,15 +142,22 @@ async def register(user_data: UserCreate):
         )
     
     # Hash password and create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     user = User(
         email=user_data.email,
         password=hashed_password,
         name=user_data.name
     )
     
-    # Insert user to database
-    result = await users_collection.insert_one(user.dict(by_alias=True))
+    # Insert user to database; the unique email index catches a concurrent
+    # registration that passed the check above
+    try:
+        await users_collection.insert_one(user.dict(by_alias=True))
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -97,7 +183,7 @@ async def login(user_data: UserLogin):
         )
     
     # Verify password
-    if not verify_password(user_data.password, user_doc["password"]):
+    if not await verify_password_async(user_data.password, user_doc["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -129,35 +215,164 @@ async def get_current_user(user_id: str = Depends(get_current_user_id)):
 # ==================== USER ROUTES ====================
 
 @api_router.get("/users/stats", response_model=UserStats)
-async def get_user_stats(user_id: str = Depends(get_current_user_id)):
+async def get_user_stats(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user_id)
+):
     """Get user statistics (total savings, CO2, points)."""
-    # Aggregate user's calculations
-    pipeline = [
-        {"$match": {"user_id": user_id}},
-        {"$group": {
-            "_id": None,
-            "total_saved": {"$sum": "$money_saved"},
-            "total_co2_reduced": {"$sum": "$co2_reduced"},
-            "total_points": {"$sum": "$points"},
-            "calculation_count": {"$sum": 1}
-        }}
-    ]
-    
-    result = await calculations_collection.aggregate(pipeline).to_list(1)
+    tag = await etag.etag_for(request, user_id, etag.CALCULATIONS)
+    not_modified = etag.not_modified(request, tag)
+    if not_modified:
+        return not_modified
     
-    if result:
-        stats = result[0]
-        return UserStats(
-            total_saved=stats["total_saved"],
-            total_co2_reduced=stats["total_co2_reduced"],
-            total_points=stats["total_points"],
-            calculation_count=stats["calculation_count"]
+    # Materialized stats document, kept current by the calculation routes
+    stats_doc = await stats.get_user_stats(
+        calculations_read_collection, user_stats_read_collection, user_id
+    )
+    response.headers.update(etag.headers(tag))
+    return UserStats(**stats_doc)
+
+@api_router.get("/users/trends", response_model=UserTrends)
+async def get_user_trends(
+    request: Request,
+    response: Response,
+    granularity: str = "month",
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Get savings, CO2 and points per day or month and calculation type."""
+    if granularity not in rollups.GRANULARITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="granularity must be day or month"
         )
-    else:
-        return UserStats()
+    
+    tag = await etag.etag_for(request, user_id, etag.CALCULATIONS)
+    not_modified = etag.not_modified(request, tag)
+    if not_modified:
+        return not_modified
+    response.headers.update(etag.headers(tag))
+    
+    buckets = await rollups.get_trends(
+        rollups_collection, user_id, granularity, from_date, to_date
+    )
+    return UserTrends(granularity=granularity, buckets=buckets)
+
+@api_router.post("/users/events/ticket", response_model=StreamTicket)
+async def create_events_ticket(user_id: str = Depends(get_current_user_id)):
+    """Issue a short-lived ticket for opening the event stream."""
+    return StreamTicket(ticket=create_stream_ticket(user_id), expires_in=STREAM_TICKET_SECONDS)
+
+@api_router.get("/users/events")
+async def get_user_events(
+    request: Request,
+    user_id: str = Depends(get_stream_user_id)
+):
+    """Stream stats and calculation changes as Server-Sent Events.
+
+    The first event is the current stats; after that each write pushes a
+    ``stats`` event (delta and new totals) and ``calculation.*`` events.
+    Clients that cannot set headers pass ``?ticket=`` from
+    ``POST /users/events/ticket`` instead of the access token.
+    """
+    stats_doc = await stats.get_user_stats(
+        calculations_read_collection, user_stats_read_collection, user_id
+    )
+    return StreamingResponse(
+        events.stream(request, user_id, {"type": "stats", "stats": events.stats_view(stats_doc)}),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ==================== LEADERBOARD ROUTES ====================
+
+async def leaderboard_entries(rows: list) -> List[LeaderboardEntry]:
+    """Attach user names to (rank, user_id, points) rows."""
+    user_ids = [user_id for _, user_id, _ in rows]
+    names = {
+        user_doc["_id"]: user_doc.get("name", "")
+        async for user_doc in users_collection.find({"_id": {"$in": user_ids}}, {"name": 1})
+    }
+    return [
+        LeaderboardEntry(rank=rank, user_id=ranked_id, name=names.get(ranked_id, ""), points=points)
+        for rank, ranked_id, points in rows
+    ]
+
+@api_router.get("/leaderboard", response_model=LeaderboardResponse)
+async def get_leaderboard(
+    top: int = Query(10, ge=1, le=100),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Get the highest ranked users by points."""
+    board = leaderboard.leaderboard
+    return LeaderboardResponse(
+        total_users=len(board),
+        entries=await leaderboard_entries(board.top(top))
+    )
+
+@api_router.get("/leaderboard/me", response_model=LeaderboardPosition)
+async def get_leaderboard_position(
+    radius: int = Query(2, ge=0, le=25),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Get the current user's rank and the users ranked around them."""
+    board = leaderboard.leaderboard
+    return LeaderboardPosition(
+        rank=board.rank(user_id),
+        points=board.points(user_id) or 0,
+        total_users=len(board),
+        neighbours=await leaderboard_entries(board.around(user_id, radius))
+    )
 
 # ==================== CALCULATION ROUTES ====================
 
+async def ensure_stats(user_id: str):
+    """Make sure the user's stats document exists before their calculations change."""
+    await stats.ensure_user_stats(calculations_collection, user_stats_collection, user_id)
+
+async def record_calculation_changes(user_id: str, changes: list):
+    """Apply (before, after) calculation changes to the user's stats and rollups."""
+    inc = stats.build_increment(changes)
+    stats_doc = await stats.apply_increment(
+        calculations_collection, user_stats_collection, user_id, inc
+    )
+    if stats_doc is not None:
+        await leaderboard.publish_points(user_id, stats_doc.get("total_points", 0))
+    await rollups.apply_changes(rollups_collection, changes)
+    await etag.bump(user_id, etag.CALCULATIONS)
+    if events.EVENTS_SOURCE == "local":
+        events.publish_changes(user_id, changes, inc, stats_doc)
+
+async def rebuild_user_aggregates(user_id: str):
+    """Recompute a user's stats and rollups from their calculations."""
+    stats_doc = await stats.rebuild_user_stats(
+        calculations_collection, user_stats_collection, user_id=user_id
+    )
+    await rollups.rebuild_rollups(calculations_collection, rollups_collection, user_id=user_id)
+    await leaderboard.publish_points(user_id, stats_doc.get("total_points", 0))
+    await etag.bump(user_id, etag.CALCULATIONS)
+    if events.EVENTS_SOURCE == "local":
+        events.bus.publish(user_id, {"type": "resync"})
+
+def batch_query(user_id: str, selection: BatchSelection) -> dict:
+    """Validate a batch selection and build its user-scoped filter."""
+    if selection.ids is None and selection.type is None \
+            and selection.created_from is None and selection.created_to is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select rows by ids, type or created_from/created_to"
+        )
+    if selection.ids is not None and len(selection.ids) > batch.MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {batch.MAX_BATCH_IDS} ids per request"
+        )
+    return batch.build_query(
+        user_id, selection.ids, selection.type, selection.created_from, selection.created_to
+    )
+
 @api_router.post("/calculations", response_model=CalculationResponse)
 async def create_calculation(
     calculation_data: CalculationCreate,
@@ -166,36 +381,214 @@ async def create_calculation(
     """Create a new calculation."""
     calculation = Calculation(
         user_id=user_id,
+        rate_version=rate_tables.tables.current().version,
         **calculation_data.dict()
     )
     
     # Insert to database
-    result = await calculations_collection.insert_one(calculation.dict(by_alias=True))
+    calculation_doc = calculation.dict(by_alias=True)
+    await ensure_stats(user_id)
+    result = await calculations_collection.insert_one(calculation_doc)
+    await record_calculation_changes(user_id, [(None, calculation_doc)])
     
-    return CalculationResponse(**calculation.dict(by_alias=True))
+    return CalculationResponse(**calculation_doc)
+
+@api_router.post("/calculations/bulk", response_model=BulkInsertResponse)
+async def create_calculations_bulk(
+    request: Request,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Create many calculations from a JSON array or an NDJSON stream.
+
+    Items are validated and inserted in unordered batches; invalid or
+    rejected items are reported by index without failing the rest. Send
+    ``Content-Type: application/x-ndjson`` to have the body processed as it
+    streams in instead of being parsed as a whole.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = ingest.iter_ndjson(request.stream())
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Body must be a JSON array or NDJSON"
+            )
+        if len(body) > ingest.MAX_BULK_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {ingest.MAX_BULK_ITEMS} items per request"
+            )
+        items = ingest.iter_list(body)
+    
+    async def record_batch(changes):
+        await record_calculation_changes(user_id, changes)
+    
+    await ensure_stats(user_id)
+    bulk = ingest.BulkIngest(
+        calculations_collection, user_id, record_batch,
+        rate_version=rate_tables.tables.current().version
+    )
+    return await bulk.run(items)
+
+def title_prefix_filter(q: str) -> dict:
+    """Titles containing a word that starts with each term of ``q``, any case."""
+    return {"$and": [
+        {"title": {"$regex": rf"(?:^|\W){re.escape(term)}", "$options": "i"}}
+        for term in q.split()
+    ]}
+
+async def title_search_filter(user_id: str, q: str) -> dict:
+    """Full-text search over the user's titles, or word prefixes if it finds nothing.
+
+    ``$text`` matches whole stemmed words only, so "sol" finds nothing in
+    "Solar rooftop"; the prefix filter keeps such partial terms working. It
+    is decided per request, so every page of one search uses the same mode.
+    """
+    text = {"$text": {"$search": q}}
+    if await calculations_read_collection.find_one({"user_id": user_id, **text}, {"_id": 1}):
+        return text
+    return title_prefix_filter(q)
 
 @api_router.get("/calculations", response_model=List[CalculationResponse])
 async def get_calculations(
+    request: Request,
+    response: Response,
     user_id: str = Depends(get_current_user_id),
     calc_type: Optional[str] = None,
-    limit: int = 50,
-    skip: int = 0
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    min_money_saved: Optional[float] = None,
+    max_money_saved: Optional[float] = None,
+    min_co2_reduced: Optional[float] = None,
+    max_co2_reduced: Optional[float] = None,
+    min_points: Optional[int] = None,
+    max_points: Optional[int] = None
 ):
-    """Get user's calculations with optional filtering."""
+    """Get user's calculations with optional filtering.
+
+    ``q`` searches titles (see ``title_search_filter``);
+    ``sort`` is one of created_at, money_saved, co2_reduced or points and
+    ``order`` asc or desc; ``min_*``/``max_*`` bound the values inclusively.
+
+    Pages are chained by passing the previous response's ``X-Next-Cursor``
+    header back as ``cursor`` with the same sort; ``skip`` still works for
+    older clients but costs O(skip) on the server. The header is omitted on
+    the last page.
+    """
+    if sort not in pagination.SORT_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort must be one of {', '.join(pagination.SORT_FIELDS)}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="order must be asc or desc"
+        )
+    direction = ASCENDING if order == "asc" else DESCENDING
+    
+    tag = await etag.etag_for(request, user_id, etag.CALCULATIONS)
+    not_modified = etag.not_modified(request, tag)
+    if not_modified:
+        return not_modified
+    
     filter_query = {"user_id": user_id}
     
     if calc_type and calc_type in [t.value for t in CalculationType]:
         filter_query["type"] = calc_type
     
-    # Get calculations sorted by created_at desc
-    calculations = await calculations_collection.find(filter_query)\
-        .sort("created_at", -1)\
+    if q and q.strip():
+        # Served by the user_id + title text index, else scans the user's rows
+        filter_query.update(await title_search_filter(user_id, q))
+    
+    for field, low, high in (
+        ("money_saved", min_money_saved, max_money_saved),
+        ("co2_reduced", min_co2_reduced, max_co2_reduced),
+        ("points", min_points, max_points),
+    ):
+        bounds = {}
+        if low is not None:
+            bounds["$gte"] = low
+        if high is not None:
+            bounds["$lte"] = high
+        if bounds:
+            filter_query[field] = bounds
+    
+    if cursor:
+        try:
+            filter_query.update(pagination.cursor_filter(cursor, sort, direction))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        skip = 0
+    
+    projection = None
+    if serialization.FAST_RESPONSES:
+        projection = serialization.CALCULATION_PROJECTION
+    
+    # Fetch one extra row to know whether another page exists
+    calculations = await calculations_read_collection.find(filter_query, projection)\
+        .sort(pagination.sort_spec(sort, direction))\
         .skip(skip)\
-        .limit(limit)\
-        .to_list(limit)
+        .limit(limit + 1)\
+        .to_list(limit + 1)
     
+    headers = etag.headers(tag)
+    if len(calculations) > limit and limit > 0:
+        calculations = calculations[:limit]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(calculations[-1], sort, direction)
+    
+    if serialization.FAST_RESPONSES:
+        return serialization.fast_response(calculations, CalculationResponse, headers)
+    response.headers.update(headers)
     return [CalculationResponse(**calc) for calc in calculations]
 
+@api_router.get("/calculations/export")
+async def export_calculations(
+    format: str = "csv",
+    calc_type: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Stream the user's whole calculation history as CSV, NDJSON or Parquet."""
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of {', '.join(export.EXPORT_FORMATS)}"
+        )
+    
+    filter_query = {"user_id": user_id}
+    if calc_type and calc_type in [t.value for t in CalculationType]:
+        filter_query["type"] = calc_type
+    
+    cursor = calculations_read_collection.find(filter_query, {"user_id": 0})\
+        .sort(pagination.CURSOR_SORT)
+    
+    if format == "ndjson":
+        body = export.stream_ndjson(cursor)
+    else:
+        keys = await export.detail_keys(calculations_read_collection, filter_query)
+        if format == "csv":
+            body = export.stream_csv(cursor, keys)
+        else:
+            body = export.stream_parquet(cursor, keys)
+    
+    return StreamingResponse(
+        body,
+        media_type=export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="calculations.{format}"'}
+    )
+
 @api_router.put("/calculations/{calculation_id}", response_model=CalculationResponse)
 async def update_calculation(
     calculation_id: str,
@@ -203,11 +596,21 @@ async def update_calculation(
     user_id: str = Depends(get_current_user_id)
 ):
     """Update a calculation."""
-    # Check if calculation exists and belongs to user
-    existing_calc = await calculations_collection.find_one({
-        "_id": calculation_id,
-        "user_id": user_id
-    })
+    # Update only provided fields
+    update_data = {k: v for k, v in calculation_data.dict().items() if v is not None}
+    now = datetime.utcnow()
+    # BSON dates keep milliseconds; match what will be stored
+    update_data["updated_at"] = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    
+    await ensure_stats(user_id)
+    # Ownership check and update in one round trip; the pre-image gives the
+    # stats delta and the update is a plain $set, so the result is derived
+    # locally instead of read back
+    existing_calc = await calculations_collection.find_one_and_update(
+        {"_id": calculation_id, "user_id": user_id},
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE
+    )
     
     if not existing_calc:
         raise HTTPException(
@@ -215,17 +618,8 @@ async def update_calculation(
             detail="Calculation not found"
         )
     
-    # Update only provided fields
-    update_data = {k: v for k, v in calculation_data.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
-    
-    await calculations_collection.update_one(
-        {"_id": calculation_id},
-        {"$set": update_data}
-    )
-    
-    # Get updated calculation
-    updated_calc = await calculations_collection.find_one({"_id": calculation_id})
+    updated_calc = {**existing_calc, **update_data}
+    await record_calculation_changes(user_id, [(existing_calc, updated_calc)])
     return CalculationResponse(**updated_calc)
 
 @api_router.delete("/calculations/{calculation_id}")
@@ -234,19 +628,177 @@ async def delete_calculation(
     user_id: str = Depends(get_current_user_id)
 ):
     """Delete a calculation."""
-    result = await calculations_collection.delete_one({
+    await ensure_stats(user_id)
+    deleted_calc = await calculations_collection.find_one_and_delete({
         "_id": calculation_id,
         "user_id": user_id
     })
     
-    if result.deleted_count == 0:
+    if deleted_calc is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Calculation not found"
         )
     
+    await record_calculation_changes(user_id, [(deleted_calc, None)])
     return {"message": "Calculation deleted successfully"}
 
+@api_router.post("/calculations/batch-delete", response_model=BatchResponse)
+async def delete_calculations_batch(
+    selection: BatchDeleteRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Delete many calculations selected by ids and/or type and date range."""
+    query = batch_query(user_id, selection)
+    
+    async def record_chunk(changes):
+        await record_calculation_changes(user_id, changes)
+    
+    await ensure_stats(user_id)
+    deleted, drifted = await batch.delete_matching(calculations_collection, query, record_chunk)
+    if drifted:
+        await rebuild_user_aggregates(user_id)
+    return BatchResponse(matched=deleted, stats_rebuilt=drifted)
+
+@api_router.patch("/calculations/batch", response_model=BatchResponse)
+async def update_calculations_batch(
+    selection: BatchUpdateRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Apply the same changes to many calculations."""
+    query = batch_query(user_id, selection)
+    
+    update_data = {k: v for k, v in selection.changes.dict().items() if v is not None}
+    if not update_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No changes given"
+        )
+    now = datetime.utcnow()
+    update_data["updated_at"] = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    
+    async def record_chunk(changes):
+        await record_calculation_changes(user_id, changes)
+    
+    await ensure_stats(user_id)
+    matched, drifted = await batch.update_matching(
+        calculations_collection, query, update_data, record_chunk
+    )
+    if drifted:
+        await rebuild_user_aggregates(user_id)
+    return BatchResponse(matched=matched, stats_rebuilt=drifted)
+
+# ==================== COMPUTE ROUTES ====================
+
+@api_router.post("/compute/{calc_type}", response_model=ComputeResponse)
+async def compute_calculations(
+    calc_type: CalculationType,
+    compute_data: ComputeRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Evaluate a calculator's formulas over a batch of inputs."""
+    if (compute_data.rows is None) == (compute_data.columns is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either rows or columns"
+        )
+    
+    if compute_data.rows is not None:
+        columns = engine.columns_from_rows(compute_data.rows)
+    else:
+        columns = compute_data.columns
+    count = len(next(iter(columns.values()), []))
+    if count > MAX_COMPUTE_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_COMPUTE_ROWS} rows per request"
+        )
+    
+    snapshot = rate_tables.tables.current()
+    try:
+        results = engine.compute(calc_type.value, columns, snapshot.rates)
+    except engine.EngineError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc)
+        )
+    
+    return {
+        "type": calc_type.value,
+        "count": count,
+        "rate_version": snapshot.version,
+        "results": {name: values.tolist() for name, values in results.items()}
+    }
+
+@api_router.post("/scenarios/{calc_type}")
+async def compute_scenarios(
+    calc_type: CalculationType,
+    scenario_data: ScenarioRequest,
+    format: str = "json",
+    user_id: str = Depends(get_current_user_id)
+):
+    """Evaluate a calculator over the Cartesian grid of its input ranges.
+
+    The response is streamed, either as one JSON document or as NDJSON with
+    one cell per line.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be json or ndjson"
+        )
+    
+    specs = {
+        name: spec.dict() if isinstance(spec, ScenarioRange) else spec
+        for name, spec in scenario_data.inputs.items()
+    }
+    snapshot = rate_tables.tables.current()
+    try:
+        columns, results, cells = engine.compute_grid(calc_type.value, specs, snapshot.rates)
+    except engine.EngineError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc)
+        )
+    
+    # The engine rejects non-finite results; allow_nan=False makes sure a
+    # stray one fails the stream instead of sending Infinity, which is not JSON
+    def stream_ndjson():
+        for chunk in engine.iter_cells(columns, results):
+            yield "".join(json.dumps(cell, allow_nan=False) + "\n" for cell in chunk)
+    
+    def stream_json():
+        yield '{"type": %s, "count": %d, "cells": [' % (json.dumps(calc_type.value), cells)
+        separator = ""
+        for chunk in engine.iter_cells(columns, results):
+            yield separator + ",".join(json.dumps(cell, allow_nan=False) for cell in chunk)
+            separator = ","
+        yield "]}"
+    
+    headers = {"X-Rate-Version": str(snapshot.version)}
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(stream_json(), media_type="application/json", headers=headers)
+
+# ==================== RATE ROUTES ====================
+
+# Other workers load a newly published version now instead of on their next poll
+RATES_PUBLISHED = "rates.published"
+invalidation.bus.on(
+    RATES_PUBLISHED, lambda message: rate_tables.tables.refresh(rate_tables_collection)
+)
+
+@api_router.get("/rates", response_model=RatesResponse)
+async def get_rates(request: Request, response: Response):
+    """Get the rates currently in effect."""
+    snapshot = rate_tables.tables.current()
+    tag = f'"rates-{snapshot.version}"'
+    cached = etag.not_modified(request, tag)
+    if cached is not None:
+        return cached
+    response.headers.update(etag.headers(tag))
+    return snapshot.to_dict()
+
 # ==================== PROFILE ROUTES ====================
 
 @api_router.post("/profiles", response_model=ProfileResponse)
@@ -262,21 +814,55 @@ async def create_profile(
     
     # Insert to database
     result = await profiles_collection.insert_one(profile.dict(by_alias=True))
+    await etag.bump(user_id, etag.PROFILES)
     
     return ProfileResponse(**profile.dict(by_alias=True))
 
 @api_router.get("/profiles/{profile_type}", response_model=List[ProfileResponse])
 async def get_profiles(
+    request: Request,
     profile_type: ProfileType,
     user_id: str = Depends(get_current_user_id)
 ):
     """Get user's profiles by type."""
+    version = await etag.get_version(user_id, etag.PROFILES)
+    tag = etag.tag(request, version)
+    not_modified = etag.not_modified(request, tag)
+    if not_modified:
+        return not_modified
+    
+    # Bodies are cached per version, read before the query: a write that
+    # lands while this request reads bumps the version, so a stale body
+    # stored below is never served under the new one
+    key = profiles_key(user_id, profile_type.value, version)
+    body = await profile_cache.get(key)
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers=etag.headers(tag))
+    
+    projection = None
+    if serialization.FAST_RESPONSES:
+        projection = serialization.PROFILE_PROJECTION
+    
     profiles = await profiles_collection.find({
         "user_id": user_id,
         "type": profile_type.value
-    }).to_list(100)
+    }, projection).to_list(100)
     
-    return [ProfileResponse(**profile) for profile in profiles]
+    if serialization.FAST_RESPONSES:
+        profiles = serialization.shape(profiles, ProfileResponse)
+        if serialization.DEBUG:
+            for profile in profiles:
+                ProfileResponse.model_validate(profile)
+    else:
+        profiles = [
+            ProfileResponse(**profile).model_dump(mode="json", by_alias=True)
+            for profile in profiles
+        ]
+    
+    # Cache the encoded body so hits skip both Mongo and serialization
+    body = serialization.encode(profiles)
+    await profile_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers=etag.headers(tag))
 
 @api_router.delete("/profiles/{profile_id}")
 async def delete_profile(
@@ -284,28 +870,120 @@ async def delete_profile(
     user_id: str = Depends(get_current_user_id)
 ):
     """Delete a profile."""
-    result = await profiles_collection.delete_one({
-        "_id": profile_id,
-        "user_id": user_id
-    })
+    deleted_profile = await profiles_collection.find_one_and_delete(
+        {"_id": profile_id, "user_id": user_id},
+        {"type": 1}
+    )
     
-    if result.deleted_count == 0:
+    if deleted_profile is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found"
         )
     
+    await etag.bump(user_id, etag.PROFILES)
+    
     return {"message": "Profile deleted successfully"}
 
+# ==================== ADMIN ROUTES ====================
+
+@api_router.post(
+    "/admin/recompute",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_admin)]
+)
+async def start_recompute(recompute_data: RecomputeRequest):
+    """Queue a job recomputing stored calculations from their details."""
+    params = recompute_data.dict(exclude_none=True)
+    if recompute_data.rate_version is None:
+        # Pin the version so a resumed job keeps using the same rates
+        params["rate_version"] = rate_tables.tables.current().version
+    else:
+        await rate_tables.tables.refresh(rate_tables_collection)
+        if rate_tables.tables.get(recompute_data.rate_version) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Rate version not found"
+            )
+    job = await jobs.enqueue(jobs_collection, "recompute", params)
+    return JobResponse(**job)
+
+@api_router.get(
+    "/admin/jobs/{job_id}",
+    response_model=JobResponse,
+    dependencies=[Depends(require_admin)]
+)
+async def get_job(job_id: str):
+    """Get a background job's status and progress."""
+    job = await jobs_collection.find_one({"_id": job_id})
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return JobResponse(**job)
+
+@api_router.get(
+    "/admin/rates",
+    response_model=List[RatesResponse],
+    dependencies=[Depends(require_admin)]
+)
+async def get_rate_versions():
+    """Get every published rate version, oldest first."""
+    await rate_tables.tables.refresh(rate_tables_collection)
+    return [snapshot.to_dict() for snapshot in rate_tables.tables.versions()]
+
+@api_router.post(
+    "/admin/rates",
+    response_model=RatesResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_admin)]
+)
+async def publish_rates(rates_data: RatesPublish):
+    """Publish a new rate version; other workers pick it up on their next poll."""
+    try:
+        snapshot = await rate_tables.tables.publish(
+            rate_tables_collection, rates_data.rates, rates_data.effective_from
+        )
+        await invalidation.bus.publish(RATES_PUBLISHED, version=snapshot.version)
+    except rate_tables.RateVersionConflict as exc:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(exc)
+        )
+    except rate_tables.RateTableError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc)
+        )
+    return snapshot.to_dict()
+
+# ==================== METRICS ROUTES ====================
+
+metrics.register_cache_stats("profiles", lambda: profile_cache.stats())
+metrics.register_cache_stats("tokens", lambda: token_cache.stats())
+
+@api_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """Get latency histograms and cache counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/cache/stats")
+async def get_cache_stats(user_id: str = Depends(get_current_user_id)):
+    """Get hit/miss counters for the server-side caches."""
+    return {
+        "profiles": profile_cache.stats(),
+        "tokens": token_cache.stats(),
+        "invalidation": invalidation.bus.stats()
+    }
+
 # ==================== ROOT ROUTE ====================
 
 @api_router.get("/")
 async def root():
     return {"message": "GreenWallet API is running!", "version": "1.0.0"}
 
-# Include the router in the main app
-app.include_router(api_router)
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -313,9 +991,111 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# ==================== APP FACTORY ====================
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the ASGI app.
+
+    Nothing connects here: the MongoDB client is opened by the lifespan
+    handler when the app starts serving, unless one is already bound.
+    """
+    settings = settings or Settings.from_env()
+    app = FastAPI(
+        title="GreenWallet API",
+        version="1.0.0",
+        default_response_class=serialization.TimedJSONResponse,
+        lifespan=lifespan
+    )
+    app.state.settings = settings
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=settings.cors_origins,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
+    )
+
+    # Latency metrics and the opt-in X-Profile sampler
+    app.add_middleware(metrics.InstrumentMiddleware)
+
+    app.include_router(api_router)
+    return app
+
+# ==================== LIFESPAN ====================
+
+# Under gunicorn every worker process runs these for itself after the fork,
+# so each gets its own MongoDB client, invalidation listener and tasks.
+
+async def startup(settings: Settings):
+    global running_apps, owns_client
+    if running_apps:
+        # Routes use this module's handles, so every app running in one
+        # process serves the same database
+        if owns_client and settings.db_name != db.name:
+            raise RuntimeError(
+                f"This process already serves database {db.name}; "
+                f"run the app for {settings.db_name} in its own process"
+            )
+        running_apps += 1
+        return
+    
+    if client is None:
+        if not settings.mongo_url or not settings.db_name:
+            raise RuntimeError("MONGO_URL and DB_NAME must be set")
+        bind_database(database.create_client(
+            settings.mongo_url,
+            event_listeners=[metrics.MongoCommandListener(), database.pool_monitor]
+        ), settings.db_name)
+        owns_client = True
+    try:
+        await indexes.ensure_indexes(db)
+        await rate_tables.tables.refresh(rate_tables_collection)
+        bus = invalidation.use_bus(invalidation.create_bus(db=db))
+        
+        background_tasks.extend([
+            asyncio.create_task(bus.listen()),
+            asyncio.create_task(rate_tables.tables.poll(rate_tables_collection)),
+            asyncio.create_task(leaderboard.rebuild_periodically(user_stats_collection)),
+        ])
+        if events.EVENTS_SOURCE == "change_stream":
+            background_tasks.append(asyncio.create_task(
+                events.watch_changes(calculations_collection, user_stats_collection)
+            ))
+        if jobs.JOBS_IN_PROCESS:
+            background_tasks.append(asyncio.create_task(jobs.run_worker(db)))
+    except BaseException:
+        await release()
+        raise
+    running_apps += 1
+
+async def shutdown():
+    global running_apps
+    running_apps -= 1
+    if running_apps == 0:
+        await release()
+
+async def release():
+    """Stop the background tasks and close what startup() opened.
+
+    A client bound by someone else (a test, a benchmark) is left bound and
+    open; one opened here is closed and unbound, so the next startup opens
+    a fresh one instead of using a closed client.
+    """
+    global owns_client
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await invalidation.bus.close()
+    invalidation.use_bus(invalidation.InvalidationBus())
+    if owns_client:
+        client.close()
+        unbind_database()
+        owns_client = False
+    shutdown_password_executor()
 
-# Import datetime at the top
-from datetime import datetime
\ No newline at end of file
+# The app uvicorn and gunicorn load as server:app
+app = create_app()
@@ -0,0 +1,30 @@
+"""Settings read by ``server.create_app``.
+
+Only what the app factory itself needs lives here; the tuning knobs of the
+individual modules (cache, database pool, jobs, ...) are still read from the
+environment by those modules.
+
+* ``MONGO_URL`` / ``DB_NAME``: the database; checked when the app starts
+  rather than on import, so the app can be built without them (for example
+  when a test binds its own client)
+* ``CORS_ORIGINS``: comma-separated allowed origins, ``*`` by default
+"""
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass(frozen=True)
+class Settings:
+    mongo_url: Optional[str] = None
+    db_name: Optional[str] = None
+    cors_origins: List[str] = field(default_factory=lambda: ["*"])
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        origins = os.environ.get("CORS_ORIGINS", "*")
+        return cls(
+            mongo_url=os.environ.get("MONGO_URL"),
+            db_name=os.environ.get("DB_NAME"),
+            cors_origins=[origin.strip() for origin in origins.split(",") if origin.strip()],
+        )
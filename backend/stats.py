@@ -0,0 +1,296 @@
+"""Materialized per-user statistics.
+
+Totals are kept in the ``user_stats`` collection, one document per user keyed
+by the user's id. The calculation routes apply ``$inc`` deltas to it on every
+write, so reading stats is a single primary-key lookup instead of an
+aggregation over the user's whole history. ``rebuild_user_stats`` recomputes
+the documents from ``calculations`` to reconcile any drift.
+
+Every ``$inc`` also bumps the document's ``version``. A rebuild reads the
+version before aggregating and only writes if it is unchanged, retrying
+otherwise, so an increment that lands meanwhile is neither lost nor
+overwritten.
+
+A missing document (a new user, or history saved before stats were
+materialized) is seeded from ``calculations`` with ``$setOnInsert``, so a
+seed never overwrites a document that already counts ``$inc`` deltas.
+Write routes call ``ensure_user_stats`` before writing: the document then
+exists before the write's calculation does, so no seed can count a
+calculation whose ``$inc`` is still to come.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Calculation field -> stats total it feeds
+STAT_FIELDS = {
+    "money_saved": "total_saved",
+    "co2_reduced": "total_co2_reduced",
+    "points": "total_points",
+}
+
+REBUILD_BATCH_SIZE = 500
+
+# Guarded writes a user's rebuild tries before giving up on this pass
+REBUILD_ATTEMPTS = 5
+
+# Users whose stats document this process has already seen, so writes can
+# skip the lookup; cleared when full since it only saves a round trip
+SEEN_USERS_LIMIT = 100000
+_seen_users = set()
+
+CalculationChange = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def empty_totals() -> Dict[str, Any]:
+    """Return a zeroed set of totals."""
+    return {
+        "total_saved": 0.0,
+        "total_co2_reduced": 0.0,
+        "total_points": 0,
+        "calculation_count": 0,
+    }
+
+
+def _add(inc: Dict[str, Any], key: str, value: Any) -> None:
+    inc[key] = inc.get(key, 0) + value
+
+
+def build_increment(changes: Iterable[CalculationChange]) -> Dict[str, Any]:
+    """Build a ``$inc`` document from ``(before, after)`` calculation pairs.
+
+    ``before`` is ``None`` for a created calculation and ``after`` is ``None``
+    for a deleted one; an update passes both.
+    """
+    inc: Dict[str, Any] = {}
+    for before, after in changes:
+        for doc, sign in ((before, -1), (after, 1)):
+            if doc is None:
+                continue
+            prefix = f"by_type.{doc['type']}."
+            for field, total in STAT_FIELDS.items():
+                value = sign * doc.get(field, 0)
+                _add(inc, total, value)
+                _add(inc, prefix + total, value)
+            _add(inc, "calculation_count", sign)
+            _add(inc, prefix + "calculation_count", sign)
+
+    return {key: value for key, value in inc.items() if value != 0}
+
+
+async def apply_increment(
+    calculations_collection,
+    user_stats_collection,
+    user_id: str,
+    inc: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """Apply a ``$inc`` delta to a user's stats and return the new document.
+
+    The document should exist already (see ``get_user_stats``). If it does
+    not, e.g. because a full rebuild removed it meanwhile, it is seeded from
+    ``calculations``, which already include the write being recorded.
+    """
+    if not inc:
+        return None
+
+    stats_doc = await user_stats_collection.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {**inc, "version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if stats_doc is None:
+        _seen_users.discard(user_id)
+        stats_doc = await get_user_stats(calculations_collection, user_stats_collection, user_id)
+    return stats_doc
+
+
+async def get_user_stats(
+    calculations_collection,
+    user_stats_collection,
+    user_id: str,
+) -> Dict[str, Any]:
+    """Get a user's stats document, seeding it on first access.
+
+    Concurrent seeds are safe: only the first ``$setOnInsert`` creates the
+    document, and the others get that document back.
+    """
+    stats_doc = await user_stats_collection.find_one({"_id": user_id})
+    if stats_doc is None:
+        seed = await compute_user_stats(calculations_collection, user_id)
+        del seed["_id"]
+        stats_doc = await user_stats_collection.find_one_and_update(
+            {"_id": user_id},
+            {"$setOnInsert": seed},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    _remember(user_id)
+    return stats_doc
+
+
+async def ensure_user_stats(calculations_collection, user_stats_collection, user_id: str) -> None:
+    """Make sure a user's stats document exists; call before writing calculations."""
+    if user_id not in _seen_users:
+        await get_user_stats(calculations_collection, user_stats_collection, user_id)
+
+
+def _remember(user_id: str) -> None:
+    if len(_seen_users) >= SEEN_USERS_LIMIT:
+        _seen_users.clear()
+    _seen_users.add(user_id)
+
+
+async def compute_user_stats(calculations_collection, user_id: str) -> Dict[str, Any]:
+    """Build a user's stats document from ``calculations`` without storing it."""
+    stats_doc = _new_stats_doc(user_id, datetime.utcnow())
+    async for group in calculations_collection.aggregate(
+        [{"$match": {"user_id": user_id}}, *_group_stages()]
+    ):
+        _accumulate(stats_doc, group)
+    return stats_doc
+
+
+def _group_stages() -> list:
+    return [
+        {"$group": {
+            "_id": {"user_id": "$user_id", "type": "$type"},
+            "total_saved": {"$sum": "$money_saved"},
+            "total_co2_reduced": {"$sum": "$co2_reduced"},
+            "total_points": {"$sum": "$points"},
+            "calculation_count": {"$sum": 1}
+        }},
+        {"$sort": {"_id.user_id": 1}},
+    ]
+
+
+def _new_stats_doc(user_id: str, now: datetime) -> Dict[str, Any]:
+    return {"_id": user_id, **empty_totals(), "by_type": {}, "updated_at": now, "version": 0}
+
+
+def _accumulate(stats_doc: Dict[str, Any], group: Dict[str, Any]) -> None:
+    type_totals = {
+        "total_saved": group["total_saved"],
+        "total_co2_reduced": group["total_co2_reduced"],
+        "total_points": group["total_points"],
+        "calculation_count": group["calculation_count"],
+    }
+    stats_doc["by_type"][group["_id"]["type"]] = type_totals
+    for key, value in type_totals.items():
+        stats_doc[key] += value
+
+
+_MISSING = object()
+
+
+def _guarded_write(stats_doc: Dict[str, Any], version: Any) -> UpdateOne:
+    """Write a rebuilt document only over the version it was computed against.
+
+    For a user without a document the upsert collides on ``_id`` if one
+    appeared meanwhile, instead of overwriting it.
+    """
+    fields = {key: value for key, value in stats_doc.items() if key not in ("_id", "version")}
+    if version is _MISSING:
+        return UpdateOne(
+            {"_id": stats_doc["_id"], "version": {"$exists": False}},
+            {"$setOnInsert": {**fields, "version": 0}},
+            upsert=True,
+        )
+    # Documents stored before versioning have no version; None matches them
+    return UpdateOne(
+        {"_id": stats_doc["_id"], "version": version},
+        {"$set": fields, "$inc": {"version": 1}},
+    )
+
+
+async def _write_guarded(user_stats_collection, requests: List[UpdateOne]) -> bool:
+    """Run guarded writes; False if any of them lost to a concurrent write."""
+    try:
+        result = await user_stats_collection.bulk_write(requests, ordered=False)
+    except BulkWriteError:
+        return False
+    return result.matched_count + result.upserted_count == len(requests)
+
+
+async def _versions(user_stats_collection, user_ids: List[str]) -> Dict[str, Any]:
+    cursor = user_stats_collection.find({"_id": {"$in": user_ids}}, {"version": 1})
+    return {doc["_id"]: doc.get("version") async for doc in cursor}
+
+
+async def _rebuild_one(calculations_collection, user_stats_collection, user_id: str) -> Dict[str, Any]:
+    for _ in range(REBUILD_ATTEMPTS):
+        versions = await _versions(user_stats_collection, [user_id])
+        stats_doc = await compute_user_stats(calculations_collection, user_id)
+        write = _guarded_write(stats_doc, versions.get(user_id, _MISSING))
+        if await _write_guarded(user_stats_collection, [write]):
+            break
+    else:
+        logger.warning("Stats of user %s kept changing during the rebuild; left as they are", user_id)
+    return await user_stats_collection.find_one({"_id": user_id})
+
+
+async def rebuild_user_stats(
+    calculations_collection,
+    user_stats_collection,
+    user_id: Optional[str] = None,
+    on_removed: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Recompute stats documents from ``calculations``.
+
+    With ``user_id`` only that user's document is rebuilt and returned.
+    Without it every user is rebuilt and documents of users that no longer
+    have any calculations are removed; ``on_removed`` is then awaited with
+    their ids, e.g. to drop them from the leaderboard.
+
+    Each write is guarded by the ``version`` read before aggregating and
+    retried if an increment got in between. An increment whose calculation
+    the aggregation already counted but which lands after the write is still
+    counted twice; that window is one round trip wide.
+    """
+    if user_id is not None:
+        return await _rebuild_one(calculations_collection, user_stats_collection, user_id)
+
+    started_at = datetime.utcnow()
+    batch: List[Dict[str, Any]] = []
+
+    async def flush():
+        user_ids = [stats_doc["_id"] for stats_doc in batch]
+        versions = await _versions(user_stats_collection, user_ids)
+        requests = [
+            _guarded_write(stats_doc, versions.get(stats_doc["_id"], _MISSING))
+            for stats_doc in batch
+        ]
+        if not await _write_guarded(user_stats_collection, requests):
+            # Redo the batch user by user; rewriting the ones that went through is harmless
+            for batch_user in user_ids:
+                await _rebuild_one(calculations_collection, user_stats_collection, batch_user)
+        batch.clear()
+
+    async for group in calculations_collection.aggregate(_group_stages(), allowDiskUse=True):
+        if not batch or batch[-1]["_id"] != group["_id"]["user_id"]:
+            # Groups come sorted by user, so every document in the batch is complete
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                await flush()
+            batch.append(_new_stats_doc(group["_id"]["user_id"], started_at))
+        _accumulate(batch[-1], group)
+    if batch:
+        await flush()
+
+    # Anything not rewritten above belongs to users without calculations
+    stale = {"updated_at": {"$lt": started_at}}
+    user_ids = [doc["_id"] async for doc in user_stats_collection.find(stale, {"_id": 1})]
+    if user_ids:
+        await user_stats_collection.delete_many({**stale, "_id": {"$in": user_ids}})
+        # One written to since the find above was kept
+        kept = {
+            doc["_id"]
+            async for doc in user_stats_collection.find({"_id": {"$in": user_ids}}, {"_id": 1})
+        }
+        removed = [stale_user for stale_user in user_ids if stale_user not in kept]
+        if removed and on_removed is not None:
+            await on_removed(removed)
+    return None
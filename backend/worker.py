@@ -0,0 +1,52 @@
+"""GreenWallet background job worker.
+
+Run from the backend directory, e.g. ``python worker.py``. Start as many
+processes as needed; each claims jobs from the ``jobs`` collection on its own.
+"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import typer
+from dotenv import load_dotenv
+import database
+import jobs
+import recompute  # registers the recompute job handler
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+cli = typer.Typer(help="GreenWallet background job worker.")
+
+
+@cli.command()
+def run(
+    worker_id: Optional[str] = typer.Option(None, help="Name shown on claimed jobs."),
+    poll_interval: float = typer.Option(jobs.POLL_INTERVAL_SECONDS, help="Seconds between polls when idle."),
+    burst: bool = typer.Option(False, "--burst", help="Exit once the queue is empty."),
+):
+    """Claim and run queued jobs."""
+    async def main():
+        client = database.create_client(os.environ['MONGO_URL'])
+        try:
+            await jobs.run_worker(
+                client[os.environ['DB_NAME']],
+                worker_id=worker_id, poll_interval=poll_interval, burst=burst,
+            )
+        finally:
+            client.close()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,93 @@
+"""p99 latency of GET /api/calculations during a concurrent login storm.
+
+Start the API twice, once with the old behaviour and once with bcrypt on the
+executor, and run this against each:
+
+    PASSWORD_HASH_EXECUTOR=inline uvicorn server:app --port 8001
+    PASSWORD_HASH_EXECUTOR=thread uvicorn server:app --port 8002
+
+    python -m benchmarks.login_storm --base-url http://localhost:8001 --label inline
+    python -m benchmarks.login_storm --base-url http://localhost:8002 --label thread
+
+Each run measures the history endpoint alone and then while ``--logins``
+concurrent clients log in as fast as they can.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import dump, summarize
+
+PASSWORD = "BenchmarkPass123!"
+
+
+async def register(client: httpx.AsyncClient) -> dict:
+    email = f"bench_{uuid.uuid4().hex[:10]}@greenwallet.com"
+    response = await client.post(
+        "/api/auth/register", json={"email": email, "password": PASSWORD, "name": "Bench"}
+    )
+    response.raise_for_status()
+    return {"email": email, "token": response.json()["access_token"]}
+
+
+async def probe(client: httpx.AsyncClient, token: str, stop: asyncio.Event, samples: list):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/calculations", params={"limit": 20}, headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+
+
+async def login_loop(client: httpx.AsyncClient, email: str, stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+
+
+async def phase(client, user, logins: int, probes: int, seconds: float) -> dict:
+    stop = asyncio.Event()
+    probe_samples, login_samples = [], []
+    tasks = [asyncio.create_task(probe(client, user["token"], stop, probe_samples))
+             for _ in range(probes)]
+    tasks += [asyncio.create_task(login_loop(client, user["email"], stop, login_samples))
+              for _ in range(logins)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    result = {"calculations": summarize(probe_samples)}
+    if logins:
+        result["login"] = summarize(login_samples)
+    return result
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.logins + args.probes + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        user = await register(client)
+        for _ in range(5):
+            await client.post("/api/calculations", headers={"Authorization": f"Bearer {user['token']}"}, json={
+                "type": "solar", "title": "Bench", "money_saved": 1.0,
+                "co2_reduced": 1.0, "points": 1, "details": {},
+            })
+        report = {
+            "label": args.label,
+            "idle": await phase(client, user, 0, args.probes, args.seconds),
+            "storm": await phase(client, user, args.logins, args.probes, args.seconds),
+        }
+    print(dump(report))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--probes", type=int, default=4, help="concurrent history clients")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each phase")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,91 @@
+"""Rows/sec of the list-endpoint serialization paths.
+
+Compares, for one page of calculations:
+
+* ``pydantic``: one ``CalculationResponse`` per document followed by
+  FastAPI's ``response_model`` validation and JSON encoding (current path)
+* ``fast``: projected documents laid out by ``serialization.shape`` and
+  encoded by ``FastJSONResponse`` (the ``FAST_RESPONSES`` path)
+
+    python -m benchmarks.serialization --rows 50 --pages 2000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from benchmarks.common import dump, use_backend
+
+use_backend()
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from models.Calculation import CalculationResponse  # noqa: E402
+from serialization import fast_response  # noqa: E402
+
+
+def make_docs(rows: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": str(uuid.uuid4()),
+            "type": "solar",
+            "title": f"Solar Panel ({row % 9 + 1}.0kW)",
+            "money_saved": 450.25 + row,
+            "co2_reduced": 15.8 + row / 10,
+            "points": 85 + row,
+            "details": {
+                "system_capacity": "3.0kW",
+                "rooftop_area": "300 sqft",
+                "sunlight_hours": "6",
+                "monthly_generation": "432 kWh",
+            },
+            "created_at": now - timedelta(minutes=row),
+            "updated_at": now - timedelta(minutes=row),
+        }
+        for row in range(rows)
+    ]
+
+
+async def pydantic_path(docs, field) -> bytes:
+    models = [CalculationResponse(**doc) for doc in docs]
+    content = await serialize_response(field=field, response_content=models, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def fast_path(docs, field) -> bytes:
+    return fast_response(docs, CalculationResponse).body
+
+
+async def measure(path, docs, field, pages: int) -> float:
+    started = time.perf_counter()
+    for _ in range(pages):
+        await path(docs, field)
+    return time.perf_counter() - started
+
+
+async def main(args):
+    docs = make_docs(args.rows)
+    field = create_response_field("response", List[CalculationResponse])
+
+    report = {"rows_per_page": args.rows, "pages": args.pages}
+    for name, path, page in (("pydantic", pydantic_path, docs), ("fast", fast_path, docs)):
+        await measure(path, page, field, min(args.pages, 50))  # warm up
+        elapsed = await measure(path, page, field, args.pages)
+        report[name] = {
+            "seconds": round(elapsed, 4),
+            "rows_per_second": round(args.rows * args.pages / elapsed),
+        }
+    report["speedup"] = round(report["fast"]["rows_per_second"] / report["pydantic"]["rows_per_second"], 2)
+    print(dump(report))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50, help="rows per page")
+    parser.add_argument("--pages", type=int, default=2000, help="pages to encode per path")
+    asyncio.run(main(parser.parse_args()))
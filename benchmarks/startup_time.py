@@ -0,0 +1,137 @@
+"""Cold-start cost of the API: importing ``server`` and building the app.
+
+Each run starts a fresh interpreter in the backend directory that imports
+``server`` under ``python -X importtime`` and then calls ``create_app()``
+once more. The report gives the median import and app-build times, the
+slowest imports (by cumulative time, with their own self time), the
+modules ``server`` imports directly, and which heavy optional packages got
+loaded even though no request has been served yet. No database is needed:
+the client is only opened by the app's lifespan handler.
+
+    python -m benchmarks.startup_time --runs 7
+    python -m benchmarks.startup_time --save-baseline
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.common import BACKEND_DIR, dump
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "startup_baseline.json"
+
+# Packages only some endpoints or jobs need; none should load on import
+HEAVY_MODULES = ["numpy", "pyarrow", "pandas", "boto3", "redis"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+server.create_app()
+built = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (built - imported) * 1000,
+    "heavy_loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Rows of ``-X importtime`` output as dicts (times in ms)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append({
+            "module": name.strip(),
+            "depth": depth,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+def probe() -> Dict:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+
+def build_report(runs: List[Dict], top: int) -> Dict:
+    # Breakdowns come from the median run, so they add up to its import time
+    median_run = sorted(runs, key=lambda run: run["import_ms"])[len(runs) // 2]
+    imports = median_run["imports"]
+    server_row = next(row for row in imports if row["module"] == "server")
+    slowest = sorted(imports, key=lambda row: row["cumulative_ms"], reverse=True)[:top]
+    direct = sorted(
+        (row for row in imports if row["depth"] == server_row["depth"] + 1),
+        key=lambda row: row["cumulative_ms"], reverse=True,
+    )[:top]
+
+    def table(rows):
+        return [
+            {"module": row["module"], "cumulative_ms": round(row["cumulative_ms"], 2),
+             "self_ms": round(row["self_ms"], 2)}
+            for row in rows
+        ]
+
+    return {
+        "runs": len(runs),
+        "import_ms": round(statistics.median(run["import_ms"] for run in runs), 2),
+        "create_app_ms": round(statistics.median(run["create_app_ms"] for run in runs), 2),
+        "modules_imported": len(imports),
+        "heavy_loaded": median_run["heavy_loaded"],
+        "slowest_imports": table(slowest),
+        "server_imports": table(direct),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Import time up by more than ``tolerance``, or newly loaded heavy packages."""
+    regressions = []
+    if baseline.get("import_ms") and report["import_ms"] > baseline["import_ms"] * (1 + tolerance):
+        regressions.append(f"import: {report['import_ms']}ms vs baseline {baseline['import_ms']}ms")
+    for name in sorted(set(report["heavy_loaded"]) - set(baseline.get("heavy_loaded", []))):
+        regressions.append(f"{name} is now imported at startup")
+    return regressions
+
+
+def main(args) -> int:
+    # The first run also writes bytecode caches; it is not counted
+    probe()
+    runs = [probe() for _ in range(args.runs)]
+    report = build_report(runs, args.top)
+
+    regressions = []
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(dump(report) + "\n")
+    elif baseline_path.exists():
+        regressions = compare(report, json.loads(baseline_path.read_text()), args.tolerance)
+        report["regressions"] = regressions
+
+    print(dump(report))
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="rows in each breakdown")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    sys.exit(main(parser.parse_args()))
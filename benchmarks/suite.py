@@ -0,0 +1,266 @@
+"""Load-test the API in-process against a seeded local database.
+
+The FastAPI app is driven through ``httpx.ASGITransport``, so no server
+process is needed. With ``--mongo-url`` it runs against a real ``mongod``
+in a throwaway database; without it an in-memory ``mongomock_motor``
+stand-in is used (latencies are then only comparable between stand-in
+runs).
+
+``--users`` users are seeded with ``--calculations`` calculations each,
+then ``--concurrency`` clients run a weighted mix of login, save, history
+paging and stats for ``--seconds``. The JSON report has throughput and
+p50/p95/p99 per endpoint; it is compared against ``--baseline`` when that
+file exists and the exit status is 1 on a regression.
+
+    python -m benchmarks.suite --users 20 --calculations 500 --seconds 15
+    python -m benchmarks.suite --mongo-url mongodb://localhost:27017 --save-baseline
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import dump, summarize, use_backend
+
+PASSWORD = "BenchmarkPass123!"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Relative weight of each operation in the mix
+MIX = {"login": 5, "save": 20, "history": 45, "stats": 30}
+
+CALCULATION_TYPES = ["solar", "afforestation", "water", "transport", "electricity"]
+
+
+def load_app(mongo_url):
+    """Import the app bound to a throwaway database; returns ``(server, cleanup)``."""
+    use_backend()
+    db_name = f"greenwallet_bench_{uuid.uuid4().hex[:8]}"
+    import server
+
+    # httpx.ASGITransport does not run the lifespan handler, so bind here
+    if mongo_url:
+        import database
+        server.bind_database(database.create_client(mongo_url), db_name)
+
+        async def cleanup():
+            await server.client.drop_database(db_name)
+        return server, cleanup
+
+    from mongomock_motor import AsyncMongoMockClient
+
+    server.bind_database(AsyncMongoMockClient(), db_name)
+
+    async def cleanup():
+        pass
+    return server, cleanup
+
+
+def calculation_doc(user_id: str, rng: random.Random, created_at: datetime) -> dict:
+    return {
+        "_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "type": rng.choice(CALCULATION_TYPES),
+        "title": "Seeded calculation",
+        "money_saved": round(rng.uniform(10, 5000), 2),
+        "co2_reduced": round(rng.uniform(1, 500), 2),
+        "points": rng.randint(1, 500),
+        "details": {"source": "benchmark"},
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+async def seed(server, users: int, calculations: int, rng: random.Random) -> List[dict]:
+    """Insert users and their history directly, then build stats and rollups."""
+    import indexes
+    import rollups
+    import stats
+    from auth import get_password_hash
+
+    await indexes.ensure_indexes(server.db)
+    hashed = get_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    accounts = []
+    for number in range(users):
+        user_id = str(uuid.uuid4())
+        email = f"bench_{number}_{user_id[:8]}@greenwallet.com"
+        await server.users_collection.insert_one({
+            "_id": user_id, "email": email, "name": f"Bench {number}",
+            "password": hashed, "created_at": now, "updated_at": now,
+        })
+        docs = [
+            calculation_doc(user_id, rng, now - timedelta(minutes=index))
+            for index in range(calculations)
+        ]
+        for start in range(0, len(docs), 1000):
+            await server.calculations_collection.insert_many(docs[start:start + 1000])
+        accounts.append({"user_id": user_id, "email": email})
+
+    await stats.rebuild_user_stats(server.calculations_collection, server.user_stats_collection)
+    await rollups.rebuild_rollups(server.calculations_collection, server.rollups_collection)
+    return accounts
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def call(self, name: str, request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await request
+            response.raise_for_status()
+        except httpx.HTTPError:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        self.samples.setdefault(name, []).append(time.perf_counter() - started)
+        return response
+
+
+async def login(client, recorder, account) -> None:
+    response = await recorder.call("login", client.post(
+        "/api/auth/login", json={"email": account["email"], "password": PASSWORD}
+    ))
+    if response is not None:
+        account["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def save(client, recorder, account, rng) -> None:
+    doc = calculation_doc(account["user_id"], rng, datetime.utcnow())
+    body = {key: doc[key] for key in ("type", "title", "money_saved", "co2_reduced", "points", "details")}
+    await recorder.call("save", client.post("/api/calculations", json=body, headers=account["headers"]))
+
+
+async def history(client, recorder, account, rng) -> None:
+    """Read the first page and follow the cursor for up to two more."""
+    params = {"limit": 20}
+    for _ in range(rng.randint(1, 3)):
+        response = await recorder.call("history", client.get(
+            "/api/calculations", params=params, headers=account["headers"]
+        ))
+        cursor = response.headers.get("x-next-cursor") if response is not None else None
+        if not cursor:
+            return
+        params = {"limit": 20, "cursor": cursor}
+
+
+async def user_stats(client, recorder, account, rng) -> None:
+    await recorder.call("stats", client.get("/api/users/stats", headers=account["headers"]))
+
+
+async def worker(client, recorder, accounts, rng, deadline) -> None:
+    operations = list(MIX)
+    weights = [MIX[name] for name in operations]
+    while time.perf_counter() < deadline:
+        account = rng.choice(accounts)
+        operation = rng.choices(operations, weights)[0]
+        if operation == "login" or "headers" not in account:
+            await login(client, recorder, account)
+        elif operation == "save":
+            await save(client, recorder, account, rng)
+        elif operation == "history":
+            await history(client, recorder, account, rng)
+        else:
+            await user_stats(client, recorder, account, rng)
+
+
+def build_report(args, recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for name in sorted(set(recorder.samples) | set(recorder.errors)):
+        samples = recorder.samples.get(name, [])
+        endpoints[name] = {
+            **summarize(samples),
+            "rps": round(len(samples) / elapsed, 2),
+            "errors": recorder.errors.get(name, 0),
+        }
+    total = sum(len(samples) for samples in recorder.samples.values())
+    return {
+        "config": {
+            "backend": "mongod" if args.mongo_url else "mongomock",
+            "users": args.users,
+            "calculations": args.calculations,
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Endpoints whose p95 rose or throughput fell by more than ``tolerance``."""
+    regressions = []
+    for name, base in baseline.get("endpoints", {}).items():
+        current = report["endpoints"].get(name)
+        if current is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if base["rps"] and current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']} rps vs baseline {base['rps']} rps")
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {base.get('errors', 0)}")
+    return regressions
+
+
+async def main(args) -> int:
+    import json
+
+    server, cleanup = load_app(args.mongo_url)
+    rng = random.Random(args.seed)
+    try:
+        accounts = await seed(server, args.users, args.calculations, rng)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            recorder = Recorder()
+            started = time.perf_counter()
+            deadline = started + args.seconds
+            await asyncio.gather(*(
+                worker(client, recorder, accounts, random.Random(args.seed + number), deadline)
+                for number in range(args.concurrency)
+            ))
+            report = build_report(args, recorder, time.perf_counter() - started)
+    finally:
+        await cleanup()
+        server.shutdown_password_executor()
+
+    regressions = []
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(dump(report) + "\n")
+    elif baseline_path.exists():
+        regressions = compare(report, json.loads(baseline_path.read_text()), args.tolerance)
+        report["regressions"] = regressions
+
+    print(dump(report))
+    if args.out:
+        Path(args.out).write_text(dump(report) + "\n")
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", help="run against this mongod instead of the in-memory stand-in")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--calculations", type=int, default=200, help="seeded calculations per user")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--seconds", type=float, default=15.0, help="duration of the mix")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="also write the report to this file")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,106 @@
+"""Round trips and latency of PUT /api/calculations/{id}, old path vs new.
+
+* ``three_trips``: ``find_one`` ownership check, ``update_one``, then
+  ``find_one`` to read the result back (previous implementation)
+* ``single_trip``: one ``find_one_and_update`` returning the pre-image,
+  with the result derived locally (current implementation)
+
+Database calls are counted by wrapping the collection, so the counts hold
+for both backends; latencies are only meaningful against a real mongod.
+
+    python -m benchmarks.update_round_trips --mongo-url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from benchmarks.common import dump, summarize
+
+CALLS = ("find_one", "update_one", "find_one_and_update")
+
+
+class CountingCollection:
+    """Collection proxy counting calls to the methods used by the update path."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self.collection, name)
+        if name not in CALLS:
+            return attribute
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+async def three_trips(collection, calculation_id, user_id, update_data):
+    existing = await collection.find_one({"_id": calculation_id, "user_id": user_id})
+    await collection.update_one({"_id": calculation_id}, {"$set": update_data})
+    updated = await collection.find_one({"_id": calculation_id})
+    return existing, updated
+
+
+async def single_trip(collection, calculation_id, user_id, update_data):
+    existing = await collection.find_one_and_update(
+        {"_id": calculation_id, "user_id": user_id},
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE,
+    )
+    return existing, {**existing, **update_data}
+
+
+async def run(collection, path, docs, updates: int) -> dict:
+    counting = CountingCollection(collection)
+    samples = []
+    for number in range(updates):
+        doc = docs[number % len(docs)]
+        update_data = {"points": number, "updated_at": datetime.utcnow()}
+        started = time.perf_counter()
+        await path(counting, doc["_id"], doc["user_id"], update_data)
+        samples.append(time.perf_counter() - started)
+    return {**summarize(samples), "db_calls_per_update": counting.calls / updates}
+
+
+async def main(args):
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    db_name = f"greenwallet_bench_{uuid.uuid4().hex[:8]}"
+    collection = client[db_name].calculations
+
+    user_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    docs = [
+        {"_id": str(uuid.uuid4()), "user_id": user_id, "type": "solar", "title": "Bench",
+         "money_saved": 1.0, "co2_reduced": 1.0, "points": 1, "details": {},
+         "created_at": now, "updated_at": now}
+        for _ in range(100)
+    ]
+    await collection.insert_many(docs)
+    try:
+        report = {
+            "backend": "mongod" if args.mongo_url else "mongomock",
+            "three_trips": await run(collection, three_trips, docs, args.updates),
+            "single_trip": await run(collection, single_trip, docs, args.updates),
+        }
+    finally:
+        await client.drop_database(db_name)
+    print(dump(report))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", help="run against this mongod instead of the in-memory stand-in")
+    parser.add_argument("--updates", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,216 @@
+"""Throughput of GET /api/calculations as the number of gunicorn workers grows.
+
+For each ``--workers`` count the API is started with ``gunicorn.conf.py``
+(``WEB_CONCURRENCY=N``) against a throwaway database on a real ``mongod``,
+and ``--clients`` load-generator processes read history pages for
+``--seconds``. The report lists requests per second and latency for every
+count, plus the speedup over one worker and the scaling efficiency
+(speedup / workers; 1.0 is perfectly linear).
+
+    python -m benchmarks.worker_scaling --mongo-url mongodb://localhost:27017 --workers 1,2,4,8
+
+Run it on a machine with at least as many cores as the largest worker
+count plus the load generators, or the load generators become the
+bottleneck; MongoDB itself caps scaling once it saturates.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, dump, summarize
+
+PASSWORD = "BenchmarkPass123!"
+CALCULATION_TYPES = ["solar", "afforestation", "water", "transport", "electricity"]
+
+
+def start_server(args, workers: int, db_name: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": db_name,
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": f"127.0.0.1:{args.port}",
+        "INVALIDATION_BUS": args.bus,
+        "GUNICORN_ACCESS_LOG": "",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "server:app"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"API at {base_url} did not start within {timeout}s")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def seed(base_url: str, users: int, calculations: int, rng: random.Random) -> List[str]:
+    """Register users and bulk-insert their history; returns their tokens."""
+    tokens = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        for number in range(users):
+            response = await client.post("/api/auth/register", json={
+                "email": f"scale_{number}_{uuid.uuid4().hex[:8]}@greenwallet.com",
+                "password": PASSWORD,
+                "name": f"Scale {number}",
+            })
+            response.raise_for_status()
+            token = response.json()["access_token"]
+            items = [
+                {
+                    "type": rng.choice(CALCULATION_TYPES),
+                    "title": "Seeded calculation",
+                    "money_saved": round(rng.uniform(10, 5000), 2),
+                    "co2_reduced": round(rng.uniform(1, 500), 2),
+                    "points": rng.randint(1, 500),
+                    "details": {"source": "benchmark"},
+                }
+                for _ in range(calculations)
+            ]
+            response = await client.post(
+                "/api/calculations/bulk", json=items,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            response.raise_for_status()
+            tokens.append(token)
+    return tokens
+
+
+async def _load(base_url: str, tokens: List[str], concurrency: int, seconds: float, seed_value: int):
+    rng = random.Random(seed_value)
+    samples: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def reader():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+                started = time.perf_counter()
+                try:
+                    response = await client.get("/api/calculations", params={"limit": 20}, headers=headers)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                samples.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(reader() for _ in range(concurrency)))
+    return samples, errors
+
+
+def load_process(base_url: str, tokens: List[str], concurrency: int, seconds: float, seed_value: int):
+    return asyncio.run(_load(base_url, tokens, concurrency, seconds, seed_value))
+
+
+def measure(args, base_url: str, tokens: List[str]) -> Dict[str, float]:
+    with multiprocessing.Pool(args.clients) as pool:
+        started = time.perf_counter()
+        results = pool.starmap(load_process, [
+            (base_url, tokens, args.concurrency, args.seconds, args.seed + number)
+            for number in range(args.clients)
+        ])
+        elapsed = time.perf_counter() - started
+    samples = [sample for client_samples, _ in results for sample in client_samples]
+    return {
+        **summarize(samples),
+        "rps": round(len(samples) / args.seconds, 2),
+        "errors": sum(errors for _, errors in results),
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mongo-url", required=True, help="A real mongod; workers cannot share mongomock.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts.")
+    parser.add_argument("--clients", type=int, default=max(multiprocessing.cpu_count() // 2, 1),
+                        help="Load-generator processes.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Open requests per load generator.")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of load discarded per run.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--calculations", type=int, default=200, help="Per user.")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--bus", default="none", help="INVALIDATION_BUS for the API workers.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    worker_counts = [int(count) for count in args.workers.split(",")]
+    base_url = f"http://127.0.0.1:{args.port}"
+    db_name = f"greenwallet_scale_{uuid.uuid4().hex[:8]}"
+    runs = []
+    try:
+        server = start_server(args, 1, db_name)
+        try:
+            wait_ready(base_url)
+            tokens = asyncio.run(seed(base_url, args.users, args.calculations, random.Random(args.seed)))
+        finally:
+            stop_server(server)
+
+        for workers in worker_counts:
+            server = start_server(args, workers, db_name)
+            try:
+                wait_ready(base_url)
+                if args.warmup:
+                    load_process(base_url, tokens, args.concurrency, args.warmup, args.seed)
+                result = measure(args, base_url, tokens)
+            finally:
+                stop_server(server)
+            runs.append({"workers": workers, **result})
+            print(f"{workers} workers: {result['rps']} rps, p95 {result['p95_ms']}ms", file=sys.stderr)
+    finally:
+        from pymongo import MongoClient
+        MongoClient(args.mongo_url).drop_database(db_name)
+
+    base_rps = runs[0]["rps"] / runs[0]["workers"] if runs and runs[0]["rps"] else 0
+    for run in runs:
+        speedup = run["rps"] / base_rps if base_rps else 0.0
+        run["speedup"] = round(speedup, 2)
+        run["efficiency"] = round(speedup / run["workers"], 2)
+
+    print(dump({
+        "config": {
+            "endpoint": "GET /api/calculations?limit=20",
+            "clients": args.clients,
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+            "users": args.users,
+            "calculations": args.calculations,
+            "invalidation_bus": args.bus,
+        },
+        "runs": runs,
+    }))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import React, { useState, createContext, useContext, useEffect } from 'react';
+import React, { useState, createContext, useContext, useEffect, useRef } from 'react';
 import { BrowserRouter, Routes, Route, Navigate } from 'react-router-dom';
 import { Toaster } from './components/ui/toaster';
 import './App.css';
@@ -40,6 +40,55 @@ function App() {
     calculation_count: 0
   });
   const { toast } = useToast();
+  const eventsLiveRef = useRef(false);
+
+  // Keep stats current from the server's event stream while logged in
+  useEffect(() => {
+    if (!user || typeof EventSource === 'undefined') return;
+
+    let source = null;
+    let retryTimer = null;
+    let stopped = false;
+
+    const connect = async () => {
+      try {
+        source = await userAPI.openEvents();
+      } catch (error) {
+        if (!stopped) retryTimer = setTimeout(connect, 5000);
+        return;
+      }
+      if (stopped) {
+        source.close();
+        return;
+      }
+      source.addEventListener('open', () => {
+        eventsLiveRef.current = true;
+      });
+      source.addEventListener('stats', (event) => {
+        setUserStats(JSON.parse(event.data).stats);
+      });
+      source.addEventListener('resync', () => {
+        loadUserStats();
+      });
+      source.onerror = () => {
+        // EventSource reconnects by itself; poll via refreshStats meanwhile.
+        // Once the ticket has expired the server refuses the reconnect and
+        // the source closes, so open a new stream with a fresh ticket.
+        eventsLiveRef.current = false;
+        if (source.readyState === EventSource.CLOSED && !stopped) {
+          retryTimer = setTimeout(connect, 5000);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      eventsLiveRef.current = false;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [user]);
 
   // Check for existing auth on app load
   useEffect(() => {
@@ -132,6 +181,8 @@ function App() {
   };
 
   const refreshStats = async () => {
+    // The event stream already delivers stats after every write
+    if (eventsLiveRef.current) return;
     await loadUserStats();
   };
 
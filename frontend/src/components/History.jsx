@@ -1,8 +1,9 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/card';
 import { Button } from './ui/button';
 import { Badge } from './ui/badge';
 import { Input } from './ui/input';
+import { Checkbox } from './ui/checkbox';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from './ui/select';
 import { 
   History as HistoryIcon, 
@@ -23,24 +24,74 @@ import { useAuth } from '../App';
 import { useToast } from '../hooks/use-toast';
 import { calculationsAPI } from '../services/api';
 
+const PAGE_SIZE = 50;
+const SEARCH_DEBOUNCE_MS = 300;
+
+// Sort options mapped to the API's sort fields (always newest/highest first)
+const SORT_FIELDS = {
+  date: 'created_at',
+  savings: 'money_saved',
+  co2: 'co2_reduced',
+  points: 'points'
+};
+
 const History = () => {
   const [searchTerm, setSearchTerm] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
   const [filterType, setFilterType] = useState('all');
   const [sortBy, setSortBy] = useState('date');
   const [calculations, setCalculations] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [selectedIds, setSelectedIds] = useState(new Set());
+  const [deletingSelected, setDeletingSelected] = useState(false);
+  const sentinelRef = useRef(null);
+  const requestIdRef = useRef(0);
   
-  const { refreshStats } = useAuth();
+  const { userStats, refreshStats } = useAuth();
   const { toast } = useToast();
 
   useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(searchTerm.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  // Search, filter and sort run on the server; start over when they change
+  useEffect(() => {
+    setSelectedIds(new Set());
     loadCalculations();
-  }, []);
+  }, [debouncedSearch, filterType, sortBy]);
+
+  // Infinite scroll: fetch the next page when the sentinel becomes visible
+  useEffect(() => {
+    if (!nextCursor || !sentinelRef.current) return;
+
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting && !loadingMore) {
+        loadCalculations(nextCursor);
+      }
+    });
+    observer.observe(sentinelRef.current);
+    return () => observer.disconnect();
+  }, [nextCursor, loadingMore]);
 
-  const loadCalculations = async () => {
+  const loadCalculations = async (cursor = null) => {
+    const requestId = ++requestIdRef.current;
+    if (cursor) setLoadingMore(true);
     try {
-      const data = await calculationsAPI.getAll();
-      setCalculations(data);
+      const page = await calculationsAPI.getPage({
+        limit: PAGE_SIZE,
+        cursor: cursor || undefined,
+        q: debouncedSearch || undefined,
+        calc_type: filterType !== 'all' ? filterType : undefined,
+        sort: SORT_FIELDS[sortBy],
+        order: 'desc'
+      });
+      // Ignore responses to requests made before the filters last changed
+      if (requestId !== requestIdRef.current) return;
+      setCalculations(prev => cursor ? [...prev, ...page.items] : page.items);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Failed to load calculations:', error);
       toast({
@@ -50,6 +101,7 @@ const History = () => {
       });
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -75,25 +127,6 @@ const History = () => {
     return colors[type] || 'text-gray-600 bg-gray-100';
   };
 
-  const filteredCalculations = calculations.filter(calc => {
-    const matchesSearch = calc.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         calc.type.toLowerCase().includes(searchTerm.toLowerCase());
-    const matchesType = filterType === 'all' || calc.type === filterType;
-    return matchesSearch && matchesType;
-  }).sort((a, b) => {
-    switch (sortBy) {
-      case 'date':
-        return new Date(b.created_at) - new Date(a.created_at);
-      case 'savings':
-        return b.money_saved - a.money_saved;
-      case 'co2':
-        return b.co2_reduced - a.co2_reduced;
-      case 'points':
-        return b.points - a.points;
-      default:
-        return 0;
-    }
-  });
 
   const handleDelete = async (id, title) => {
     try {
@@ -114,11 +147,59 @@ const History = () => {
     }
   };
 
-  const totalStats = calculations.reduce((acc, calc) => ({
-    moneySaved: acc.moneySaved + calc.money_saved,
-    co2Reduced: acc.co2Reduced + calc.co2_reduced,
-    points: acc.points + calc.points
-  }), { moneySaved: 0, co2Reduced: 0, points: 0 });
+  const toggleSelected = (id) => {
+    setSelectedIds(prev => {
+      const next = new Set(prev);
+      if (next.has(id)) {
+        next.delete(id);
+      } else {
+        next.add(id);
+      }
+      return next;
+    });
+  };
+
+  const allVisibleSelected = calculations.length > 0 &&
+    calculations.every(calc => selectedIds.has(calc.id));
+
+  const toggleAllVisible = () => {
+    setSelectedIds(allVisibleSelected
+      ? new Set()
+      : new Set(calculations.map(calc => calc.id)));
+  };
+
+  const handleDeleteSelected = async () => {
+    const ids = [...selectedIds];
+    if (ids.length === 0) return;
+    setDeletingSelected(true);
+    try {
+      const result = await calculationsAPI.batchDelete({ ids });
+      setCalculations(prev => prev.filter(calc => !selectedIds.has(calc.id)));
+      setSelectedIds(new Set());
+      await refreshStats();
+      toast({
+        title: "Calculations deleted",
+        description: `${result.matched} calculation${result.matched === 1 ? '' : 's'} removed from your history.`
+      });
+    } catch (error) {
+      console.error('Failed to delete calculations:', error);
+      toast({
+        title: "Delete failed",
+        description: "Failed to delete the selected calculations. Please try again.",
+        variant: "destructive"
+      });
+    } finally {
+      setDeletingSelected(false);
+    }
+  };
+
+  // Totals come from /api/users/stats, not the pages loaded so far
+  const typeStats = filterType === 'all' ? userStats : userStats.by_type?.[filterType];
+  const totalStats = {
+    moneySaved: typeStats?.total_saved || 0,
+    co2Reduced: typeStats?.total_co2_reduced || 0,
+    points: typeStats?.total_points || 0
+  };
 
   if (loading) {
     return (
@@ -232,9 +313,30 @@ const History = () => {
         </CardContent>
       </Card>
 
+      {/* Bulk actions */}
+      {calculations.length > 0 && (
+        <div className="flex items-center justify-between">
+          <label className="flex items-center space-x-2 text-sm text-gray-600">
+            <Checkbox checked={allVisibleSelected} onCheckedChange={toggleAllVisible} />
+            <span>Select all shown</span>
+          </label>
+          {selectedIds.size > 0 && (
+            <Button
+              variant="destructive"
+              size="sm"
+              disabled={deletingSelected}
+              onClick={handleDeleteSelected}
+            >
+              <Trash2 className="h-4 w-4 mr-2" />
+              {deletingSelected ? 'Deleting...' : `Delete selected (${selectedIds.size})`}
+            </Button>
+          )}
+        </div>
+      )}
+
       {/* History List */}
       <div className="space-y-4">
-        {filteredCalculations.length === 0 ? (
+        {calculations.length === 0 ? (
           <Card>
             <CardContent className="text-center py-12">
               <HistoryIcon className="h-12 w-12 text-gray-400 mx-auto mb-4" />
@@ -248,13 +350,18 @@ const History = () => {
             </CardContent>
           </Card>
         ) : (
-          filteredCalculations.map((calc) => {
+          calculations.map((calc) => {
             const Icon = getTypeIcon(calc.type);
             return (
               <Card key={calc.id} className="hover:shadow-md transition-shadow">
                 <CardContent className="p-6">
                   <div className="flex items-center justify-between">
                     <div className="flex items-center space-x-4">
+                      <Checkbox
+                        checked={selectedIds.has(calc.id)}
+                        onCheckedChange={() => toggleSelected(calc.id)}
+                        aria-label={`Select ${calc.title}`}
+                      />
                       <div className={`p-3 rounded-full ${getTypeColor(calc.type)}`}>
                         <Icon className="h-6 w-6" />
                       </div>
@@ -329,6 +436,11 @@ const History = () => {
             );
           })
         )}
+        {nextCursor && (
+          <div ref={sentinelRef} className="text-center py-4 text-sm text-gray-500">
+            {loadingMore ? 'Loading more...' : ''}
+          </div>
+        )}
       </div>
     </div>
   );
@@ -62,6 +62,21 @@ export const userAPI = {
   getStats: async () => {
     const response = await apiClient.get('/users/stats');
     return response.data;
+  },
+  
+  // granularity: 'day' | 'month'; from/to are ISO dates
+  getTrends: async (params = {}) => {
+    const response = await apiClient.get('/users/trends', { params });
+    return response.data;
+  },
+  
+  // Live stats/calculation events (Server-Sent Events). EventSource cannot
+  // send headers, so the URL carries a short-lived stream ticket rather than
+  // the auth token, which would end up in server access logs.
+  openEvents: async () => {
+    const response = await apiClient.post('/users/events/ticket');
+    const ticket = encodeURIComponent(response.data.ticket);
+    return new EventSource(`${API}/users/events?ticket=${ticket}`);
   }
 };
 
@@ -77,6 +92,15 @@ export const calculationsAPI = {
     return response.data;
   },
   
+  // Keyset pagination: pass the returned nextCursor back as params.cursor
+  getPage: async (params = {}) => {
+    const response = await apiClient.get('/calculations', { params });
+    return {
+      items: response.data,
+      nextCursor: response.headers['x-next-cursor'] || null
+    };
+  },
+  
   update: async (id, data) => {
     const response = await apiClient.put(`/calculations/${id}`, data);
     return response.data;
@@ -85,6 +109,17 @@ export const calculationsAPI = {
   delete: async (id) => {
     const response = await apiClient.delete(`/calculations/${id}`);
     return response.data;
+  },
+  
+  // Select rows with { ids } and/or { type, created_from, created_to }
+  batchDelete: async (selection) => {
+    const response = await apiClient.post('/calculations/batch-delete', selection);
+    return response.data;
+  },
+  
+  batchUpdate: async (selection, changes) => {
+    const response = await apiClient.patch('/calculations/batch', { ...selection, changes });
+    return response.data;
   }
 };
 
@@ -0,0 +1,48 @@
+"""Shared fixtures: the API bound to an in-memory MongoDB stand-in."""
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def server():
+    """The server module bound to a fresh mongomock database."""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server as server_module
+
+    server_module.bind_database(AsyncMongoMockClient(), f"greenwallet_test_{uuid.uuid4().hex[:8]}")
+    yield server_module
+    server_module.unbind_database()
+
+
+@pytest.fixture
+async def api(server):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def user(api):
+    """A registered user; ``api`` sends their bearer token."""
+    email = f"user_{uuid.uuid4().hex[:8]}@greenwallet.com"
+    response = await api.post(
+        "/api/auth/register", json={"email": email, "password": "TestPass123!", "name": "Test"}
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    api.headers["Authorization"] = f"Bearer {body['access_token']}"
+    return body["user"]
@@ -0,0 +1,101 @@
+import anyio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_duplicate_registration_is_rejected(api, server):
+    import indexes
+
+    await indexes.ensure_indexes(server.db)
+    body = {"email": "race@greenwallet.com", "password": "TestPass123!", "name": "Race"}
+    statuses = []
+
+    async def register():
+        response = await api.post("/api/auth/register", json=body)
+        statuses.append((response.status_code, response.json()))
+
+    async with anyio.create_task_group() as group:
+        group.start_soon(register)
+        group.start_soon(register)
+
+    assert sorted(code for code, _ in statuses) == [200, 400]
+    assert {"detail": "Email already registered"} in [payload for _, payload in statuses]
+    assert await server.users_collection.count_documents({"email": body["email"]}) == 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls the time TokenCache sees."""
+    import auth
+
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, "time", lambda: now[0])
+    return now
+
+
+def test_token_cache_expires_entries_after_the_ttl(clock):
+    from auth import TokenCache
+
+    cache = TokenCache(max_size=10, ttl_seconds=60)
+    cache.put("token", "u1")
+
+    clock[0] += 59
+    assert cache.get("token") == "u1"
+    clock[0] += 1
+    assert cache.get("token") is None
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1}
+
+
+def test_token_cache_expires_entries_at_the_token_exp(clock):
+    from auth import TokenCache
+
+    cache = TokenCache(max_size=10, ttl_seconds=60)
+    cache.put("token", "u1", exp=clock[0] + 5)
+
+    clock[0] += 5
+    assert cache.get("token") is None
+
+
+def test_token_cache_evicts_the_least_recently_used(clock):
+    from auth import TokenCache
+
+    cache = TokenCache(max_size=2, ttl_seconds=60)
+    cache.put("a", "u1")
+    cache.put("b", "u2")
+    assert cache.get("a") == "u1"
+
+    cache.put("c", "u3")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("u1", "u3")
+    assert cache.stats()["size"] == 2
+
+
+def test_token_cache_of_size_zero_caches_nothing(clock):
+    from auth import TokenCache
+
+    cache = TokenCache(max_size=0, ttl_seconds=60)
+    cache.put("token", "u1")
+
+    assert cache.get("token") is None
+
+
+def test_verify_token_decodes_each_token_once(monkeypatch):
+    import auth
+
+    monkeypatch.setattr(auth, "token_cache", auth.TokenCache(max_size=10, ttl_seconds=60))
+    decoded = []
+    real_decode = auth.decode_jwt
+
+    def counting_decode(token):
+        decoded.append(token)
+        return real_decode(token)
+
+    monkeypatch.setattr(auth, "decode_jwt", counting_decode)
+    token = auth.create_access_token({"sub": "u1"})
+    ticket = auth.create_stream_ticket("u1")
+
+    assert [auth.verify_token(token) for _ in range(3)] == ["u1"] * 3
+    assert [auth.verify_token(ticket) for _ in range(2)] == [None, None]
+    assert decoded == [token, ticket, ticket]
@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import batch
+import rollups
+import stats
+
+pytestmark = pytest.mark.anyio
+
+
+def calculation(calc_type: str = "electricity", points: int = 10) -> dict:
+    return {
+        "type": calc_type,
+        "title": f"{calc_type} {points}",
+        "money_saved": float(points),
+        "co2_reduced": points / 10,
+        "points": points,
+        "details": {},
+    }
+
+
+async def create(api, calc_type: str = "electricity", points: int = 10) -> dict:
+    response = await api.post("/api/calculations", json=calculation(calc_type, points))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def assert_aggregates_match(server, user_id: str):
+    stored = await server.user_stats_collection.find_one({"_id": user_id})
+    fresh = await stats.compute_user_stats(server.calculations_collection, user_id)
+    for key in ("total_saved", "total_co2_reduced", "total_points", "calculation_count"):
+        assert stored[key] == pytest.approx(fresh[key]), key
+
+    live = {
+        row["_id"]: (row["points"], row["count"])
+        async for row in server.rollups_collection.find({"user_id": user_id}) if row["count"]
+    }
+    expected = {
+        rollups.rollup_id(user_id, granularity, bucket, calc_type): (totals["points"], totals["count"])
+        for (_, granularity, bucket, calc_type), totals in rollups._bucket_totals(
+            [(None, doc) async for doc in server.calculations_collection.find({"user_id": user_id})]
+        ).items()
+    }
+    assert live == expected
+
+
+async def test_delete_by_ids(api, user, server):
+    rows = [await create(api, points=points) for points in (10, 20, 30)]
+
+    response = await api.post("/api/calculations/batch-delete", json={
+        "ids": [rows[0]["_id"], rows[2]["_id"], "not-a-row"],
+    })
+
+    assert response.json() == {"matched": 2, "stats_rebuilt": False}
+    left = [doc["_id"] async for doc in server.calculations_collection.find({"user_id": user["_id"]})]
+    assert left == [rows[1]["_id"]]
+    await assert_aggregates_match(server, user["_id"])
+
+
+async def test_delete_by_type_and_created_range(api, user, server):
+    await create(api, "water", 5)
+    await asyncio.sleep(0.01)
+    created_from = datetime.utcnow()
+    await create(api, "water", 7)
+    await create(api, "solar", 9)
+
+    response = await api.post("/api/calculations/batch-delete", json={
+        "type": "water", "created_from": created_from.isoformat(),
+    })
+
+    assert response.json()["matched"] == 1
+    left = sorted([doc["points"] async for doc in server.calculations_collection.find()])
+    assert left == [5, 9]
+    await assert_aggregates_match(server, user["_id"])
+
+
+async def test_selection_is_scoped_to_the_user(api, user, server):
+    row = await create(api)
+    other = await api.post("/api/auth/register", json={
+        "email": "other@greenwallet.com", "password": "TestPass123!", "name": "Other",
+    })
+    api.headers["Authorization"] = f"Bearer {other.json()['access_token']}"
+
+    response = await api.post("/api/calculations/batch-delete", json={"ids": [row["_id"]]})
+
+    assert response.json()["matched"] == 0
+    assert await server.calculations_collection.count_documents({}) == 1
+
+
+async def test_selection_is_required(api, user):
+    response = await api.post("/api/calculations/batch-delete", json={})
+
+    assert response.status_code == 400
+
+
+async def test_update_in_chunks_keeps_aggregates(api, user, server, monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_CHUNK_SIZE", 2)
+    for points in (1, 2, 3, 4, 5):
+        await create(api, "electricity", points)
+    await create(api, "solar", 100)
+
+    response = await api.patch("/api/calculations/batch", json={
+        "type": "electricity", "changes": {"points": 50, "money_saved": 1.5},
+    })
+
+    assert response.json() == {"matched": 5, "stats_rebuilt": False}
+    stored = await server.user_stats_collection.find_one({"_id": user["_id"]})
+    assert stored["total_points"] == 350
+    assert stored["by_type"]["electricity"]["total_saved"] == pytest.approx(7.5)
+    await assert_aggregates_match(server, user["_id"])
+
+
+async def test_update_needs_changes(api, user):
+    await create(api)
+
+    response = await api.patch("/api/calculations/batch", json={"type": "electricity", "changes": {}})
+
+    assert response.status_code == 400
+
+
+class EditBeforeWrite:
+    """Collection proxy that edits a row between the chunk read and its write."""
+
+    def __init__(self, collection, row_id):
+        self._collection = collection
+        self._row_id = row_id
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def bulk_write(self, requests, **kwargs):
+        await self._collection.update_one({"_id": self._row_id}, {"$set": {"points": 999}})
+        return await self._collection.bulk_write(requests, **kwargs)
+
+
+@pytest.mark.parametrize("operation", ["delete", "update"])
+async def test_row_edited_mid_batch_is_left_alone_and_reported(api, user, server, operation):
+    rows = [await create(api, points=points) for points in (10, 20)]
+    collection = EditBeforeWrite(server.calculations_collection, rows[0]["_id"])
+    recorded = []
+
+    async def record(changes):
+        recorded.extend(changes)
+
+    query = batch.build_query(user["_id"], calc_type="electricity")
+    if operation == "delete":
+        matched, drifted = await batch.delete_matching(collection, query, record)
+    else:
+        matched, drifted = await batch.update_matching(collection, query, {"points": 1}, record)
+
+    assert (matched, drifted) == (1, True)
+    assert recorded == []
+    edited = await server.calculations_collection.find_one({"_id": rows[0]["_id"]})
+    assert edited["points"] == 999
+
+
+async def test_drift_rebuilds_the_aggregates(api, user, server, monkeypatch):
+    rows = [await create(api, points=points) for points in (10, 20)]
+    real_update_matching = batch.update_matching
+
+    async def edit_then_update(collection, *args):
+        return await real_update_matching(EditBeforeWrite(collection, rows[0]["_id"]), *args)
+
+    monkeypatch.setattr(batch, "update_matching", edit_then_update)
+
+    response = await api.patch("/api/calculations/batch", json={
+        "type": "electricity", "changes": {"points": 1},
+    })
+
+    assert response.json() == {"matched": 1, "stats_rebuilt": True}
+    stored = await server.user_stats_collection.find_one({"_id": user["_id"]})
+    assert stored["total_points"] == 999 + 1
+    await assert_aggregates_match(server, user["_id"])
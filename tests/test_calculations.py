@@ -0,0 +1,79 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def calculation(number: int) -> dict:
+    return {
+        "type": "electricity",
+        "title": f"Calculation {number}",
+        "money_saved": 100.0 + number,
+        "co2_reduced": 10.0 + number,
+        "points": 110 + number,
+        "details": {},
+    }
+
+
+async def create(api, count: int) -> None:
+    for number in range(count):
+        response = await api.post("/api/calculations", json=calculation(number))
+        assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("limit", [0, -2])
+async def test_history_rejects_non_positive_limit(api, user, limit):
+    await create(api, 2)
+
+    response = await api.get("/api/calculations", params={"limit": limit})
+
+    assert response.status_code == 422
+
+
+async def test_history_rejects_oversized_limit(api, user, server):
+    response = await api.get("/api/calculations", params={"limit": server.MAX_PAGE_SIZE + 1})
+
+    assert response.status_code == 422
+
+
+async def test_history_pages_with_cursor(api, user):
+    await create(api, 3)
+
+    first = await api.get("/api/calculations", params={"limit": 2})
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = await api.get("/api/calculations", params={"limit": 2, "cursor": cursor})
+    assert second.status_code == 200
+    assert len(second.json()) == 1
+    assert "X-Next-Cursor" not in second.headers
+
+
+async def titles(server, query: dict) -> list:
+    return sorted([doc["title"] async for doc in server.calculations_collection.find(query)])
+
+
+async def test_title_prefix_filter_matches_word_prefixes(server):
+    for title in ("Solar rooftop", "Home solar", "Water tank", "Consolidated bill", "a+b solar"):
+        await server.calculations_collection.insert_one({"user_id": "u1", "title": title})
+
+    assert await titles(server, server.title_prefix_filter("sol")) == [
+        "Home solar", "Solar rooftop", "a+b solar",
+    ]
+    assert await titles(server, server.title_prefix_filter("SOL roof")) == ["Solar rooftop"]
+    assert await titles(server, server.title_prefix_filter("a+b")) == ["a+b solar"]
+
+
+async def test_history_search_falls_back_to_word_prefixes(api, user, server):
+    for title in ("Solar rooftop", "Water tank"):
+        await api.post("/api/calculations", json={**calculation(1), "title": title})
+    try:
+        await server.calculations_collection.find_one({"$text": {"$search": "solar"}})
+    except Exception:
+        pytest.skip("the MongoDB stand-in has no $text search")
+
+    whole_word = await api.get("/api/calculations", params={"q": "solar"})
+    partial = await api.get("/api/calculations", params={"q": "sol"})
+
+    assert [row["title"] for row in whole_word.json()] == ["Solar rooftop"]
+    assert [row["title"] for row in partial.json()] == ["Solar rooftop"]
@@ -0,0 +1,255 @@
+import json
+import math
+
+import pytest
+
+import engine
+import recompute
+
+
+def transport(current_mode: str, alternate_mode: str, distance: float = 10) -> dict:
+    results = engine.compute("transport", {
+        "distance": [distance],
+        "frequency": ["daily"],
+        "current_mode": [current_mode],
+        "alternate_mode": [alternate_mode],
+    })
+    return {name: values.tolist()[0] for name, values in results.items()}
+
+
+def test_transport_saves_the_difference():
+    # 10 km * 30 trips, taxi 18 -> metro 2.5 ₹/km, 150 -> 18 g/km
+    result = transport("taxi", "metro")
+
+    assert result["money_saved"] == pytest.approx(4650)
+    assert result["co2_reduced"] == pytest.approx(39.6)
+    assert result["points"] == 4690
+
+
+def test_transport_never_saves_a_negative_amount():
+    # TransportCalculator.jsx saves Math.max(saved, 0)
+    result = transport("bus", "taxi")
+
+    assert result == {"money_saved": 0, "co2_reduced": 0, "points": 0}
+
+
+def test_transport_rejects_identical_modes():
+    with pytest.raises(engine.EngineError, match="must differ"):
+        transport("car", "car")
+
+
+def test_recompute_skips_stored_rows_with_identical_modes():
+    doc = {
+        "_id": "calc-1",
+        "type": "transport",
+        "title": "Personal Car → Personal Car",
+        "money_saved": 0,
+        "co2_reduced": 0,
+        "points": 0,
+        "details": {"distance": 10, "frequency": "daily", "from": "Personal Car", "to": "Personal Car"},
+    }
+
+    changed, skipped = recompute.recompute_results([doc])
+
+    assert changed == []
+    assert skipped == 1
+
+
+@pytest.mark.anyio
+async def test_compute_endpoint_rejects_identical_modes(api, user):
+    response = await api.post("/api/compute/transport", json={"rows": [
+        {"distance": 10, "current_mode": "bus", "alternate_mode": "bus"},
+    ]})
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("spec", [
+    {"start": "nan", "stop": 10, "step": 1},
+    {"start": 1, "stop": "inf", "step": 1},
+    {"start": 1, "stop": 10, "step": "nan"},
+    {"start": 1, "stop": 10, "step": "inf"},
+    {"start": -1e308, "stop": 1e308, "step": 1},
+    {"start": 1, "stop": 10, "num": "many"},
+    {"start": 1, "stop": 10, "num": float("inf")},
+])
+def test_grid_rejects_non_finite_ranges(spec):
+    with pytest.raises(engine.EngineError):
+        engine.compute_grid("solar", {"rooftop_area": spec})
+
+
+def test_grid_rejects_nested_values():
+    with pytest.raises(engine.EngineError, match="single numbers"):
+        engine.compute_grid("solar", {"rooftop_area": [[100, 200], [300, 400]]})
+
+
+def test_grid_expands_ranges():
+    columns, results, cells = engine.compute_grid("solar", {
+        "rooftop_area": {"start": 100, "stop": 300, "step": 100},
+        "sunlight_hours": [4, 6],
+    })
+
+    assert cells == 6
+    assert columns["rooftop_area"].tolist() == [100, 100, 200, 200, 300, 300]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("inputs", [
+    {"rooftop_area": {"start": "nan", "stop": 10, "step": 1}, "sunlight_hours": 5},
+    {"rooftop_area": {"start": 1, "stop": "inf", "num": 5}, "sunlight_hours": 5},
+    {"rooftop_area": [[100, 200]], "sunlight_hours": 5},
+])
+async def test_scenarios_endpoint_rejects_bad_axes(api, user, inputs):
+    response = await api.post("/api/scenarios/solar", json={"inputs": inputs})
+
+    assert response.status_code == 422
+
+
+# Plain transcriptions of the calculator components, one row at a time
+def js_math_round(value: float) -> int:
+    return math.floor(value + 0.5)
+
+
+def solar_row(rooftop_area, sunlight_hours):
+    monthly_generation = rooftop_area * 0.01 * sunlight_hours * 30 * 0.8
+    annual_co2_reduction = monthly_generation * 12 * 0.82
+    return {
+        "money_saved": monthly_generation * 6,
+        "co2_reduced": annual_co2_reduction / 12,
+        "points": js_math_round(annual_co2_reduction * 10),
+    }
+
+
+def afforestation_row(number_of_trees, land_area, years_of_growth, tree_species):
+    multiplier = {"neem": 1.0, "banyan": 1.5, "bamboo": 0.8}[tree_species]
+    co2_absorbed = number_of_trees * 22 * years_of_growth * multiplier
+    return {"money_saved": 0, "co2_reduced": co2_absorbed, "points": js_math_round(co2_absorbed * 5)}
+
+
+def water_row(mode, monthly_bill=None, liters_per_month=None, action="rainwater"):
+    if mode == "bill":
+        liters = monthly_bill / 30 * 1000
+        money_saved = monthly_bill * 0.3
+    else:
+        liters = liters_per_month
+        money_saved = liters / 1000 * 30 * {"rainwater": 1.0, "drip": 0.5}[action]
+    co2_reduced = liters / 1000 * 1.6
+    return {
+        "money_saved": money_saved,
+        "co2_reduced": co2_reduced,
+        "points": js_math_round(money_saved + co2_reduced),
+    }
+
+
+def electricity_row(appliance, hours_per_day, days_per_month=30):
+    from_power, to_power = {"ac_to_fan": (1.5, 0.075), "led_bulb": (0.06, 0.01)}[appliance]
+    kwh_saved = from_power * hours_per_day * days_per_month - to_power * hours_per_day * days_per_month
+    money_saved = kwh_saved * 7
+    co2_reduced = kwh_saved * 0.82
+    return {
+        "money_saved": money_saved,
+        "co2_reduced": co2_reduced,
+        "points": js_math_round(money_saved + co2_reduced),
+    }
+
+
+PARITY_CASES = [
+    ("solar", solar_row, [
+        {"rooftop_area": 300, "sunlight_hours": 6},
+        {"rooftop_area": 125.5, "sunlight_hours": 4.25},
+        {"rooftop_area": 1, "sunlight_hours": 0.5},
+    ]),
+    ("afforestation", afforestation_row, [
+        {"number_of_trees": 10, "land_area": 2, "years_of_growth": 5, "tree_species": "neem"},
+        {"number_of_trees": 3, "land_area": 0.5, "years_of_growth": 1.5, "tree_species": "banyan"},
+        {"number_of_trees": 250, "land_area": 40, "years_of_growth": 20, "tree_species": "bamboo"},
+    ]),
+    ("water", water_row, [
+        {"mode": "bill", "monthly_bill": 450, "liters_per_month": None, "action": "rainwater"},
+        {"mode": "liters", "monthly_bill": None, "liters_per_month": 12500, "action": "drip"},
+        {"mode": "liters", "monthly_bill": None, "liters_per_month": 800, "action": "rainwater"},
+    ]),
+    ("electricity", electricity_row, [
+        {"appliance": "ac_to_fan", "hours_per_day": 8, "days_per_month": 30},
+        {"appliance": "led_bulb", "hours_per_day": 5.5, "days_per_month": 22},
+        {"appliance": "ac_to_fan", "hours_per_day": 0.75, "days_per_month": 31},
+    ]),
+]
+
+
+@pytest.mark.parametrize("calc_type, reference, rows", PARITY_CASES, ids=[case[0] for case in PARITY_CASES])
+def test_vectorized_matches_scalar(calc_type, reference, rows):
+    batch = engine.compute(calc_type, engine.columns_from_rows(rows))
+
+    for index, row in enumerate(rows):
+        single = engine.compute(calc_type, engine.columns_from_rows([row]))
+        expected = reference(**row)
+        for name in ("money_saved", "co2_reduced", "points"):
+            assert batch[name][index] == pytest.approx(expected[name]), (name, row)
+            assert single[name][0] == batch[name][index], (name, row)
+
+
+@pytest.mark.parametrize("columns, message", [
+    ({"rooftop_area": [[100]], "sunlight_hours": [5]}, "list of single values"),
+    ({"rooftop_area": [float("inf")], "sunlight_hours": [5]}, "finite number"),
+    ({"rooftop_area": [1e308], "sunlight_hours": [5]}, "too large"),
+    ({"rooftop_area": [1e300], "sunlight_hours": [5]}, "too large"),
+])
+def test_compute_rejects_nested_and_non_finite_values(columns, message):
+    with pytest.raises(engine.EngineError, match=message):
+        engine.compute("solar", columns)
+
+
+def test_lookup_rejects_nested_values():
+    with pytest.raises(engine.EngineError, match="list of single values"):
+        engine.compute("electricity", {"hours_per_day": [5], "appliance": [["led_bulb"]]})
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("row", [
+    {"rooftop_area": 1e308, "sunlight_hours": 5},
+    {"rooftop_area": [1], "sunlight_hours": 5},
+])
+async def test_compute_endpoint_rejects_overflowing_inputs(api, user, row):
+    response = await api.post("/api/compute/solar", json={"rows": [row]})
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("values", [[100, float("inf")], [1e308], 10 ** 400])
+def test_grid_rejects_non_finite_list_values(values):
+    with pytest.raises(engine.EngineError):
+        engine.compute_grid("solar", {"rooftop_area": values, "sunlight_hours": 5})
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("inputs", [
+    '{"rooftop_area": [100, 1e308], "sunlight_hours": 5}',
+    '{"rooftop_area": [100, 1e400], "sunlight_hours": 5}',
+    '{"rooftop_area": 100, "sunlight_hours": [Infinity]}',
+])
+async def test_scenarios_endpoint_rejects_non_finite_values(api, user, inputs):
+    # Python's JSON parser accepts Infinity and turns 1e400 into inf
+    response = await api.post(
+        "/api/scenarios/solar", content='{"inputs": %s}' % inputs,
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("format", ["json", "ndjson"])
+async def test_scenarios_stream_valid_json(api, user, format):
+    response = await api.post("/api/scenarios/solar", params={"format": format}, json={"inputs": {
+        "rooftop_area": {"start": 100, "stop": 300, "step": 100}, "sunlight_hours": [4.5, 6],
+    }})
+
+    assert response.status_code == 200, response.text
+    if format == "json":
+        body = json.loads(response.text, parse_constant=pytest.fail)
+        assert body["count"] == 6
+        assert len(body["cells"]) == 6
+    else:
+        lines = [json.loads(line, parse_constant=pytest.fail) for line in response.text.splitlines()]
+        assert len(lines) == 6
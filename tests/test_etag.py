@@ -0,0 +1,69 @@
+import pytest
+
+import etag
+
+pytestmark = pytest.mark.anyio
+
+
+def calculation(points: int = 10) -> dict:
+    return {
+        "type": "solar",
+        "title": f"Solar {points}",
+        "money_saved": float(points),
+        "co2_reduced": points / 10,
+        "points": points,
+        "details": {},
+    }
+
+
+@pytest.mark.parametrize("path", ["/api/users/stats", "/api/users/trends", "/api/calculations"])
+async def test_revalidation_is_answered_with_304_until_a_write(api, user, path):
+    await api.post("/api/calculations", json=calculation())
+    first = await api.get(path)
+    tag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    revalidated = await api.get(path, headers={"If-None-Match": tag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == tag
+
+    await api.post("/api/calculations", json=calculation(20))
+    changed = await api.get(path, headers={"If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != tag
+
+
+async def test_tag_covers_the_query_string(api, user):
+    everything = await api.get("/api/calculations")
+    solar = await api.get("/api/calculations", params={"calc_type": "solar"})
+
+    assert everything.headers["ETag"] != solar.headers["ETag"]
+    response = await api.get(
+        "/api/calculations", params={"calc_type": "solar"},
+        headers={"If-None-Match": everything.headers["ETag"]},
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("if_none_match", [
+    '"other", {tag}', "W/{tag}", "*",
+])
+async def test_if_none_match_lists_weak_tags_and_wildcard(api, user, if_none_match):
+    tag = (await api.get("/api/users/stats")).headers["ETag"]
+
+    response = await api.get("/api/users/stats", headers={"If-None-Match": if_none_match.format(tag=tag)})
+
+    assert response.status_code == 304
+
+
+async def test_versions_are_per_user_and_scope():
+    calculations = await etag.get_version("u1", etag.CALCULATIONS)
+    profiles = await etag.get_version("u1", etag.PROFILES)
+    other_user = await etag.get_version("u2", etag.CALCULATIONS)
+
+    await etag.bump("u1", etag.CALCULATIONS)
+
+    assert await etag.get_version("u1", etag.CALCULATIONS) != calculations
+    assert await etag.get_version("u1", etag.PROFILES) == profiles
+    assert await etag.get_version("u2", etag.CALCULATIONS) == other_user
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_ticket_opens_the_event_stream(api, user):
+    response = await api.post("/api/users/events/ticket")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["expires_in"] == auth.STREAM_TICKET_SECONDS
+
+    assert await auth.get_stream_user_id(ticket=body["ticket"], credentials=None) == user["_id"]
+
+
+async def test_ticket_needs_an_access_token(api):
+    response = await api.post("/api/users/events/ticket")
+
+    assert response.status_code in (401, 403)
+
+
+async def test_ticket_is_not_an_access_token(api, user):
+    ticket = (await api.post("/api/users/events/ticket")).json()["ticket"]
+
+    response = await api.get("/api/users/stats", headers={"Authorization": f"Bearer {ticket}"})
+
+    assert response.status_code == 401
+
+
+async def test_access_token_is_not_a_ticket(api, user):
+    access_token = api.headers["Authorization"].removeprefix("Bearer ")
+
+    with pytest.raises(HTTPException) as error:
+        await auth.get_stream_user_id(ticket=access_token, credentials=None)
+    assert error.value.status_code == 401
+
+
+async def test_expired_ticket_is_refused(user):
+    expired = auth.create_access_token(
+        data={"sub": user["_id"], "scope": auth.STREAM_TICKET_SCOPE},
+        expires_delta=timedelta(seconds=-1),
+    )
+
+    with pytest.raises(HTTPException) as error:
+        await auth.get_stream_user_id(ticket=expired, credentials=None)
+    assert error.value.status_code == 401
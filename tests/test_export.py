@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+
+import pytest
+
+import export
+import rate_tables
+
+pytestmark = pytest.mark.anyio
+
+
+def calculation(calc_type: str, points: int, details: dict) -> dict:
+    return {
+        "type": calc_type,
+        "title": f"{calc_type} {points}",
+        "money_saved": float(points),
+        "co2_reduced": points / 10,
+        "points": points,
+        "details": details,
+    }
+
+
+@pytest.fixture
+async def history(api, user, monkeypatch):
+    """Three calculations exported two per batch, plus another user's row."""
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    rows = [
+        calculation("water", 1, {"litres": 40}),
+        calculation("solar", 2, {"kw": 3, "panels": ["a", "b"]}),
+        calculation("water", 3, {}),
+    ]
+    for row in rows:
+        response = await api.post("/api/calculations", json=row)
+        assert response.status_code == 200, response.text
+
+    token = api.headers["Authorization"]
+    other = await api.post("/api/auth/register", json={
+        "email": "other-export@greenwallet.com", "password": "TestPass123!", "name": "Other",
+    })
+    api.headers["Authorization"] = f"Bearer {other.json()['access_token']}"
+    await api.post("/api/calculations", json=calculation("water", 99, {"litres": 1}))
+    api.headers["Authorization"] = token
+    return rows
+
+
+async def test_csv_flattens_details_into_columns(api, history):
+    response = await api.get("/api/calculations/export", params={"format": "csv"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="calculations.csv"' in response.headers["content-disposition"]
+    reader = csv.DictReader(io.StringIO(response.text))
+    assert reader.fieldnames == export.BASE_COLUMNS + ["details.kw", "details.litres", "details.panels"]
+    rows = list(reader)
+    assert sorted(row["points"] for row in rows) == ["1", "2", "3"]
+    solar = next(row for row in rows if row["type"] == "solar")
+    assert solar["details.kw"] == "3"
+    assert json.loads(solar["details.panels"]) == ["a", "b"]
+    assert solar["details.litres"] == ""
+    assert solar["rate_version"] == str(rate_tables.tables.current().version)
+
+
+async def test_ndjson_keeps_details_nested(api, history):
+    response = await api.get("/api/calculations/export", params={"format": "ndjson", "calc_type": "water"})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["points"] for line in lines) == [1, 3]
+    assert {line["type"] for line in lines} == {"water"}
+    assert all("id" in line and "_id" not in line and "user_id" not in line for line in lines)
+    assert {json.dumps(line["details"]) for line in lines} == {json.dumps({"litres": 40}), "{}"}
+
+
+async def test_parquet_has_typed_columns(api, history):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    response = await api.get("/api/calculations/export", params={"format": "parquet"})
+
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 3
+    assert pq.ParquetFile(io.BytesIO(response.content)).metadata.num_row_groups == 2
+    assert table.schema.field("points").type == "int64"
+    assert table.schema.field("rate_version").type == "int64"
+    assert table.schema.field("created_at").type == "timestamp[ms]"
+    assert sorted(table.column("details.litres").to_pylist(), key=str) == ["40", None, None]
+
+
+async def test_unknown_format_is_rejected(api, user):
+    response = await api.get("/api/calculations/export", params={"format": "xlsx"})
+
+    assert response.status_code == 400
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+import ingest
+
+pytestmark = pytest.mark.anyio
+
+
+def calculation(points: int = 10) -> dict:
+    return {
+        "type": "water",
+        "title": f"Water {points}",
+        "money_saved": float(points),
+        "co2_reduced": points / 10,
+        "points": points,
+        "details": {},
+    }
+
+
+async def stored_points(server, user_id: str) -> list:
+    return sorted([doc["points"] async for doc in server.calculations_collection.find({"user_id": user_id})])
+
+
+async def test_json_array_reports_bad_items_by_index(api, user, server):
+    response = await api.post("/api/calculations/bulk", json=[
+        calculation(1),
+        {**calculation(2), "points": "many"},
+        "not an object",
+        calculation(4),
+    ])
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["inserted"], body["failed"], body["truncated"]) == (2, 2, False)
+    assert [error["index"] for error in body["errors"]] == [1, 2]
+    assert body["errors"][1]["detail"] == "Item must be a JSON object"
+    assert await stored_points(server, user["_id"]) == [1, 4]
+
+    stats = (await api.get("/api/users/stats")).json()
+    assert (stats["total_points"], stats["calculation_count"]) == (5, 2)
+
+
+async def test_ndjson_stream_is_chunked_and_skips_blank_lines(api, user, server, monkeypatch):
+    monkeypatch.setattr(ingest, "BULK_CHUNK_SIZE", 2)
+    chunks = []
+    record = server.record_calculation_changes
+
+    async def record_chunk(user_id, changes):
+        chunks.append(len(changes))
+        await record(user_id, changes)
+
+    monkeypatch.setattr(server, "record_calculation_changes", record_chunk)
+    lines = [json.dumps(calculation(points)) for points in (1, 2, 3)]
+    body = "\n".join([lines[0], "", "{not json", lines[1], lines[2]]) + "\n"
+
+    response = await api.post(
+        "/api/calculations/bulk", content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    body = response.json()
+    assert (body["inserted"], body["failed"]) == (3, 1)
+    assert body["errors"][0]["index"] == 1
+    assert body["errors"][0]["detail"].startswith("Invalid JSON")
+    assert await stored_points(server, user["_id"]) == [1, 2, 3]
+    assert chunks == [2, 1]
+    stats = (await api.get("/api/users/stats")).json()
+    assert stats["total_points"] == 6
+
+
+async def test_body_must_be_an_array(api, user):
+    response = await api.post("/api/calculations/bulk", json=calculation())
+
+    assert response.status_code == 400
+
+
+async def test_oversized_array_is_rejected(api, user, server, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_BULK_ITEMS", 2)
+
+    response = await api.post("/api/calculations/bulk", json=[calculation()] * 3)
+
+    assert response.status_code == 413
+    assert await server.calculations_collection.count_documents({}) == 0
+
+
+async def test_ndjson_past_the_limit_is_truncated(api, user, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_BULK_ITEMS", 2)
+    body = "\n".join(json.dumps(calculation(points)) for points in (1, 2, 3))
+
+    response = await api.post(
+        "/api/calculations/bulk", content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.json()["inserted"] == 2
+    assert response.json()["truncated"] is True
+
+
+async def test_rejected_writes_fail_only_their_items(server):
+    recorded = []
+
+    async def record(changes):
+        recorded.extend(after["_id"] for _, after in changes)
+
+    await server.calculations_collection.insert_one({"_id": "taken", "user_id": "u1"})
+    bulk = ingest.BulkIngest(server.calculations_collection, "u1", record)
+
+    await bulk._write([
+        (0, {"_id": "first", "user_id": "u1"}),
+        (1, {"_id": "taken", "user_id": "u1"}),
+        (2, {"_id": "last", "user_id": "u1"}),
+    ])
+
+    assert (bulk.inserted, bulk.failed) == (2, 1)
+    assert [error["index"] for error in bulk.errors] == [1]
+    assert recorded == ["first", "last"]
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+import invalidation
+
+pytestmark = pytest.mark.anyio
+
+
+class CappedCursor:
+    """A tailable cursor that returns what is there and then dies."""
+
+    def __init__(self, docs):
+        self._docs = list(docs)
+        self.alive = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._docs:
+            self.alive = False
+            raise StopAsyncIteration
+        return dict(self._docs.pop(0))
+
+
+class CappedCollection:
+    """Insertion-ordered stand-in; mongomock has no capped collections."""
+
+    name = "invalidations"
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        self.docs.append({"_id": doc.get("_id", ObjectId()), **doc})
+
+    async def find_one(self, query, projection=None, sort=None):
+        return self.docs[-1] if self.docs else None
+
+    async def count_documents(self, query, limit=0):
+        return sum(1 for doc in self.docs if doc["_id"] == query["_id"])
+
+    def find(self, query, cursor_type=None):
+        return CappedCursor(self.docs)
+
+
+class Database:
+    def __init__(self):
+        self.collection = CappedCollection()
+
+    def __getitem__(self, name):
+        return self.collection
+
+    async def create_collection(self, name, **options):
+        pass
+
+
+async def listen_while(bus, action):
+    task = asyncio.create_task(bus.listen())
+    try:
+        await asyncio.sleep(0.05)
+        await action()
+        await asyncio.sleep(1.2)
+    finally:
+        task.cancel()
+
+
+async def test_resumes_in_insertion_order_not_by_id_value():
+    db = Database()
+    await db.collection.insert_one({"kind": "test", "n": 0})
+    bus = invalidation.MongoBus(db)
+    received = []
+    bus.on("test", lambda message: received.append(message["n"]))
+
+    async def send():
+        # Another worker's _id can sort before one that was inserted earlier
+        await db.collection.insert_one({"_id": ObjectId("f" * 24), "kind": "test", "n": 1})
+        await db.collection.insert_one({"_id": ObjectId("0" * 24), "kind": "test", "n": 2})
+
+    await listen_while(bus, send)
+
+    assert received == [1, 2]
+
+
+async def test_listener_keeps_its_position_across_restarts():
+    db = Database()
+    bus = invalidation.MongoBus(db)
+    received = []
+    bus.on("test", lambda message: received.append(message["n"]))
+
+    async def send(number):
+        await db.collection.insert_one({"kind": "test", "n": number})
+
+    await listen_while(bus, lambda: send(1))
+    await send(2)
+    await listen_while(bus, lambda: send(3))
+
+    assert received == [1, 2, 3]
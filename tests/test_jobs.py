@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+
+pytestmark = pytest.mark.anyio
+
+ADMIN = {"X-Admin-Key": "test-admin-key"}
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """A private handler registry; jobs of kind "count" record what they saw."""
+    registry = {}
+    monkeypatch.setattr(jobs, "HANDLERS", registry)
+    seen = []
+
+    @jobs.handler("count")
+    async def count(context):
+        seen.append((context.worker_id, context.resumed, dict(context.progress)))
+        for done in range(context.progress.get("done", 0), context.params["to"]):
+            await context.checkpoint({"done": done + 1})
+
+    @jobs.handler("broken")
+    async def broken(context):
+        raise ValueError("bad input")
+
+    return seen
+
+
+async def expire_lease(db, job_id: str) -> None:
+    await db.jobs.update_one(
+        {"_id": job_id}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+
+
+async def test_enqueue_returns_the_active_job_with_the_same_params(server):
+    first = await jobs.enqueue(server.db.jobs, "count", {"to": 3})
+    again = await jobs.enqueue(server.db.jobs, "count", {"to": 3})
+    other = await jobs.enqueue(server.db.jobs, "count", {"to": 4})
+
+    assert again["_id"] == first["_id"]
+    assert other["_id"] != first["_id"]
+    assert await server.db.jobs.count_documents({}) == 2
+
+
+async def test_claim_holds_a_lease_until_it_expires(server):
+    job = await jobs.enqueue(server.db.jobs, "count", {"to": 3})
+
+    claimed = await jobs.claim(server.db.jobs, "worker-a")
+    assert (claimed["_id"], claimed["status"], claimed["attempts"]) == (job["_id"], jobs.RUNNING, 1)
+    assert await jobs.claim(server.db.jobs, "worker-b") is None
+
+    await expire_lease(server.db, job["_id"])
+    taken_over = await jobs.claim(server.db.jobs, "worker-b")
+    assert (taken_over["worker"], taken_over["attempts"]) == ("worker-b", 2)
+    assert taken_over["started_at"] == claimed["started_at"]
+
+    stale = jobs.JobContext(server.db.jobs, claimed, "worker-a", server.db)
+    with pytest.raises(jobs.LeaseLost):
+        await stale.checkpoint({"done": 1})
+
+
+async def test_expired_job_resumes_from_its_last_checkpoint(server, handlers):
+    job = await jobs.enqueue(server.db.jobs, "count", {"to": 5})
+    claimed = await jobs.claim(server.db.jobs, "worker-a")
+    await jobs.JobContext(server.db.jobs, claimed, "worker-a", server.db).checkpoint({"done": 2})
+    # worker-a dies here
+    await expire_lease(server.db, job["_id"])
+
+    await jobs.run_worker(server.db, worker_id="worker-b", burst=True)
+
+    assert handlers == [("worker-b", True, {"done": 2})]
+    finished = await server.db.jobs.find_one({"_id": job["_id"]})
+    assert (finished["status"], finished["progress"], finished["worker"]) == (
+        jobs.SUCCEEDED, {"done": 5}, "worker-b",
+    )
+    assert finished["lease_until"] is None
+
+
+async def test_job_is_given_up_after_too_many_expired_leases(server, handlers):
+    job = await jobs.enqueue(server.db.jobs, "count", {"to": 1})
+    for attempt in range(jobs.MAX_ATTEMPTS):
+        await jobs.claim(server.db.jobs, f"worker-{attempt}")
+        await expire_lease(server.db, job["_id"])
+
+    assert await jobs.claim(server.db.jobs, "worker-last") is None
+    failed = await server.db.jobs.find_one({"_id": job["_id"]})
+    assert failed["status"] == jobs.FAILED
+    assert failed["error"] == "Worker lease expired too many times"
+    assert handlers == []
+
+
+async def test_failing_and_unknown_jobs_are_failed_without_retry(server, handlers):
+    broken = await jobs.enqueue(server.db.jobs, "broken", {})
+    unknown = await jobs.enqueue(server.db.jobs, "missing", {})
+
+    await jobs.run_worker(server.db, worker_id="worker-a", burst=True)
+
+    broken = await server.db.jobs.find_one({"_id": broken["_id"]})
+    unknown = await server.db.jobs.find_one({"_id": unknown["_id"]})
+    assert (broken["status"], broken["error"], broken["attempts"]) == (jobs.FAILED, "bad input", 1)
+    assert (unknown["status"], unknown["error"]) == (jobs.FAILED, "Unknown job kind: missing")
+
+
+async def test_recompute_job_is_queued_and_run(api, server, monkeypatch):
+    import auth
+
+    monkeypatch.setattr(auth, "ADMIN_API_KEY", ADMIN["X-Admin-Key"])
+
+    queued = await api.post("/api/admin/recompute", headers=ADMIN, json={})
+    assert queued.status_code == 202, queued.text
+    job_id = queued.json()["_id"]
+    await jobs.run_worker(server.db, worker_id="worker-a", burst=True)
+
+    response = await api.get(f"/api/admin/jobs/{job_id}", headers=ADMIN)
+    assert response.json()["status"] == jobs.SUCCEEDED
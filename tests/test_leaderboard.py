@@ -0,0 +1,128 @@
+import pytest
+
+
+@pytest.fixture
+def board():
+    from leaderboard import Leaderboard
+
+    board = Leaderboard()
+    board.load([("carol", 300), ("alice", 500), ("bob", 300), ("dave", 100), ("erin", 50)])
+    return board
+
+
+def test_rank_orders_by_points_descending(board):
+    assert board.rank("alice") == 1
+    assert board.rank("dave") == 4
+    assert board.rank("erin") == 5
+    assert board.rank("nobody") is None
+
+
+def test_ties_are_ordered_by_user_id(board):
+    assert board.rank("bob") == 2
+    assert board.rank("carol") == 3
+    assert board.top(3) == [(1, "alice", 500), (2, "bob", 300), (3, "carol", 300)]
+
+
+def test_update_moves_user(board):
+    board.update("erin", 400)
+
+    assert board.rank("erin") == 2
+    assert board.rank("bob") == 3
+    assert board.points("erin") == 400
+    assert len(board) == 5
+
+
+def test_update_adds_and_remove_drops_user(board):
+    board.update("frank", 300)
+    assert board.rank("frank") == 4
+    assert len(board) == 6
+
+    board.remove("bob")
+    assert board.rank("bob") is None
+    assert board.rank("carol") == 2
+    assert len(board) == 5
+
+
+def test_around_clamps_at_both_ends(board):
+    assert board.around("carol", 1) == [(2, "bob", 300), (3, "carol", 300), (4, "dave", 100)]
+    assert board.around("alice", 2) == [(1, "alice", 500), (2, "bob", 300), (3, "carol", 300)]
+    assert board.around("erin", 1) == [(4, "dave", 100), (5, "erin", 50)]
+    assert board.around("nobody", 1) == []
+
+
+def test_slice_past_the_end_is_empty(board):
+    assert board.slice(10, 20) == []
+    assert board.top(100)[-1] == (5, "erin", 50)
+
+
+def test_merge_applies_the_scan_to_users_untouched_since_the_mark(board):
+    since = board.mark()
+    board.update("bob", 900)
+    board.remove("carol")
+    board.update("frank", 10)
+
+    # The scan read everyone before the changes above and never saw frank
+    board.merge([("alice", 500), ("bob", 300), ("carol", 300), ("dave", 250)], since)
+
+    assert board.top(10) == [(1, "bob", 900), (2, "alice", 500), (3, "dave", 250), (4, "frank", 10)]
+    assert board.rank("carol") is None
+    assert board.rank("erin") is None
+
+
+def test_later_merge_takes_the_scan_again(board):
+    board.merge([("alice", 500)], board.mark())
+    board.update("alice", 700)
+
+    board.merge([("alice", 800)], board.mark())
+
+    assert board.top(10) == [(1, "alice", 800)]
+
+
+class SlowStats:
+    """user_stats stand-in whose scan lets other coroutines run midway."""
+
+    def __init__(self, docs, during_scan):
+        self.docs = docs
+        self.during_scan = during_scan
+
+    def find(self, query, projection=None):
+        return self._scan()
+
+    async def _scan(self):
+        for position, doc in enumerate(self.docs):
+            if position == 1:
+                await self.during_scan()
+            yield doc
+
+
+@pytest.mark.anyio
+async def test_rebuild_keeps_points_published_during_the_scan(board):
+    import leaderboard
+
+    async def publish():
+        await leaderboard.publish_points("alice", 50, board)
+        await leaderboard.publish_points("zoe", 700, board)
+        await leaderboard.publish_removals(["dave"], board)
+
+    collection = SlowStats(
+        [{"_id": "alice", "total_points": 500}, {"_id": "bob", "total_points": 300},
+         {"_id": "dave", "total_points": 100}],
+        publish,
+    )
+
+    assert await leaderboard.rebuild(collection, board) == 3
+    assert board.top(10) == [(1, "zoe", 700), (2, "bob", 300), (3, "alice", 50)]
+
+
+@pytest.mark.anyio
+async def test_removals_from_other_processes_unrank_the_user(monkeypatch):
+    import invalidation
+    import leaderboard
+
+    board = leaderboard.Leaderboard()
+    board.load([("alice", 5), ("bob", 3)])
+    monkeypatch.setattr(leaderboard, "leaderboard", board)
+
+    await invalidation.bus.dispatch({"kind": leaderboard.POINTS_REMOVED, "user_id": "bob"})
+
+    assert board.top(10) == [(1, "alice", 5)]
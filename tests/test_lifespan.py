@@ -0,0 +1,77 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from settings import Settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def opened_clients(monkeypatch):
+    """Make startup() open mongomock clients; returns the clients it opened."""
+    opened = []
+
+    def create_client(mongo_url, **kwargs):
+        opened.append(AsyncMongoMockClient())
+        return opened[-1]
+
+    monkeypatch.setattr(server.database, "create_client", create_client)
+    yield opened
+    server.unbind_database()
+
+
+def settings(db_name: str) -> Settings:
+    return Settings(mongo_url="mongodb://localhost:27017", db_name=db_name)
+
+
+async def test_shutdown_unbinds_the_client_it_opened(opened_clients):
+    app = server.create_app(settings("lifespan_a"))
+
+    async with app.router.lifespan_context(app):
+        assert server.client is opened_clients[0]
+        assert server.db.name == "lifespan_a"
+
+    assert server.client is None
+    assert server.db is None
+    assert server.calculations_collection is None
+
+
+async def test_each_lifespan_uses_its_own_settings(opened_clients):
+    first = server.create_app(settings("lifespan_a"))
+    second = server.create_app(settings("lifespan_b"))
+
+    async with first.router.lifespan_context(first):
+        assert server.db.name == "lifespan_a"
+    async with second.router.lifespan_context(second):
+        assert server.client is opened_clients[1]
+        assert server.db.name == "lifespan_b"
+        assert await server.users_collection.count_documents({}) == 0
+
+
+async def test_concurrent_apps_must_share_the_database(opened_clients):
+    first = server.create_app(settings("lifespan_a"))
+    same = server.create_app(settings("lifespan_a"))
+    other = server.create_app(settings("lifespan_b"))
+
+    async with first.router.lifespan_context(first):
+        async with same.router.lifespan_context(same):
+            pass
+        assert server.client is opened_clients[0]
+        with pytest.raises(RuntimeError):
+            async with other.router.lifespan_context(other):
+                pass
+        assert server.db.name == "lifespan_a"
+    assert server.client is None
+
+
+async def test_lifespan_keeps_a_client_bound_elsewhere(opened_clients):
+    bound = AsyncMongoMockClient()
+    server.bind_database(bound, "lifespan_bound")
+    app = server.create_app(settings("lifespan_a"))
+
+    async with app.router.lifespan_context(app):
+        assert server.client is bound
+
+    assert server.client is bound
+    assert opened_clients == []
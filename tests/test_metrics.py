@@ -0,0 +1,112 @@
+import os
+import re
+import threading
+import time
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+import metrics
+
+pytestmark = pytest.mark.anyio
+
+
+def request_count(text: str, method: str, route: str, status: str) -> int:
+    labels = f'method="{method}",route="{route}",status="{status}"'
+    match = re.search(rf"^http_request_duration_seconds_count{{{re.escape(labels)}}} (\d+)$", text, re.M)
+    return int(match.group(1)) if match else 0
+
+
+async def test_requests_are_counted_per_route_template(api, user):
+    route = "/api/calculations/{calculation_id}"
+    before = request_count((await api.get("/api/metrics")).text, "DELETE", route, "404")
+
+    for calculation_id in ("missing-1", "missing-2"):
+        response = await api.delete(f"/api/calculations/{calculation_id}")
+        assert response.status_code == 404
+
+    text = (await api.get("/api/metrics")).text
+    assert request_count(text, "DELETE", route, "404") == before + 2
+    assert "missing-1" not in text
+
+
+async def test_slow_profiled_request_writes_collapsed_stacks(api, user, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(metrics, "PROFILE_SLOW_SECONDS", 0.0)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path))
+
+    plain = await api.get("/api/users/stats")
+    profiled = await api.get("/api/users/stats", headers={"X-Profile": "1"})
+
+    assert "x-profile-file" not in plain.headers
+    filename = profiled.headers["x-profile-file"]
+    assert os.listdir(tmp_path) == [filename]
+    assert profiled.json()["calculation_count"] == 0
+
+
+async def test_fast_profiled_request_writes_nothing(api, user, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(metrics, "PROFILE_SLOW_SECONDS", 60.0)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path))
+
+    response = await api.get("/api/users/stats", headers={"X-Profile": "1"})
+
+    assert "x-profile-file" not in response.headers
+    assert not tmp_path.exists() or os.listdir(tmp_path) == []
+
+
+def streaming_app():
+    async def chunks(request):
+        async def body():
+            for number in range(3):
+                yield f"chunk {number}\n"
+
+        return StreamingResponse(body(), media_type="text/plain")
+
+    async def broken(request):
+        raise RuntimeError("boom")
+
+    app = Starlette(routes=[Route("/stream", chunks), Route("/broken", broken)])
+    return metrics.InstrumentMiddleware(app)
+
+
+async def test_streamed_bodies_pass_through_and_failures_count_as_500():
+    transport = httpx.ASGITransport(app=streaming_app(), raise_app_exceptions=False)
+    before = request_count(metrics.render(), "GET", "/broken", "500")
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        streamed = await client.get("/stream")
+        broken = await client.get("/broken")
+
+    assert streamed.text == "chunk 0\nchunk 1\nchunk 2\n"
+    assert broken.status_code == 500
+    assert request_count(metrics.render(), "GET", "/stream", "200") >= 1
+    assert request_count(metrics.render(), "GET", "/broken", "500") == before + 1
+
+
+def test_sampler_dumps_the_sampled_thread(tmp_path):
+    done = threading.Event()
+
+    def busy_worker():
+        while not done.is_set():
+            time.sleep(0.001)
+
+    worker = threading.Thread(target=busy_worker)
+    worker.start()
+    sampler = metrics.StackSampler(worker.ident, interval=0.001).start()
+    time.sleep(0.05)
+    sampler.stop()
+    done.set()
+    worker.join()
+
+    path = tmp_path / "worker.folded"
+    sampler.dump(str(path))
+    lines = path.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1
+    assert "busy_worker (test_metrics.py:" in stack
+    assert stack.index("_bootstrap") < stack.index("busy_worker")
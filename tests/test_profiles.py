@@ -0,0 +1,68 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+class WriteDuringRead:
+    """Collection proxy that runs ``write`` after the next find() has read."""
+
+    def __init__(self, collection, write):
+        self.collection = collection
+        self.write = write
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def find(self, *args, **kwargs):
+        cursor = self.collection.find(*args, **kwargs)
+        proxy = self
+
+        class Cursor:
+            async def to_list(self, length):
+                docs = await cursor.to_list(length)
+                write, proxy.write = proxy.write, None
+                if write is not None:
+                    await write()
+                return docs
+
+        return Cursor()
+
+
+def profile(name: str) -> dict:
+    return {"type": "solar", "name": name, "data": {"rooftop_area": 300}}
+
+
+async def test_profile_list_is_cached_until_a_write(api, user):
+    created = await api.post("/api/profiles", json=profile("Home"))
+    assert created.status_code == 200
+
+    first = await api.get("/api/profiles/solar")
+    second = await api.get("/api/profiles/solar")
+    assert second.content == first.content
+    assert [item["name"] for item in second.json()] == ["Home"]
+
+    await api.delete(f"/api/profiles/{created.json()['_id']}")
+    assert (await api.get("/api/profiles/solar")).json() == []
+
+
+async def test_write_during_a_cache_miss_is_not_hidden(api, user, server, monkeypatch):
+    await api.post("/api/profiles", json=profile("Home"))
+
+    async def create_office():
+        response = await api.post("/api/profiles", json=profile("Office"))
+        assert response.status_code == 200
+
+    monkeypatch.setattr(
+        server, "profiles_collection", WriteDuringRead(server.profiles_collection, create_office)
+    )
+
+    # Read the list before the concurrent create committed, so it is stale
+    stale = await api.get("/api/profiles/solar")
+    assert [item["name"] for item in stale.json()] == ["Home"]
+
+    fresh = await api.get("/api/profiles/solar")
+    assert sorted(item["name"] for item in fresh.json()) == ["Home", "Office"]
+    assert fresh.headers["ETag"] != stale.headers["ETag"]
+
+    revalidated = await api.get("/api/profiles/solar", headers={"If-None-Match": stale.headers["ETag"]})
+    assert revalidated.status_code == 200
@@ -0,0 +1,106 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+import rate_tables
+
+pytestmark = pytest.mark.anyio
+
+ADMIN = {"X-Admin-Key": "test-admin-key"}
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    """A fresh rate cache installed for the server, plus an admin key."""
+    import auth
+
+    fresh = rate_tables.RateTables()
+    monkeypatch.setattr(rate_tables, "tables", fresh)
+    monkeypatch.setattr(auth, "ADMIN_API_KEY", ADMIN["X-Admin-Key"])
+    return fresh
+
+
+def test_merge_keeps_base_and_adds_entries():
+    base = rate_tables.DEFAULT_SNAPSHOT.rates
+
+    merged = rate_tables.merge_rates(base, {
+        "solar": {"tariff": 7},
+        "tree_species": {"ashoka": 1.2},
+        "transport": {"bike": {"cost": 1, "co2": 0}},
+    })
+
+    assert merged["solar"]["tariff"] == 7
+    assert merged["solar"]["days_per_month"] == base["solar"]["days_per_month"]
+    assert merged["tree_species"]["ashoka"] == 1.2
+    assert merged["transport"]["bike"] == {"cost": 1, "co2": 0}
+    assert base["solar"]["tariff"] == 6
+
+
+@pytest.mark.parametrize("changes, message", [
+    ({"bogus": 1}, "Unknown rate: bogus"),
+    ({"solar": {"tariff": "x"}}, "solar.tariff must be a number"),
+    ({"solar": {"tariff": True}}, "solar.tariff must be a number"),
+    ({"solar": {"tariff": -6}}, "solar.tariff must be a finite, non-negative number"),
+    ({"electricity": math.inf}, "electricity must be a finite, non-negative number"),
+    ({"electricity": math.nan}, "electricity must be a finite, non-negative number"),
+    ({"transport": 5}, "transport must be a table"),
+    ({"transport": {"bike": {"cost": 1}}}, "transport.bike is missing co2"),
+    ({"transport": {"bike": 1}}, "transport.bike must be a table"),
+    ({"transport": {"bike": {"cost": 1, "co2": 0, "noise": 2}}}, "Unknown rate: transport.bike.noise"),
+    ({"tree_species": {"ashoka": -1}}, "tree_species.ashoka must be a finite, non-negative number"),
+])
+def test_merge_rejects_invalid_rates(changes, message):
+    with pytest.raises(rate_tables.RateTableError, match=message.replace(".", r"\.")):
+        rate_tables.merge_rates(rate_tables.DEFAULT_SNAPSHOT.rates, changes)
+
+
+def test_current_follows_effective_from():
+    tables = rate_tables.RateTables()
+    now = datetime.utcnow()
+    tables.add({"_id": 1, "effective_from": now - timedelta(days=1), "rates": {"electricity": 8}})
+    tables.add({"_id": 2, "effective_from": now + timedelta(days=1), "rates": {"electricity": 9}})
+
+    assert tables.current().version == 1
+    assert tables.current(now + timedelta(days=2)).version == 2
+    assert tables.current(now - timedelta(days=2)).version == rate_tables.DEFAULT_VERSION
+    assert tables.latest_version == 2
+
+
+def test_snapshot_rates_are_read_only():
+    with pytest.raises(TypeError):
+        rate_tables.DEFAULT_SNAPSHOT.rates["electricity"] = 1
+
+
+async def test_publish_stores_a_new_version(api, server, tables):
+    response = await api.post("/api/admin/rates", headers=ADMIN, json={
+        "rates": {"solar": {"tariff": 7}}, "effective_from": "2020-01-01T00:00:00Z",
+    })
+
+    assert response.status_code == 201, response.text
+    assert response.json()["version"] == 1
+    assert tables.current().rates["solar"]["tariff"] == 7
+    stored = await server.rate_tables_collection.find_one({"_id": 1})
+    assert stored["rates"]["solar"]["tariff"] == 7
+    assert stored["effective_from"] == datetime(2020, 1, 1)
+
+    rates = await api.get("/api/rates")
+    assert rates.json()["version"] == 1
+
+
+@pytest.mark.parametrize("changes", [
+    {"solar": {"tariff": -6}},
+    {"transport": {"bike": {"cost": 1}}},
+])
+async def test_publish_rejects_invalid_rates(api, server, tables, changes):
+    response = await api.post("/api/admin/rates", headers=ADMIN, json={"rates": changes})
+
+    assert response.status_code == 422
+    assert tables.latest_version == rate_tables.DEFAULT_VERSION
+    assert await server.rate_tables_collection.count_documents({}) == 0
+
+
+async def test_publish_needs_admin_key(api, server, tables):
+    response = await api.post("/api/admin/rates", json={"rates": {"electricity": 8}})
+
+    assert response.status_code == 403
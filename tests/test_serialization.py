@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+import etag
+import serialization
+
+pytestmark = pytest.mark.anyio
+
+
+async def get_both_paths(api, monkeypatch, url: str, before_each=None):
+    bodies = []
+    for fast in (False, True):
+        monkeypatch.setattr(serialization, "FAST_RESPONSES", fast)
+        monkeypatch.setattr(serialization, "DEBUG", fast)
+        if before_each is not None:
+            await before_each()
+        response = await api.get(url)
+        assert response.status_code == 200, response.text
+        bodies.append(response.content)
+    return bodies
+
+
+async def test_calculation_list_is_identical_on_both_paths(api, user, server, monkeypatch):
+    created = datetime(2026, 1, 2, 3, 4, 5, 678000)
+    await server.calculations_collection.insert_many([
+        {
+            # Saved before rate versions existed, with whole-number values
+            "_id": "legacy", "user_id": user["_id"], "type": "solar", "title": "Solar Panel (3.0kW)",
+            "money_saved": 450, "co2_reduced": 16, "points": 466,
+            "details": {"system_capacity": "3.0kW"},
+            "created_at": created, "updated_at": created,
+        },
+        {
+            "_id": "current", "user_id": user["_id"], "updated_at": created, "created_at": created,
+            "rate_version": 2, "points": 81, "co2_reduced": 30.5, "money_saved": 50.25,
+            "title": "Metro → Bus", "type": "transport", "details": {"from": "Metro/Subway"},
+        },
+    ])
+
+    model_body, fast_body = await get_both_paths(api, monkeypatch, "/api/calculations")
+
+    assert fast_body == model_body
+    assert b'"_id":"legacy"' in fast_body
+    assert b'"rate_version":null' in fast_body
+
+
+async def test_profile_list_is_identical_on_both_paths(api, user, server, monkeypatch):
+    created = datetime(2026, 1, 2, 3, 4, 5)
+    await server.profiles_collection.insert_one({
+        "_id": "profile-1", "user_id": user["_id"], "type": "solar", "name": "Home",
+        "data": {"rooftop_area": 300}, "created_at": created, "updated_at": created,
+    })
+
+    async def new_version():
+        # Profile bodies are cached per version; make both requests miss
+        await etag.bump(user["_id"], etag.PROFILES)
+
+    model_body, fast_body = await get_both_paths(
+        api, monkeypatch, "/api/profiles/solar", before_each=new_version
+    )
+
+    assert fast_body == model_body
+    assert b'"_id":"profile-1"' in fast_body
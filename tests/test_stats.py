@@ -0,0 +1,305 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def calc(type_: str = "solar", money: float = 100.0, co2: float = 10.0, points: int = 110) -> dict:
+    return {
+        "_id": str(uuid.uuid4()),
+        "user_id": "u1",
+        "type": type_,
+        "money_saved": money,
+        "co2_reduced": co2,
+        "points": points,
+    }
+
+
+def payload(type_: str = "electricity", money: float = 100.0, co2: float = 10.0, points: int = 110) -> dict:
+    return {
+        "type": type_,
+        "title": "Calculation",
+        "money_saved": money,
+        "co2_reduced": co2,
+        "points": points,
+        "details": {},
+    }
+
+
+def test_increment_for_create():
+    from stats import build_increment
+
+    assert build_increment([(None, calc())]) == {
+        "total_saved": 100.0,
+        "total_co2_reduced": 10.0,
+        "total_points": 110,
+        "calculation_count": 1,
+        "by_type.solar.total_saved": 100.0,
+        "by_type.solar.total_co2_reduced": 10.0,
+        "by_type.solar.total_points": 110,
+        "by_type.solar.calculation_count": 1,
+    }
+
+
+def test_increment_for_update_keeps_count_and_drops_zero_deltas():
+    from stats import build_increment
+
+    before = calc(money=100.0, co2=10.0, points=110)
+    after = {**before, "money_saved": 150.0}
+
+    assert build_increment([(before, after)]) == {
+        "total_saved": 50.0,
+        "by_type.solar.total_saved": 50.0,
+    }
+
+
+def test_increment_for_type_change_moves_the_row():
+    from stats import build_increment
+
+    before = calc("solar")
+    after = {**before, "type": "water"}
+
+    assert build_increment([(before, after)]) == {
+        "by_type.solar.total_saved": -100.0,
+        "by_type.solar.total_co2_reduced": -10.0,
+        "by_type.solar.total_points": -110,
+        "by_type.solar.calculation_count": -1,
+        "by_type.water.total_saved": 100.0,
+        "by_type.water.total_co2_reduced": 10.0,
+        "by_type.water.total_points": 110,
+        "by_type.water.calculation_count": 1,
+    }
+
+
+def test_increment_for_delete():
+    from stats import build_increment
+
+    inc = build_increment([(calc(points=30), None)])
+
+    assert inc["total_points"] == -30
+    assert inc["calculation_count"] == -1
+    assert inc["by_type.solar.calculation_count"] == -1
+
+
+async def stored_and_rebuilt(server, user_id: str):
+    import stats
+
+    stored = await server.user_stats_collection.find_one({"_id": user_id})
+    rebuilt = await stats.compute_user_stats(server.calculations_collection, user_id)
+    return stored, rebuilt
+
+
+def totals(doc: dict) -> dict:
+    # $inc leaves a zeroed entry behind for a type whose last row went away
+    keys = ("total_saved", "total_co2_reduced", "total_points", "calculation_count")
+    by_type = {name: entry for name, entry in doc["by_type"].items() if entry["calculation_count"]}
+    return {**{key: doc[key] for key in keys}, "by_type": by_type}
+
+
+async def test_create_update_delete_keep_stats_in_step(api, user, server):
+    first = (await api.post("/api/calculations", json=payload("electricity"))).json()
+    second = (await api.post("/api/calculations", json=payload("water", 40.0, 4.0, 44))).json()
+
+    response = await api.put(f"/api/calculations/{first['_id']}", json={"money_saved": 250.0, "points": 260})
+    assert response.status_code == 200, response.text
+    response = await api.delete(f"/api/calculations/{second['_id']}")
+    assert response.status_code == 200, response.text
+
+    stored, rebuilt = await stored_and_rebuilt(server, user["_id"])
+    assert totals(stored) == totals(rebuilt)
+    assert stored["calculation_count"] == 1
+    assert stored["total_points"] == 260
+    assert stored["by_type"]["water"]["calculation_count"] == 0
+
+
+async def test_first_write_seeds_history_saved_before_stats(api, user, server):
+    legacy = {**calc(points=5), "user_id": user["_id"]}
+    await server.calculations_collection.insert_one(legacy)
+
+    response = await api.post("/api/calculations", json=payload(points=7))
+    assert response.status_code == 200, response.text
+
+    stored, rebuilt = await stored_and_rebuilt(server, user["_id"])
+    assert stored["total_points"] == 12
+    assert stored["calculation_count"] == 2
+    assert totals(stored) == totals(rebuilt)
+
+
+async def test_seed_does_not_overwrite_counted_increments(server):
+    import stats
+
+    user_id = str(uuid.uuid4())
+    seeded = await stats.get_user_stats(
+        server.calculations_collection, server.user_stats_collection, user_id
+    )
+    assert seeded["calculation_count"] == 0
+    await stats.apply_increment(
+        server.calculations_collection, server.user_stats_collection, user_id,
+        stats.build_increment([(None, {**calc(points=9), "user_id": user_id})]),
+    )
+
+    # A seed computed before the increment landed must not replace it
+    stats._seen_users.discard(user_id)
+    await server.user_stats_collection.find_one_and_update(
+        {"_id": user_id}, {"$setOnInsert": {"total_points": 0, "calculation_count": 0}}, upsert=True
+    )
+    again = await stats.get_user_stats(
+        server.calculations_collection, server.user_stats_collection, user_id
+    )
+
+    assert again["total_points"] == 9
+    assert again["calculation_count"] == 1
+
+
+async def test_increment_on_missing_document_seeds_it(server):
+    import stats
+
+    user_id = str(uuid.uuid4())
+    doc = {**calc(points=4), "user_id": user_id}
+    await server.calculations_collection.insert_one(doc)
+
+    stored = await stats.apply_increment(
+        server.calculations_collection, server.user_stats_collection, user_id,
+        stats.build_increment([(None, doc)]),
+    )
+
+    assert stored["total_points"] == 4
+    assert stored["calculation_count"] == 1
+
+
+class IncrementDuringAggregate:
+    """Calculations proxy that lands a concurrent write while a rebuild aggregates."""
+
+    def __init__(self, server, user_id, times=1):
+        self._server = server
+        self._user_id = user_id
+        self._times = times
+
+    def __getattr__(self, name):
+        return getattr(self._server.calculations_collection, name)
+
+    def aggregate(self, pipeline, **kwargs):
+        cursor = self._server.calculations_collection.aggregate(pipeline, **kwargs)
+        if self._times <= 0:
+            return cursor
+        self._times -= 1
+        return self._write_then(cursor)
+
+    async def _write_then(self, cursor):
+        import stats
+
+        # Counted by neither the aggregation below nor (once) the rebuild
+        doc = {**calc(points=3), "user_id": self._user_id}
+        await self._server.calculations_collection.insert_one(doc)
+        await stats.apply_increment(
+            self._server.calculations_collection, self._server.user_stats_collection,
+            self._user_id, stats.build_increment([(None, doc)]),
+        )
+        async for group in cursor:
+            yield group
+
+
+async def test_rebuild_retries_when_an_increment_lands_meanwhile(server):
+    import stats
+
+    user_id = str(uuid.uuid4())
+    await server.calculations_collection.insert_one({**calc(points=5), "user_id": user_id})
+    await server.user_stats_collection.insert_one({"_id": user_id, "total_points": 1000, "version": 4})
+
+    rebuilt = await stats.rebuild_user_stats(
+        IncrementDuringAggregate(server, user_id), server.user_stats_collection, user_id=user_id
+    )
+
+    assert rebuilt["total_points"] == 8
+    assert rebuilt["calculation_count"] == 2
+    assert rebuilt["version"] == 6
+
+
+async def test_rebuild_updates_documents_stored_before_versioning(server):
+    import stats
+
+    user_id = str(uuid.uuid4())
+    await server.calculations_collection.insert_one({**calc(points=5), "user_id": user_id})
+    await server.user_stats_collection.insert_one({"_id": user_id, "total_points": 1000})
+
+    rebuilt = await stats.rebuild_user_stats(
+        server.calculations_collection, server.user_stats_collection, user_id=user_id
+    )
+
+    assert rebuilt["total_points"] == 5
+    assert rebuilt["version"] == 1
+
+
+async def test_full_rebuild_fixes_drift_and_drops_empty_users(server):
+    import stats
+
+    kept, gone = str(uuid.uuid4()), str(uuid.uuid4())
+    await server.calculations_collection.insert_one({**calc(points=5), "user_id": kept})
+    await server.user_stats_collection.insert_many([
+        {"_id": kept, "total_points": 1000, "version": 2, "updated_at": datetime(2020, 1, 1)},
+        {"_id": gone, "total_points": 7, "version": 1, "updated_at": datetime(2020, 1, 1)},
+    ])
+
+    await stats.rebuild_user_stats(server.calculations_collection, server.user_stats_collection)
+
+    stored = await server.user_stats_collection.find_one({"_id": kept})
+    assert stored["total_points"] == 5
+    assert await server.user_stats_collection.find_one({"_id": gone}) is None
+
+
+async def test_rollup_rebuild_retries_and_zeroes_empty_buckets(server, monkeypatch):
+    import rollups
+
+    user_id = str(uuid.uuid4())
+    old = {**calc(points=5), "user_id": user_id, "created_at": datetime(2024, 1, 15)}
+    await rollups.apply_changes(server.rollups_collection, [(None, old)])
+    current = {**calc(points=7), "user_id": user_id, "created_at": datetime(2024, 3, 2)}
+    await server.calculations_collection.insert_one(current)
+
+    read_versions = server.rollups_collection.find
+    concurrent_writes = [{**calc(points=2), "user_id": user_id, "created_at": datetime(2024, 3, 9)}]
+
+    async def write_after(cursor):
+        async for doc in cursor:
+            yield doc
+        while concurrent_writes:
+            late = concurrent_writes.pop()
+            await server.calculations_collection.insert_one(late)
+            await rollups.apply_changes(server.rollups_collection, [(None, late)])
+
+    # A calculation lands right after the rebuild has read the versions, once
+    monkeypatch.setattr(
+        server.rollups_collection, "find",
+        lambda *args, **kwargs: write_after(read_versions(*args, **kwargs)),
+    )
+    await rollups.rebuild_rollups(
+        server.calculations_collection, server.rollups_collection, user_id=user_id
+    )
+    monkeypatch.undo()
+
+    trends = await rollups.get_trends(server.rollups_collection, user_id, "month")
+    assert [(row["bucket"], row["points"], row["count"]) for row in trends] == [
+        (datetime(2024, 3, 1), 9, 2),
+    ]
+
+
+async def test_full_rebuild_reports_the_users_it_removed(server):
+    import stats
+
+    kept, gone = str(uuid.uuid4()), str(uuid.uuid4())
+    await server.calculations_collection.insert_one({**calc(points=5), "user_id": kept})
+    await server.user_stats_collection.insert_one(
+        {"_id": gone, "total_points": 7, "version": 1, "updated_at": datetime(2020, 1, 1)}
+    )
+    removed = []
+
+    async def on_removed(user_ids):
+        removed.extend(user_ids)
+
+    await stats.rebuild_user_stats(
+        server.calculations_collection, server.user_stats_collection, on_removed=on_removed
+    )
+
+    assert removed == [gone]
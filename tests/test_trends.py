@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pytest
+
+import rollups
+
+pytestmark = pytest.mark.anyio
+
+
+def calculation(calc_type: str = "solar", points: int = 10) -> dict:
+    return {
+        "type": calc_type,
+        "title": f"{calc_type} {points}",
+        "money_saved": float(points),
+        "co2_reduced": points / 10,
+        "points": points,
+        "details": {},
+    }
+
+
+def summary(body: dict) -> list:
+    return [(row["bucket"][:10], row["type"], row["points"], row["count"]) for row in body["buckets"]]
+
+
+async def test_writes_keep_the_trend_buckets_in_step(api, user):
+    first = (await api.post("/api/calculations", json=calculation("solar", 10))).json()
+    second = (await api.post("/api/calculations", json=calculation("solar", 5))).json()
+    await api.post("/api/calculations", json=calculation("water", 7))
+    await api.put(f"/api/calculations/{first['_id']}", json={"points": 30})
+    await api.delete(f"/api/calculations/{second['_id']}")
+
+    today = datetime.utcnow()
+    day = (await api.get("/api/users/trends", params={"granularity": "day"})).json()
+    month = (await api.get("/api/users/trends")).json()
+
+    assert day["granularity"] == "day"
+    assert summary(day) == [
+        (today.strftime("%Y-%m-%d"), "solar", 30, 1),
+        (today.strftime("%Y-%m-%d"), "water", 7, 1),
+    ]
+    assert summary(month) == [
+        (today.strftime("%Y-%m-01"), "solar", 30, 1),
+        (today.strftime("%Y-%m-01"), "water", 7, 1),
+    ]
+
+
+async def test_trends_are_read_from_rollups_within_the_range(api, user, server):
+    history = [
+        {"user_id": user["_id"], "type": "solar", "money_saved": 1.0, "co2_reduced": 0.1,
+         "points": points, "created_at": created_at}
+        for points, created_at in (
+            (1, datetime(2024, 1, 31, 23)), (2, datetime(2024, 2, 1)),
+            (4, datetime(2024, 2, 20)), (8, datetime(2024, 3, 5)),
+        )
+    ]
+    await rollups.apply_changes(server.rollups_collection, [(None, doc) for doc in history])
+
+    response = await api.get("/api/users/trends", params={
+        "granularity": "month", "from": "2024-02-10T00:00:00", "to": "2024-03-01T00:00:00",
+    })
+
+    assert summary(response.json()) == [("2024-02-01", "solar", 6, 2)]
+
+
+async def test_unknown_granularity_is_rejected(api, user):
+    response = await api.get("/api/users/trends", params={"granularity": "week"})
+
+    assert response.status_code == 400